@@ -1,9 +1,21 @@
 # backend/app/__init__.py
 
 #--> Aquí se van importante las ruta 
+import os
+
 from flask import Flask
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 from .database import mysql
+from .cli import registrar_comandos
+from .services.cache_reportes import cache_reportes
+from .ia import ejecutor_pronosticos
+from .services.catalogo_productos import catalogo_productos
+from .services.dimensiones import dimensiones
+from .services.autenticacion import autenticacion
+from .services.cola_trabajos import cola_trabajos
+from . import instrumentacion_sql
+from .metricas import metricas
 
 def create_app():
     app = Flask(__name__)
@@ -14,8 +26,81 @@ def create_app():
     app.config['MYSQL_PASSWORD'] = '1234'
     app.config['MYSQL_DB'] = 'inventario_ia'
 
-    # Inicializar extensión MySQL
+    # Pool de conexiones por proceso (ajustar MYSQL_POOL_MAX según workers y max_connections)
+    app.config['MYSQL_POOL_MIN'] = 1
+    app.config['MYSQL_POOL_MAX'] = 10
+    app.config['MYSQL_POOL_TIMEOUT'] = 10          # segundos esperando una conexión libre
+    app.config['MYSQL_POOL_MAX_LIFETIME'] = 1800   # segundos antes de reemplazar una conexión
+    app.config['MYSQL_POOL_PING_INTERVAL'] = 30    # ping() a conexiones libres por más de esto
+
+    # Hilos que atienden solicitudes en asgi.py (límite de solicitudes en curso
+    # por proceso; solo MYSQL_POOL_MAX de ellas usan MySQL a la vez)
+    app.config['ASGI_HILOS'] = 40
+
+    # Caché de reportes de IA (segundos de vigencia y máximo de reportes guardados)
+    app.config['REPORTES_CACHE_TTL'] = 300
+    app.config['REPORTES_CACHE_MAX_ENTRADAS'] = 64
+
+    # Catálogo de productos en memoria (segundos entre verificaciones de cambios
+    # hechos por otros procesos y segundos que se guardan esos cambios)
+    app.config['CATALOGO_INTERVALO_VERIFICACION'] = 2
+    app.config['CATALOGO_RETENCION_CAMBIOS'] = 86400
+
+    # Nombres de categorías y proveedores en memoria (segundos entre verificaciones de versión)
+    app.config['DIMENSIONES_INTERVALO_VERIFICACION'] = 2
+
+    # Proxies inversos delante de la app (nginx, balanceador). Con N > 0 se toma
+    # la IP del cliente de X-Forwarded-For confiando en los últimos N saltos; con
+    # 0 se usa la IP de la conexión. Un valor mayor que los proxies reales permite
+    # que el cliente falsee su IP y evada los límites de inicio de sesión
+    app.config['PROXY_SALTOS_CONFIABLES'] = int(os.environ.get('PROXY_SALTOS_CONFIABLES', 0))
+
+    # Inicio de sesión: factor de trabajo del hash, verificaciones simultáneas
+    # (y segundos esperando lugar), vigencia del token y límites de intentos.
+    # SECRET_KEY se toma de la variable de entorno; debe ser la misma en todos los workers
+    app.config['AUTH_METODO_HASH'] = 'pbkdf2:sha256:600000'
+    app.config['AUTH_VERIFICACIONES_SIMULTANEAS'] = 4
+    app.config['AUTH_ESPERA_VERIFICACION'] = 2
+    app.config['AUTH_DURACION_TOKEN'] = 8 * 3600
+    app.config['AUTH_INTENTOS_USUARIO'] = 5          # fallos por usuario antes de esperar
+    app.config['AUTH_ESPERA_MAXIMA_USUARIO'] = 900   # tope de la espera exponencial (1, 2, 4... s)
+    app.config['AUTH_OLVIDO_FALLOS'] = 3600          # segundos sin fallar para olvidar los fallos
+    app.config['AUTH_INTENTOS_IP'] = 30          # intentos por IP
+    app.config['AUTH_VENTANA_IP'] = 60
+
+    # Medición de consultas SQL por solicitud (Server-Timing y aviso de N+1)
+    app.config['SQL_INSTRUMENTACION'] = True
+    app.config['SQL_UMBRAL_N_MAS_1'] = 10
+
+    # Procesos de cálculo de pronósticos por worker (un pool reutilizado;
+    # con N workers pueden correr hasta N × este valor a la vez)
+    app.config['PRONOSTICOS_PROCESOS_MAX'] = 4
+
+    # Segundos tras los cuales la última corrida de pronósticos se considera
+    # vieja y los reportes de predicción se calculan en vivo
+    app.config['PRONOSTICOS_ANTIGUEDAD_MAXIMA'] = 36 * 3600
+
+    # Cola de trabajos de reportes (archivo SQLite compartido por los workers)
+    app.config['REPORTES_TRABAJOS_HILOS'] = 1
+    app.config['REPORTES_TRABAJOS_RETENCION'] = 86400   # segundos que se guarda un resultado
+    app.config['REPORTES_TRABAJOS_LATIDO'] = 30          # segundos entre latidos de un trabajo en curso
+    app.config['REPORTES_TRABAJOS_VENCIMIENTO'] = 300    # sin latido por más de esto, se da por fallido
+
+    saltos = app.config['PROXY_SALTOS_CONFIABLES']
+    if saltos:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=saltos, x_proto=saltos, x_host=saltos)
+
+    # Inicializar pool de conexiones MySQL
     mysql.init_app(app)
+    cache_reportes.init_app(app)
+    ejecutor_pronosticos.init_app(app)
+    catalogo_productos.init_app(app)
+    dimensiones.init_app(app)
+    autenticacion.init_app(app)
+    cola_trabajos.init_app(app)
+    instrumentacion_sql.init_app(app, mysql)
+    # Después de instrumentacion_sql: su after_request corre antes y ve las consultas
+    metricas.init_app(app, mysql, cache_reportes, catalogo_productos)
     CORS(app)
 
     from .routes.main import main_bp
@@ -41,4 +126,7 @@ def create_app():
     app.register_blueprint(reportes_bp)# Configuración adicional
     app.register_blueprint(auth_bp)
 
+    # Comandos de consola (flask reconstruir-ventas-diarias, ...)
+    registrar_comandos(app)
+
     return app
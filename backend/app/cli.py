@@ -0,0 +1,105 @@
+# backend/app/cli.py
+
+#--> Comandos de consola disponibles con `flask <comando>`
+import click
+
+def registrar_comandos(app):
+
+    @app.cli.command('reconstruir-ventas-diarias')
+    def reconstruir_ventas_diarias():
+        """Regenera la tabla ventas_diarias_producto desde detalle_factura"""
+        from .services.ventas_diarias_service import VentasDiariasService
+
+        filas = VentasDiariasService.reconstruir()
+        click.echo(f'Resumen de ventas diarias reconstruido: {filas} filas')
+
+    @app.cli.command('importar-entradas')
+    @click.argument('ruta', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--formato', type=click.Choice(['csv', 'json', 'ndjson']),
+                  help='Formato del archivo (por defecto, según la extensión)')
+    @click.option('--tamano-tramo', default=500, show_default=True,
+                  help='Entradas confirmadas por transacción')
+    def importar_entradas(ruta, formato, tamano_tramo):
+        """Importa entradas de stock desde un archivo CSV, JSON o NDJSON"""
+        from .services.entrada_stock_lote_service import EntradaStockLoteService, LECTORES_ENTRADAS
+        from .services.cache_reportes import cache_reportes
+
+        formato = formato or ruta.rsplit('.', 1)[-1].lower()
+        if formato not in LECTORES_ENTRADAS:
+            raise click.BadParameter('Use --formato csv, json o ndjson', param_hint='--formato')
+
+        with open(ruta, encoding='utf-8-sig', newline='') as archivo:
+            resumen = EntradaStockLoteService.importar(LECTORES_ENTRADAS[formato](archivo), tamano_tramo)
+        cache_reportes.invalidar()
+
+        click.echo(f"Importadas: {resumen['importadas']}  Con error: {resumen['con_error']}  "
+                   f"Productos actualizados: {resumen['productos_actualizados']}")
+        for error in resumen['errores']:
+            click.echo(f"  fila {error['fila']}: {error['message']}", err=True)
+
+    @app.cli.command('materializar-pronosticos')
+    @click.option('--parcial', is_flag=True,
+                  help='Recalcular solo los productos facturados desde la última corrida')
+    @click.option('--procesos', type=int, default=None,
+                  help='Procesos para el cálculo (por defecto y como máximo, PRONOSTICOS_PROCESOS_MAX)')
+    def materializar_pronosticos(parcial, procesos):
+        """Calcula y guarda los pronósticos de demanda del catálogo (para cron nocturno)"""
+        from .services.pronostico_service import PronosticoService
+        from .services.cache_reportes import cache_reportes
+
+        corrida = PronosticoService.materializar(parcial=parcial, procesos=procesos)
+        if corrida is None:
+            click.echo('Otra corrida de pronósticos está en curso', err=True)
+            return
+        cache_reportes.invalidar()
+
+        click.echo(f"Corrida {corrida['corrida_id']} ({corrida['tipo']}): "
+                   f"{corrida['productos_calculados']} productos en {corrida['segundos']} s")
+
+    @app.cli.command('migrar')
+    def migrar():
+        """Aplica las migraciones de esquema pendientes (tablas resumen e índices)"""
+        from .migraciones import aplicar_migraciones
+
+        aplicadas = aplicar_migraciones(
+            lambda version, nombre: click.echo(f'Aplicando {version:04d}_{nombre}...')
+        )
+        click.echo(f'{len(aplicadas)} migraciones aplicadas' if aplicadas else 'El esquema está al día')
+
+    @app.cli.command('verificar-consultas')
+    @click.option('--detalle', is_flag=True, help='Mostrar el plan de EXPLAIN de cada consulta')
+    def verificar_consultas(detalle):
+        """Falla (código 1) si una consulta frecuente recorre completa una tabla grande"""
+        from .consultas_frecuentes import verificar_planes
+
+        resultados = verificar_planes()
+        for resultado in resultados:
+            estado = 'OK   ' if resultado['ok'] else 'FALLA'
+            extra = '' if resultado['ok'] else f" (recorrido completo: {', '.join(resultado['recorridos_completos'])})"
+            click.echo(f"{estado} {resultado['nombre']}{extra}")
+            if detalle:
+                for fila in resultado['plan']:
+                    click.echo(f"        {fila.get('table')}: type={fila.get('type')} key={fila.get('key')} rows={fila.get('rows')}")
+
+        if not all(resultado['ok'] for resultado in resultados):
+            raise SystemExit(1)
+
+    @app.cli.command('hashear-contrasenas')
+    def hashear_contrasenas():
+        """Reemplaza las contraseñas en texto plano de usuarios por su hash"""
+        from .database import mysql
+        from .services.autenticacion import autenticacion, PREFIJOS_HASH
+
+        cursor = mysql.connection.cursor()
+        try:
+            cursor.execute("SELECT id, contraseña FROM usuarios")
+            pendientes = [
+                (autenticacion.hashear(fila[1]), fila[0])
+                for fila in cursor.fetchall()
+                if fila[1] and not fila[1].startswith(PREFIJOS_HASH)
+            ]
+            cursor.executemany("UPDATE usuarios SET contraseña = %s WHERE id = %s", pendientes)
+            mysql.connection.commit()
+        finally:
+            cursor.close()
+        click.echo(f'Contraseñas convertidas a hash: {len(pendientes)}')
@@ -0,0 +1,166 @@
+# backend/app/consultas_frecuentes.py
+
+#--> Consultas de los caminos más usados y verificación de sus planes con EXPLAIN.
+#    `flask verificar-consultas` falla si alguna vuelve a recorrer completa
+#    (type = ALL) una de las tablas grandes que toca. Conviene correrlo contra una
+#    base con volumen real (o la de benchmarks): con tablas casi vacías MySQL
+#    puede preferir un recorrido completo aunque exista el índice.
+from .database import mysql
+
+# (nombre, consulta, parámetros de ejemplo, tablas que no deben recorrerse completas)
+CONSULTAS_FRECUENTES = [
+    (
+        'ventas_producto_por_rango',
+        """
+        SELECT f.fecha, SUM(d.cantidad)
+        FROM detalle_factura d
+        INNER JOIN facturas f ON d.factura_id = f.id
+        WHERE d.producto_id = %s AND f.fecha >= %s AND f.fecha < %s
+        GROUP BY f.fecha
+        """,
+        (1, '2024-01-01', '2024-04-01'),
+        ['detalle_factura', 'facturas']
+    ),
+    (
+        'productos_facturados_desde',
+        """
+        SELECT DISTINCT d.producto_id
+        FROM facturas f
+        INNER JOIN detalle_factura d ON d.factura_id = f.id
+        WHERE f.fecha >= %s
+        """,
+        ('2024-01-01',),
+        ['facturas']
+    ),
+    (
+        'ventas_diarias_por_productos',
+        """
+        SELECT producto_id, fecha, cantidad
+        FROM ventas_diarias_producto
+        WHERE producto_id IN (%s, %s, %s)
+            AND fecha >= DATE_SUB(CURDATE(), INTERVAL %s DAY)
+        ORDER BY producto_id, fecha
+        """,
+        (1, 2, 3, 90),
+        ['ventas_diarias_producto']
+    ),
+    (
+        'facturas_por_fecha',
+        """
+        SELECT id, cliente_id, fecha, total
+        FROM facturas
+        WHERE fecha >= %s AND fecha < %s
+        ORDER BY fecha DESC, id DESC
+        LIMIT 100
+        """,
+        ('2024-01-01', '2024-02-01'),
+        ['facturas']
+    ),
+    (
+        'entradas_recientes',
+        """
+        SELECT id, producto_id, cantidad, fecha
+        FROM entrada_stock
+        ORDER BY fecha DESC
+        LIMIT 100
+        """,
+        (),
+        ['entrada_stock']
+    ),
+    (
+        'entradas_por_producto',
+        """
+        SELECT id, proveedor_id, cantidad, fecha
+        FROM entrada_stock
+        WHERE producto_id = %s
+        ORDER BY fecha DESC
+        """,
+        (1,),
+        ['entrada_stock']
+    ),
+    (
+        'cliente_por_dni',
+        "SELECT id FROM clientes WHERE dni = %s",
+        ('12345678',),
+        ['clientes']
+    ),
+    (
+        'usuario_por_nombre',
+        "SELECT id, nombre, email, contraseña, rol_id FROM usuarios WHERE nombre = %s",
+        ('admin',),
+        ['usuarios']
+    ),
+    (
+        'productos_por_nombre',
+        """
+        SELECT id, nombre, stock_actual
+        FROM productos
+        WHERE (nombre, id) > (%s, %s)
+        ORDER BY nombre, id
+        LIMIT 100
+        """,
+        ('M', 0),
+        ['productos']
+    ),
+    (
+        'productos_por_categoria',
+        "SELECT id, nombre FROM productos WHERE categoria_id = %s ORDER BY nombre",
+        (1,),
+        ['productos']
+    ),
+    (
+        'pronosticos_de_corrida',
+        "SELECT producto_id, demanda_estimada FROM pronosticos_producto WHERE corrida_id = %s",
+        (1,),
+        ['pronosticos_producto']
+    ),
+]
+
+def _filas(cursor):
+    """Filas del último resultado como dict, sin importar la clase de cursor"""
+    columnas = [columna[0] for columna in cursor.description]
+    return [
+        fila if isinstance(fila, dict) else dict(zip(columnas, fila))
+        for fila in cursor.fetchall()
+    ]
+
+def verificar_planes():
+    """
+    Ejecuta EXPLAIN sobre cada consulta frecuente
+
+    Returns:
+        list: Un dict por consulta: {'nombre', 'ok', 'recorridos_completos': [tablas],
+              'plan': [filas de EXPLAIN]}
+    """
+    cursor = mysql.connection.cursor()
+    resultados = []
+
+    try:
+        for nombre, consulta, parametros, tablas in CONSULTAS_FRECUENTES:
+            cursor.execute('EXPLAIN ' + consulta, parametros)
+            plan = _filas(cursor)
+
+            # EXPLAIN muestra el alias (f, d) si la tabla lo tiene; se compara
+            # contra el nombre real con la columna 'table' de cada fila
+            alias = {
+                palabra_siguiente: tabla
+                for tabla in tablas
+                for palabra, palabra_siguiente in zip(consulta.split(), consulta.split()[1:])
+                if palabra == tabla
+            }
+            completos = sorted({
+                alias.get(fila['table'], fila['table'])
+                for fila in plan
+                if fila.get('type') == 'ALL' and alias.get(fila['table'], fila['table']) in tablas
+            })
+
+            resultados.append({
+                'nombre': nombre,
+                'ok': not completos,
+                'recorridos_completos': completos,
+                'plan': plan
+            })
+    finally:
+        cursor.close()
+
+    return resultados
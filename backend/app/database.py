@@ -1,3 +1,262 @@
+# backend/app/database.py
+
+#--> Conexiones a MySQL reutilizadas desde un pool por proceso.
+#    Todas las rutas y servicios usan `mysql.connection` (misma interfaz que
+#    flask_mysqldb): la primera vez que se pide en un contexto de aplicación
+#    se toma una conexión del pool y al cerrar el contexto se devuelve.
+import os
+import threading
+import time
+from collections import deque
+
+import MySQLdb
+import MySQLdb.cursors
+from flask import g
+
+class ErrorPoolAgotado(Exception):
+    """No se liberó ninguna conexión dentro del tiempo de espera"""
+
+class _ConexionEnPool:
+    """Conexión física con sus marcas de tiempo de creación y último uso"""
+
+    def __init__(self, conexion):
+        self.conexion = conexion
+        self.creada_en = time.monotonic()
+        self.usada_en = self.creada_en
+
+class PoolConexiones:
+
+    def __init__(self, crear_conexion, min_conexiones=1, max_conexiones=10,
+                 tiempo_espera=10, vida_maxima=1800, intervalo_ping=30):
+        """
+        Args:
+            crear_conexion: Función sin argumentos que abre una conexión nueva
+            min_conexiones: Conexiones que se mantienen abiertas aunque estén libres
+            max_conexiones: Máximo de conexiones abiertas a la vez
+            tiempo_espera: Segundos que se espera una conexión libre antes de fallar
+            vida_maxima: Segundos tras los cuales una conexión se cierra y se reemplaza
+            intervalo_ping: Una conexión libre por más de estos segundos se verifica
+                            con ping() antes de entregarla
+        """
+        self.crear_conexion = crear_conexion
+        self.min_conexiones = min_conexiones
+        self.max_conexiones = max_conexiones
+        self.tiempo_espera = tiempo_espera
+        self.vida_maxima = vida_maxima
+        self.intervalo_ping = intervalo_ping
+
+        self._libres = deque()  # _ConexionEnPool, la última usada al final
+        self._abiertas = 0
+        self._condicion = threading.Condition()
+        self._pid = os.getpid()
+
+        self.entregas = 0
+        self.esperas = 0
+        self.segundos_espera = 0.0
+        self.espera_maxima = 0.0
+        self.agotamientos = 0
+        self.creadas = 0
+        self.descartadas = 0
+
+    def _verificar_proceso(self):
+        """Tras un fork (workers de gunicorn) las conexiones heredadas no se comparten"""
+        if self._pid != os.getpid():
+            self._libres.clear()
+            self._abiertas = 0
+            self._pid = os.getpid()
+
+    def _vencida(self, entrada, ahora):
+        return self.vida_maxima and ahora - entrada.creada_en > self.vida_maxima
+
+    def _cerrar(self, entrada):
+        self.descartadas += 1
+        try:
+            entrada.conexion.close()
+        except Exception:
+            pass
+
+    def _esta_sana(self, entrada, ahora):
+        if ahora - entrada.usada_en < self.intervalo_ping:
+            return True
+        try:
+            entrada.conexion.ping()
+            return True
+        except Exception:
+            return False
+
+    def _abrir(self):
+        """Abre una conexión fuera del lock; el cupo ya fue reservado en _abiertas"""
+        try:
+            entrada = _ConexionEnPool(self.crear_conexion())
+        except Exception:
+            with self._condicion:
+                self._abiertas -= 1
+                self._condicion.notify()
+            raise
+        with self._condicion:
+            self.creadas += 1
+        return entrada
+
+    def obtener(self):
+        """
+        Entrega una conexión sana del pool, abriendo una nueva si hay cupo
+
+        Raises:
+            ErrorPoolAgotado: Si no se libera ninguna en `tiempo_espera` segundos
+        """
+        inicio = time.monotonic()
+        limite = inicio + self.tiempo_espera
+        espero = False
+
+        while True:
+            with self._condicion:
+                self._verificar_proceso()
+                while not self._libres and self._abiertas >= self.max_conexiones:
+                    restante = limite - time.monotonic()
+                    if restante <= 0:
+                        self.agotamientos += 1
+                        raise ErrorPoolAgotado(
+                            f'No hay conexiones libres ({self.max_conexiones} en uso) '
+                            f'tras {self.tiempo_espera} s de espera'
+                        )
+                    espero = True
+                    self._condicion.wait(restante)
+
+                if self._libres:
+                    entrada = self._libres.pop()
+                else:
+                    entrada = None
+                    self._abiertas += 1
+
+            if entrada is None:
+                entrada = self._abrir()
+            else:
+                ahora = time.monotonic()
+                if self._vencida(entrada, ahora) or not self._esta_sana(entrada, ahora):
+                    # Se descarta y se vuelve a intentar
+                    with self._condicion:
+                        self._abiertas -= 1
+                        self._cerrar(entrada)
+                        self._condicion.notify()
+                    continue
+
+            espera = time.monotonic() - inicio
+            with self._condicion:
+                self.entregas += 1
+                if espero:
+                    self.esperas += 1
+                    self.segundos_espera += espera
+                    self.espera_maxima = max(self.espera_maxima, espera)
+            return entrada
+
+    def devolver(self, entrada, descartar=False):
+        """Devuelve una conexión al pool (o la cierra si está vencida o dañada)"""
+        ahora = time.monotonic()
+        if not descartar:
+            try:
+                # No dejar transacciones abiertas para el siguiente usuario
+                entrada.conexion.rollback()
+            except Exception:
+                descartar = True
+
+        with self._condicion:
+            if self._pid != os.getpid():
+                return
+            if descartar or self._vencida(entrada, ahora):
+                self._abiertas -= 1
+                self._cerrar(entrada)
+            else:
+                entrada.usada_en = ahora
+                self._libres.append(entrada)
+                # Cerrar las libres que excedan el mínimo y lleven más de un intervalo sin uso
+                while (len(self._libres) > self.min_conexiones
+                       and ahora - self._libres[0].usada_en > self.intervalo_ping):
+                    self._abiertas -= 1
+                    self._cerrar(self._libres.popleft())
+            self._condicion.notify()
+
+    def estadisticas(self):
+        """Contadores del pool (por proceso)"""
+        with self._condicion:
+            return {
+                'abiertas': self._abiertas,
+                'libres': len(self._libres),
+                'en_uso': self._abiertas - len(self._libres),
+                'min_conexiones': self.min_conexiones,
+                'max_conexiones': self.max_conexiones,
+                'entregas': self.entregas,
+                'esperas': self.esperas,
+                'segundos_espera': round(self.segundos_espera, 3),
+                'espera_maxima': round(self.espera_maxima, 3),
+                'agotamientos': self.agotamientos,
+                'creadas': self.creadas,
+                'descartadas': self.descartadas
+            }
+
+class MySQL:
+    """Reemplazo de flask_mysqldb.MySQL que toma las conexiones de un PoolConexiones"""
+
+    def __init__(self, app=None):
+        self.pool = None
+        # Función opcional conexion -> conexion (ver instrumentacion_sql)
+        self.envolver = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Lee la configuración MYSQL_* (las mismas claves que flask_mysqldb) y
+        MYSQL_POOL_MIN, MYSQL_POOL_MAX, MYSQL_POOL_TIMEOUT,
+        MYSQL_POOL_MAX_LIFETIME y MYSQL_POOL_PING_INTERVAL
+        """
+        config = app.config
+
+        def crear_conexion():
+            kwargs = {
+                'host': config.get('MYSQL_HOST', 'localhost'),
+                'user': config.get('MYSQL_USER'),
+                'passwd': config.get('MYSQL_PASSWORD'),
+                'db': config.get('MYSQL_DB'),
+                'port': config.get('MYSQL_PORT', 3306),
+                'charset': config.get('MYSQL_CHARSET', 'utf8mb4'),
+                'connect_timeout': config.get('MYSQL_CONNECT_TIMEOUT', 10),
+                'autocommit': config.get('MYSQL_AUTOCOMMIT', False)
+            }
+            if config.get('MYSQL_UNIX_SOCKET'):
+                kwargs['unix_socket'] = config['MYSQL_UNIX_SOCKET']
+            if config.get('MYSQL_CURSORCLASS'):
+                kwargs['cursorclass'] = getattr(MySQLdb.cursors, config['MYSQL_CURSORCLASS'])
+            kwargs.update(config.get('MYSQL_CUSTOM_OPTIONS') or {})
+            return MySQLdb.connect(**{k: v for k, v in kwargs.items() if v is not None})
+
+        self.pool = PoolConexiones(
+            crear_conexion,
+            min_conexiones=config.get('MYSQL_POOL_MIN', 1),
+            max_conexiones=config.get('MYSQL_POOL_MAX', 10),
+            tiempo_espera=config.get('MYSQL_POOL_TIMEOUT', 10),
+            vida_maxima=config.get('MYSQL_POOL_MAX_LIFETIME', 1800),
+            intervalo_ping=config.get('MYSQL_POOL_PING_INTERVAL', 30)
+        )
+        app.teardown_appcontext(self.teardown)
+
+    @property
+    def connection(self):
+        """Conexión del contexto actual (se toma del pool en el primer uso)"""
+        entrada = g.get('_mysql_conexion')
+        if entrada is None:
+            entrada = self.pool.obtener()
+            g._mysql_conexion = entrada
+        if self.envolver is not None:
+            return self.envolver(entrada.conexion)
+        return entrada.conexion
+
+    def teardown(self, exception):
+        entrada = g.pop('_mysql_conexion', None)
+        if entrada is not None:
+            # Un error de MySQL puede dejar la conexión en un estado inválido
+            self.pool.devolver(entrada, descartar=isinstance(exception, MySQLdb.OperationalError))
+
+    def estadisticas(self):
+        return self.pool.estadisticas() if self.pool else {}
 
-from flask_mysqldb import MySQL
 mysql=MySQL()
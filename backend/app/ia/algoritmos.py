@@ -212,4 +212,178 @@ def predecir_demanda_futura(ventas_data, dias_prediccion=30):
         'demanda_estimada': round(demanda_estimada, 1),
         'tendencia': tendencia,
         'confianza': confianza
-    }
\ No newline at end of file
+    }
+
+# ---------------------------------------------------------------------------
+# Versiones matriciales para todo el catálogo
+#
+# Trabajan sobre una matriz productos x días donde NaN significa "sin registro
+# de ventas ese día", de modo que cada fila reproduce exactamente la lista de
+# ventas que recibirían calcular_promedio_movil y predecir_demanda_futura.
+# ---------------------------------------------------------------------------
+
+def construir_matriz_ventas(ventas_df):
+    """
+    Convierte un DataFrame largo de ventas en una matriz productos x días
+    
+    Args:
+        ventas_df: DataFrame con columnas ['producto_id', 'fecha', 'cantidad']
+    
+    Returns:
+        tuple: (producto_ids, matriz) con matriz[i, j] = cantidad vendida del
+               producto i el día j, o NaN si no hubo ventas ese día
+    """
+    if ventas_df is None or ventas_df.empty:
+        return np.array([]), np.empty((0, 0))
+    
+    df = ventas_df.copy()
+    df['fecha'] = pd.to_datetime(df['fecha'])
+    
+    tabla = df.pivot_table(
+        index='producto_id',
+        columns='fecha',
+        values='cantidad',
+        aggfunc='sum'
+    ).sort_index(axis=1)
+    
+    return tabla.index.to_numpy(), tabla.to_numpy(dtype=float)
+
+def _posiciones_validas(matriz):
+    """
+    Calcula, por fila, qué celdas tienen ventas, su posición ordinal (1..n)
+    entre las celdas con ventas y el total n de días con ventas
+    """
+    validos = ~np.isnan(matriz)
+    posiciones = np.cumsum(validos, axis=1)
+    totales = validos.sum(axis=1)
+    return validos, posiciones, totales
+
+def _promedio_filas(matriz, mascara):
+    """
+    Promedio por fila de las celdas marcadas en la máscara (0 si no hay ninguna)
+    """
+    suma = np.where(mascara, matriz, 0.0).sum(axis=1)
+    conteo = mascara.sum(axis=1)
+    return np.divide(suma, conteo, out=np.zeros(len(suma)), where=conteo > 0)
+
+def calcular_promedio_movil_matriz(matriz, ventana_dias=30):
+    """
+    Calcula el promedio móvil de todos los productos en una sola pasada
+    
+    Args:
+        matriz: Array productos x días (NaN = día sin ventas)
+        ventana_dias: Días con ventas a considerar, contando desde el final
+    
+    Returns:
+        np.ndarray: Promedio de ventas diarias por producto
+    """
+    matriz = np.asarray(matriz, dtype=float)
+    if matriz.size == 0:
+        return np.zeros(matriz.shape[0])
+    
+    validos, posiciones, totales = _posiciones_validas(matriz)
+    
+    # Últimos N registros de cada fila (o todos si hay pocos)
+    ventana = validos & (posiciones > (totales - ventana_dias)[:, None])
+    
+    return _promedio_filas(matriz, ventana)
+
+def predecir_demanda_matriz(matriz, dias_prediccion=30):
+    """
+    Predice la demanda futura de todos los productos en una sola pasada
+    
+    Args:
+        matriz: Array productos x días (NaN = día sin ventas)
+        dias_prediccion: Días a predecir hacia adelante
+    
+    Returns:
+        dict: {'demanda_estimada': np.ndarray, 'tendencia': np.ndarray,
+               'confianza': np.ndarray}, un valor por producto
+    """
+    matriz = np.asarray(matriz, dtype=float)
+    if matriz.size == 0:
+        vacio = np.array([], dtype=object)
+        return {
+            'demanda_estimada': np.zeros(matriz.shape[0]),
+            'tendencia': vacio,
+            'confianza': vacio
+        }
+    
+    validos, posiciones, totales = _posiciones_validas(matriz)
+    mitad = (totales // 2)[:, None]
+    
+    # Calcular tendencia (comparar primera y segunda mitad)
+    primera_mitad = _promedio_filas(matriz, validos & (posiciones <= mitad))
+    segunda_mitad = _promedio_filas(matriz, validos & (posiciones > mitad))
+    
+    # Promedio móvil de últimos 15 días
+    promedio_reciente = _promedio_filas(
+        matriz, validos & (posiciones > (totales - 15)[:, None])
+    )
+    
+    insuficiente = totales < 7
+    creciente = segunda_mitad > primera_mitad * 1.2
+    decreciente = segunda_mitad < primera_mitad * 0.8
+    
+    factor_ajuste = np.select([creciente, decreciente], [1.1, 0.9], default=1.0)
+    tendencia = np.select(
+        [insuficiente, creciente, decreciente],
+        ['Datos insuficientes', 'Creciente', 'Decreciente'],
+        default='Estable'
+    ).astype(object)
+    
+    demanda_estimada = np.where(
+        insuficiente,
+        0.0,
+        np.round(promedio_reciente * factor_ajuste * dias_prediccion, 1)
+    )
+    
+    # Evaluar confianza basada en cantidad de datos
+    confianza = np.select(
+        [insuficiente, totales >= 30, totales >= 14],
+        ['Baja', 'Alta', 'Media'],
+        default='Baja'
+    ).astype(object)
+    
+    return {
+        'demanda_estimada': demanda_estimada,
+        'tendencia': tendencia,
+        'confianza': confianza
+    }
+
+def predecir_demanda_catalogo(ventas_df, ventana_dias=30, dias_prediccion=30):
+    """
+    Calcula promedio móvil y predicción de demanda de todo el catálogo
+    
+    Args:
+        ventas_df: DataFrame largo con columnas ['producto_id', 'fecha', 'cantidad']
+        ventana_dias: Días para el promedio móvil
+        dias_prediccion: Días a predecir hacia adelante
+    
+    Returns:
+        pd.DataFrame: Indexado por producto_id con columnas 'promedio_diario',
+                      'demanda_estimada', 'tendencia' y 'confianza'
+    """
+    producto_ids, matriz = construir_matriz_ventas(ventas_df)
+    return predecir_demanda_catalogo_matriz(producto_ids, matriz, ventana_dias, dias_prediccion)
+
+def predecir_demanda_catalogo_matriz(producto_ids, matriz, ventana_dias=30, dias_prediccion=30):
+    """
+    Igual que predecir_demanda_catalogo, a partir de la matriz ya construida
+    con construir_matriz_ventas
+    
+    Returns:
+        pd.DataFrame: Indexado por producto_id con columnas 'promedio_diario',
+                      'demanda_estimada', 'tendencia' y 'confianza'
+    """
+    prediccion = predecir_demanda_matriz(matriz, dias_prediccion)
+    
+    return pd.DataFrame(
+        {
+            'promedio_diario': calcular_promedio_movil_matriz(matriz, ventana_dias),
+            'demanda_estimada': prediccion['demanda_estimada'],
+            'tendencia': prediccion['tendencia'],
+            'confianza': prediccion['confianza']
+        },
+        index=pd.Index(producto_ids, name='producto_id')
+    )
@@ -0,0 +1,154 @@
+"""
+Ejecutor de Pronósticos en Paralelo
+Reparte la matriz productos x días del catálogo en particiones de filas y
+calcula promedio móvil y predicción de demanda en varios procesos.
+
+La matriz se copia una sola vez a memoria compartida; cada proceso recibe
+solo el nombre del bloque y su rango de filas, y devuelve arreglos NumPy
+compactos (tendencia y confianza como códigos enteros).
+
+Cada worker web crea a lo sumo un pool de procesos, del tamaño fijado por
+PRONOSTICOS_PROCESOS_MAX, y lo reutiliza en todas las llamadas.
+"""
+
+import atexit
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import get_context, shared_memory
+
+import numpy as np
+import pandas as pd
+
+from app.ia.algoritmos import (
+    construir_matriz_ventas,
+    calcular_promedio_movil_matriz,
+    predecir_demanda_matriz,
+    predecir_demanda_catalogo_matriz
+)
+
+# Filas (productos) por tarea; catálogos más chicos se calculan en el mismo proceso
+FILAS_POR_PARTICION = 5000
+
+TENDENCIAS = np.array(['Datos insuficientes', 'Creciente', 'Decreciente', 'Estable'], dtype=object)
+CONFIANZAS = np.array(['Baja', 'Media', 'Alta'], dtype=object)
+
+# Tamaño del pool de cada worker (ver init_app)
+procesos_maximos = min(4, os.cpu_count() or 1)
+
+_ejecutor = None
+_lock_ejecutor = threading.Lock()
+
+def init_app(app):
+    """Lee PRONOSTICOS_PROCESOS_MAX de la configuración"""
+    global procesos_maximos
+    procesos_maximos = max(1, app.config.get('PRONOSTICOS_PROCESOS_MAX', procesos_maximos))
+
+def _codificar(valores, categorias):
+    codigos = {valor: i for i, valor in enumerate(categorias)}
+    return np.fromiter((codigos[v] for v in valores), dtype=np.int8, count=len(valores))
+
+def _calcular_particion(nombre_memoria, forma, inicio, fin, ventana_dias, dias_prediccion):
+    """Tarea de un proceso: pronostica las filas [inicio, fin) de la matriz compartida"""
+    memoria = shared_memory.SharedMemory(name=nombre_memoria)
+    matriz = None
+    try:
+        matriz = np.ndarray(forma, dtype=np.float64, buffer=memoria.buf)[inicio:fin]
+        promedio = calcular_promedio_movil_matriz(matriz, ventana_dias)
+        prediccion = predecir_demanda_matriz(matriz, dias_prediccion)
+        return (
+            inicio,
+            promedio,
+            prediccion['demanda_estimada'],
+            _codificar(prediccion['tendencia'], TENDENCIAS),
+            _codificar(prediccion['confianza'], CONFIANZAS)
+        )
+    finally:
+        del matriz
+        memoria.close()
+
+def _obtener_ejecutor():
+    """Pool de procesos único del worker, creado en el primer uso"""
+    global _ejecutor
+    with _lock_ejecutor:
+        if _ejecutor is None:
+            # spawn: los procesos no heredan hilos ni conexiones MySQL del worker web
+            _ejecutor = ProcessPoolExecutor(max_workers=procesos_maximos, mp_context=get_context('spawn'))
+        return _ejecutor
+
+@atexit.register
+def cerrar_ejecutor():
+    global _ejecutor
+    with _lock_ejecutor:
+        if _ejecutor is not None:
+            _ejecutor.shutdown(wait=False, cancel_futures=True)
+            _ejecutor = None
+
+def predecir_catalogo_en_paralelo(ventas_df, ventana_dias=30, dias_prediccion=30,
+                                  procesos=None, filas_por_particion=FILAS_POR_PARTICION):
+    """
+    Igual que predecir_demanda_catalogo, repartiendo el cálculo entre procesos
+
+    Args:
+        ventas_df: DataFrame largo con columnas ['producto_id', 'fecha', 'cantidad']
+        ventana_dias: Días para el promedio móvil
+        dias_prediccion: Días a predecir hacia adelante
+        procesos: Particiones calculadas a la vez (por defecto y como máximo,
+                  PRONOSTICOS_PROCESOS_MAX)
+        filas_por_particion: Productos por tarea
+
+    Returns:
+        pd.DataFrame: Indexado por producto_id con columnas 'promedio_diario',
+                      'demanda_estimada', 'tendencia' y 'confianza'
+    """
+    procesos = min(procesos or procesos_maximos, procesos_maximos)
+    producto_ids, matriz = construir_matriz_ventas(ventas_df)
+
+    if procesos == 1 or len(producto_ids) <= filas_por_particion:
+        return predecir_demanda_catalogo_matriz(producto_ids, matriz, ventana_dias, dias_prediccion)
+
+    matriz = np.ascontiguousarray(matriz, dtype=np.float64)
+    memoria = shared_memory.SharedMemory(create=True, size=matriz.nbytes)
+    try:
+        np.ndarray(matriz.shape, dtype=np.float64, buffer=memoria.buf)[:] = matriz
+
+        ejecutor = _obtener_ejecutor()
+        inicios = list(range(0, len(producto_ids), filas_por_particion))
+
+        promedio = np.empty(len(producto_ids))
+        demanda = np.empty(len(producto_ids))
+        tendencia = np.empty(len(producto_ids), dtype=np.int8)
+        confianza = np.empty(len(producto_ids), dtype=np.int8)
+
+        # Como mucho `procesos` particiones en el pool a la vez; el pool es
+        # compartido con las demás solicitudes del worker
+        en_curso = set()
+        while inicios or en_curso:
+            while inicios and len(en_curso) < procesos:
+                inicio = inicios.pop(0)
+                en_curso.add(ejecutor.submit(
+                    _calcular_particion, memoria.name, matriz.shape,
+                    inicio, min(inicio + filas_por_particion, len(producto_ids)),
+                    ventana_dias, dias_prediccion
+                ))
+            terminadas, en_curso = wait(en_curso, return_when=FIRST_COMPLETED)
+            for tarea in terminadas:
+                inicio, promedio_p, demanda_p, tendencia_p, confianza_p = tarea.result()
+                fin = inicio + len(promedio_p)
+                promedio[inicio:fin] = promedio_p
+                demanda[inicio:fin] = demanda_p
+                tendencia[inicio:fin] = tendencia_p
+                confianza[inicio:fin] = confianza_p
+    finally:
+        memoria.close()
+        memoria.unlink()
+
+    return pd.DataFrame(
+        {
+            'promedio_diario': promedio,
+            'demanda_estimada': demanda,
+            'tendencia': TENDENCIAS[tendencia],
+            'confianza': CONFIANZAS[confianza]
+        },
+        index=pd.Index(producto_ids, name='producto_id')
+    )
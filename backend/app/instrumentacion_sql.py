@@ -0,0 +1,146 @@
+# backend/app/instrumentacion_sql.py
+
+#--> Medición de las consultas SQL de cada solicitud: cantidad, tiempo, filas
+#    y detección de N+1 (la misma sentencia normalizada repetida muchas veces).
+#    Los totales salen en el encabezado Server-Timing y en una línea de log JSON.
+#    Las consultas que corren mientras se envía una respuesta en streaming no se cuentan.
+import json
+import re
+import time
+from functools import lru_cache
+
+from flask import g, request
+
+_LITERALES = re.compile(r"'(?:[^'\\]|\\.|'')*'|\b\d+(?:\.\d+)?\b")
+_LISTAS = re.compile(r"\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))*\s*\)")
+_ESPACIOS = re.compile(r'\s+')
+
+@lru_cache(maxsize=2048)
+def normalizar_sentencia(sql):
+    """Sentencia sin literales, con listas IN (...) / VALUES (...) colapsadas y espacios simples"""
+    if isinstance(sql, bytes):
+        sql = sql.decode('utf-8', 'replace')
+    sql = _LITERALES.sub('?', sql)
+    sql = _LISTAS.sub('(...)', sql)
+    return _ESPACIOS.sub(' ', sql).strip()
+
+class RegistroConsultas:
+    """Consultas ejecutadas durante una solicitud"""
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.cantidad = 0
+        self.segundos = 0.0
+        self.filas = 0
+        self.por_sentencia = {}  # sentencia normalizada -> [veces, segundos]
+
+    def registrar(self, sql, segundos, filas):
+        self.cantidad += 1
+        self.segundos += segundos
+        if filas and filas > 0:
+            self.filas += filas
+        acumulado = self.por_sentencia.setdefault(normalizar_sentencia(sql), [0, 0.0])
+        acumulado[0] += 1
+        acumulado[1] += segundos
+
+    def repetidas(self, umbral):
+        """Sentencias ejecutadas más de `umbral` veces (probable N+1)"""
+        return sorted(
+            (
+                {'sentencia': sentencia, 'veces': veces, 'ms': round(segundos * 1000, 2)}
+                for sentencia, (veces, segundos) in self.por_sentencia.items()
+                if veces > umbral
+            ),
+            key=lambda repetida: -repetida['veces']
+        )
+
+class CursorInstrumentado:
+    """Cursor que mide execute/executemany y delega todo lo demás"""
+
+    def __init__(self, cursor, registro):
+        self._cursor = cursor
+        self._registro = registro
+
+    def execute(self, query, args=None):
+        inicio = time.perf_counter()
+        try:
+            return self._cursor.execute(query, args)
+        finally:
+            self._registro.registrar(query, time.perf_counter() - inicio, self._cursor.rowcount)
+
+    def executemany(self, query, args):
+        inicio = time.perf_counter()
+        try:
+            return self._cursor.executemany(query, args)
+        finally:
+            self._registro.registrar(query, time.perf_counter() - inicio, self._cursor.rowcount)
+
+    def __getattr__(self, nombre):
+        return getattr(self._cursor, nombre)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+class ConexionInstrumentada:
+    """Conexión cuyos cursores registran sus consultas"""
+
+    def __init__(self, conexion, registro):
+        self._conexion = conexion
+        self._registro = registro
+
+    def cursor(self, *args, **kwargs):
+        return CursorInstrumentado(self._conexion.cursor(*args, **kwargs), self._registro)
+
+    def __getattr__(self, nombre):
+        return getattr(self._conexion, nombre)
+
+def _envolver(conexion):
+    registro = g.get('_registro_sql')
+    return conexion if registro is None else ConexionInstrumentada(conexion, registro)
+
+def init_app(app, mysql):
+    """
+    Activa la medición si SQL_INSTRUMENTACION es verdadero
+    SQL_UMBRAL_N_MAS_1: veces que puede repetirse una sentencia antes de avisar
+    """
+    if not app.config.get('SQL_INSTRUMENTACION', True):
+        return
+
+    umbral = app.config.get('SQL_UMBRAL_N_MAS_1', 10)
+    mysql.envolver = _envolver
+
+    @app.before_request
+    def iniciar_registro_sql():
+        g._registro_sql = RegistroConsultas()
+
+    @app.after_request
+    def informar_registro_sql(response):
+        registro = g.pop('_registro_sql', None)
+        if registro is None:
+            return response
+
+        total_ms = (time.perf_counter() - registro.inicio) * 1000
+        db_ms = registro.segundos * 1000
+        response.headers.add(
+            'Server-Timing',
+            f'db;dur={db_ms:.2f};desc="{registro.cantidad} consultas", app;dur={total_ms:.2f}'
+        )
+
+        repetidas = registro.repetidas(umbral)
+        linea = {
+            'metodo': request.method,
+            'ruta': request.path,
+            'endpoint': request.endpoint,
+            'estado': response.status_code,
+            'duracion_ms': round(total_ms, 2),
+            'consultas': registro.cantidad,
+            'db_ms': round(db_ms, 2),
+            'filas': registro.filas
+        }
+        if repetidas:
+            linea['n_mas_1'] = repetidas
+            app.logger.warning(json.dumps(linea, ensure_ascii=False))
+        else:
+            app.logger.info(json.dumps(linea, ensure_ascii=False))
+
+        return response
@@ -0,0 +1,246 @@
+# backend/app/metricas.py
+
+#--> Métricas en formato Prometheus en GET /metrics: latencia por ruta,
+#    solicitudes y errores, consultas SQL, pool de conexiones, caché, reportes
+#    y corridas de pronósticos.
+#    Cada hilo acumula en sus propios contadores (sin locks en el camino de la
+#    solicitud); /metrics suma los de todos los hilos al leer. Los contadores
+#    de hilos que terminaron se pasan a un almacén acumulado, para que los
+#    pools de hilos que se renuevan no hagan crecer la lista sin límite.
+#    Las métricas son por proceso: Prometheus debe consultar cada worker o
+#    sumar por instancia.
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+
+from flask import Response, g, request
+
+# Límites superiores (segundos) de los buckets de los histogramas
+BUCKETS_SOLICITUD = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BUCKETS_REPORTE = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+AYUDAS = {
+    'erp_solicitudes_total': ('counter', 'Solicitudes HTTP atendidas'),
+    'erp_solicitudes_error_total': ('counter', 'Solicitudes HTTP con estado 5xx'),
+    'erp_solicitud_duracion_segundos': ('histogram', 'Duración de las solicitudes HTTP'),
+    'erp_db_consultas_total': ('counter', 'Consultas SQL ejecutadas durante solicitudes'),
+    'erp_db_segundos_total': ('counter', 'Tiempo en consultas SQL durante solicitudes'),
+    'erp_reporte_duracion_segundos': ('histogram', 'Duración de la generación de cada reporte'),
+    'erp_reporte_productos': ('gauge', 'Productos en la última generación de cada reporte'),
+    'erp_pronostico_duracion_segundos': ('histogram', 'Duración de las corridas de pronósticos'),
+    'erp_pronostico_productos': ('gauge', 'Productos calculados en la última corrida de pronósticos'),
+    'erp_trabajo_duracion_segundos': ('histogram', 'Duración de los trabajos en segundo plano'),
+    'erp_db_pool_conexiones': ('gauge', 'Conexiones del pool MySQL por estado'),
+    'erp_db_pool_esperas_total': ('counter', 'Entregas del pool que tuvieron que esperar'),
+    'erp_db_pool_agotamientos_total': ('counter', 'Esperas del pool que vencieron sin conexión'),
+    'erp_db_pool_espera_segundos_total': ('counter', 'Tiempo total esperando conexiones del pool'),
+    'erp_cache_reportes': ('gauge', 'Contadores de la caché de reportes'),
+    'erp_catalogo_productos': ('gauge', 'Contadores del catálogo de productos en memoria'),
+}
+
+class Metricas:
+
+    def __init__(self):
+        self._local = threading.local()
+        self._almacenes = []           # (hilo, almacén) por hilo vivo: {(metrica, etiquetas): valor o [buckets..., cantidad, suma]}
+        self._retirados = {}           # suma de los almacenes de hilos ya terminados
+        self._lock_almacenes = threading.Lock()
+        self._medidores = {}           # gauges de último valor: {(metrica, etiquetas): valor}
+        self._buckets = {}             # metrica -> límites del histograma
+        self._recolectores = []        # funciones que devuelven [(metrica, etiquetas, valor)] al leer
+
+    def _almacen(self):
+        almacen = getattr(self._local, 'almacen', None)
+        if almacen is None:
+            almacen = self._local.almacen = {}
+            with self._lock_almacenes:
+                self._retirar_terminados()
+                self._almacenes.append((threading.current_thread(), almacen))
+        return almacen
+
+    @staticmethod
+    def _acumular(destino, almacen):
+        for clave, valor in list(almacen.items()):
+            if isinstance(valor, list):
+                total = destino.setdefault(clave, [0] * len(valor))
+                for i, parcial in enumerate(valor):
+                    total[i] += parcial
+            else:
+                destino[clave] = destino.get(clave, 0) + valor
+
+    def _retirar_terminados(self):
+        """Suma en _retirados los almacenes de hilos terminados (con _lock_almacenes tomado)"""
+        vivos = []
+        for hilo, almacen in self._almacenes:
+            if hilo.is_alive():
+                vivos.append((hilo, almacen))
+            else:
+                # El hilo ya no escribe: se puede leer sin carreras
+                self._acumular(self._retirados, almacen)
+        self._almacenes = vivos
+
+    def incrementar(self, metrica, etiquetas=(), valor=1):
+        """Suma a un contador; etiquetas es una tupla de pares (nombre, valor)"""
+        almacen = self._almacen()
+        clave = (metrica, etiquetas)
+        almacen[clave] = almacen.get(clave, 0) + valor
+
+    def observar(self, metrica, etiquetas, valor, buckets=BUCKETS_SOLICITUD):
+        """Registra un valor en un histograma"""
+        self._buckets.setdefault(metrica, buckets)
+        almacen = self._almacen()
+        clave = (metrica, etiquetas)
+        acumulado = almacen.get(clave)
+        if acumulado is None:
+            acumulado = almacen[clave] = [0] * (len(buckets) + 2)
+        acumulado[bisect_left(buckets, valor)] += 1
+        acumulado[-2] += 1
+        acumulado[-1] += valor
+
+    def fijar(self, metrica, etiquetas, valor):
+        """Fija el valor actual de un gauge"""
+        self._medidores[(metrica, etiquetas)] = valor
+
+    def agregar_recolector(self, funcion):
+        """Registra una función que aporta valores leídos en el momento de /metrics"""
+        self._recolectores.append(funcion)
+
+    def _sumar_almacenes(self):
+        total = {}
+        with self._lock_almacenes:
+            self._retirar_terminados()
+            self._acumular(total, self._retirados)
+            almacenes = [almacen for _, almacen in self._almacenes]
+        for almacen in almacenes:
+            self._acumular(total, almacen)
+        contadores = {clave: valor for clave, valor in total.items() if not isinstance(valor, list)}
+        histogramas = {clave: valor for clave, valor in total.items() if isinstance(valor, list)}
+        return contadores, histogramas
+
+    @staticmethod
+    def _etiquetas(etiquetas, extra=()):
+        pares = tuple(etiquetas) + tuple(extra)
+        if not pares:
+            return ''
+        texto = ','.join(
+            '{}="{}"'.format(nombre, str(valor).replace('\\', '\\\\').replace('"', '\\"'))
+            for nombre, valor in pares
+        )
+        return '{' + texto + '}'
+
+    def exportar(self):
+        """Texto en formato de exposición de Prometheus"""
+        contadores, histogramas = self._sumar_almacenes()
+        simples = dict(contadores)
+        simples.update(self._medidores)
+        for recolector in self._recolectores:
+            for metrica, etiquetas, valor in recolector():
+                simples[(metrica, etiquetas)] = valor
+
+        por_metrica = {}
+        for (metrica, etiquetas), valor in simples.items():
+            por_metrica.setdefault(metrica, []).append(('', etiquetas, valor))
+        for (metrica, etiquetas), valores in histogramas.items():
+            lineas = por_metrica.setdefault(metrica, [])
+            acumulado = 0
+            for limite, cantidad in zip(self._buckets[metrica] + ('+Inf',), valores[:-2]):
+                acumulado += cantidad
+                lineas.append(('_bucket', etiquetas + (('le', limite),), acumulado))
+            lineas.append(('_count', etiquetas, valores[-2]))
+            lineas.append(('_sum', etiquetas, round(valores[-1], 6)))
+
+        salida = []
+        for metrica in sorted(por_metrica):
+            tipo, ayuda = AYUDAS.get(metrica, ('untyped', metrica))
+            salida.append(f'# HELP {metrica} {ayuda}')
+            salida.append(f'# TYPE {metrica} {tipo}')
+            for sufijo, etiquetas, valor in por_metrica[metrica]:
+                salida.append(f'{metrica}{sufijo}{self._etiquetas(etiquetas)} {valor}')
+        return '\n'.join(salida) + '\n'
+
+    def medir_reporte(self, nombre):
+        """Decorador: duración de la generación y productos del reporte devuelto"""
+        def decorador(funcion):
+            @wraps(funcion)
+            def envoltura(*args, **kwargs):
+                inicio = time.perf_counter()
+                reporte = funcion(*args, **kwargs)
+                etiquetas = (('reporte', nombre),)
+                self.observar('erp_reporte_duracion_segundos', etiquetas,
+                              time.perf_counter() - inicio, BUCKETS_REPORTE)
+                if isinstance(reporte, dict) and isinstance(reporte.get('data'), list):
+                    self.fijar('erp_reporte_productos', etiquetas, len(reporte['data']))
+                return reporte
+            return envoltura
+        return decorador
+
+    def init_app(self, app, mysql=None, cache=None, catalogo=None):
+        """Mide cada solicitud y registra GET /metrics"""
+
+        @app.before_request
+        def iniciar_medicion():
+            g._metricas_inicio = time.perf_counter()
+
+        @app.after_request
+        def registrar_medicion(response):
+            inicio = g.pop('_metricas_inicio', None)
+            if inicio is None:
+                return response
+
+            etiquetas = (
+                ('blueprint', request.blueprint or ''),
+                ('endpoint', request.endpoint or 'sin_ruta'),
+            )
+            self.observar('erp_solicitud_duracion_segundos', etiquetas, time.perf_counter() - inicio)
+            self.incrementar('erp_solicitudes_total',
+                             etiquetas + (('metodo', request.method), ('estado', response.status_code)))
+            if response.status_code >= 500:
+                self.incrementar('erp_solicitudes_error_total', etiquetas)
+
+            # Totales SQL de instrumentacion_sql (este hook corre antes que el suyo)
+            registro = g.get('_registro_sql')
+            if registro is not None:
+                self.incrementar('erp_db_consultas_total', etiquetas, registro.cantidad)
+                self.incrementar('erp_db_segundos_total', etiquetas, registro.segundos)
+            return response
+
+        if mysql is not None:
+            def recolectar_pool():
+                estadisticas = mysql.estadisticas()
+                if not estadisticas:
+                    return []
+                return [
+                    ('erp_db_pool_conexiones', (('estado', 'en_uso'),), estadisticas['en_uso']),
+                    ('erp_db_pool_conexiones', (('estado', 'libres'),), estadisticas['libres']),
+                    ('erp_db_pool_conexiones', (('estado', 'maximo'),), estadisticas['max_conexiones']),
+                    ('erp_db_pool_esperas_total', (), estadisticas['esperas']),
+                    ('erp_db_pool_agotamientos_total', (), estadisticas['agotamientos']),
+                    ('erp_db_pool_espera_segundos_total', (), estadisticas['segundos_espera']),
+                ]
+            self.agregar_recolector(recolectar_pool)
+
+        if cache is not None:
+            def recolectar_cache():
+                estadisticas = cache.estadisticas()
+                return [
+                    ('erp_cache_reportes', (('valor', nombre),), estadisticas[nombre])
+                    for nombre in ('entradas', 'aciertos', 'fallos', 'coalescidos', 'invalidaciones')
+                ]
+            self.agregar_recolector(recolectar_cache)
+
+        if catalogo is not None:
+            def recolectar_catalogo():
+                estadisticas = catalogo.estadisticas()
+                return [
+                    ('erp_catalogo_productos', (('valor', nombre),), estadisticas[nombre])
+                    for nombre in ('productos', 'aciertos', 'fallos', 'recargas_completas', 'recargas_parciales')
+                ]
+            self.agregar_recolector(recolectar_catalogo)
+
+        def exponer_metricas():
+            return Response(self.exportar(), mimetype='text/plain; version=0.0.4')
+
+        app.add_url_rule('/metrics', 'metricas', exponer_metricas)
+
+metricas = Metricas()
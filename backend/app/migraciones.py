@@ -0,0 +1,116 @@
+# backend/app/migraciones.py
+
+#--> Migraciones versionadas del esquema: `flask migrar` aplica, en orden,
+#    las que todavía no figuran en la tabla migraciones_aplicadas.
+#    Para agregar una, sumar (version, nombre, [sentencias]) al final de MIGRACIONES.
+import MySQLdb
+
+from .database import mysql
+from .services.ventas_diarias_service import CREAR_TABLA_VENTAS_DIARIAS
+from .services.facturacion_lote_service import CREAR_TABLA_IDEMPOTENCIA
+from .services.pronostico_service import CREAR_TABLA_CORRIDAS, CREAR_TABLA_PRONOSTICOS
+from .services.catalogo_productos import CREAR_TABLA_CAMBIOS_CATALOGO, CREAR_TABLA_VERSION_CATALOGO
+from .services.dimensiones import CREAR_TABLA_VERSIONES_DIMENSIONES
+
+CREAR_TABLA_MIGRACIONES = """
+CREATE TABLE IF NOT EXISTS migraciones_aplicadas (
+    version INT NOT NULL PRIMARY KEY,
+    nombre VARCHAR(100) NOT NULL,
+    fecha_aplicacion DATETIME NOT NULL
+)
+"""
+
+# Errores de MySQL que indican que la sentencia ya estaba aplicada a mano
+ERRORES_YA_APLICADO = {
+    1060,  # Duplicate column name
+    1061,  # Duplicate key name
+}
+
+MIGRACIONES = [
+    (1, 'tablas_resumen', [
+        CREAR_TABLA_VENTAS_DIARIAS,
+        CREAR_TABLA_IDEMPOTENCIA,
+        CREAR_TABLA_CORRIDAS,
+        CREAR_TABLA_PRONOSTICOS
+    ]),
+    (2, 'indices_consultas_frecuentes', [
+        # Ventas por producto en un rango de fechas (reportes, pronósticos parciales)
+        "CREATE INDEX idx_detalle_factura_producto ON detalle_factura (producto_id, factura_id, cantidad)",
+        # Listado de facturas por fecha (paginación por (fecha, id)) y por cliente
+        "CREATE INDEX idx_facturas_fecha ON facturas (fecha, id)",
+        "CREATE INDEX idx_facturas_cliente_fecha ON facturas (cliente_id, fecha)",
+        # Listado de entradas (ORDER BY fecha DESC) e historial por producto
+        "CREATE INDEX idx_entrada_stock_fecha ON entrada_stock (fecha)",
+        "CREATE INDEX idx_entrada_stock_producto_fecha ON entrada_stock (producto_id, fecha)",
+        # Búsqueda de cliente por DNI al crear/modificar
+        "CREATE INDEX idx_clientes_dni ON clientes (dni)",
+        # Login por nombre de usuario
+        "CREATE INDEX idx_usuarios_nombre ON usuarios (nombre)",
+        # Catálogo ordenado por nombre (paginación por (nombre, id)) y por categoría/proveedor
+        "CREATE INDEX idx_productos_nombre ON productos (nombre, id)",
+        "CREATE INDEX idx_productos_categoria_nombre ON productos (categoria_id, nombre)",
+        "CREATE INDEX idx_productos_proveedor_nombre ON productos (proveedor_id, nombre)",
+        # Historial de demanda ordenado por fecha
+        "CREATE INDEX idx_demanda_historica_fecha ON demanda_historica (fecha)",
+        "CREATE INDEX idx_demanda_historica_producto_fecha ON demanda_historica (producto_id, fecha)"
+    ]),
+    (3, 'cambios_catalogo', [
+        # Contador de una sola fila: las versiones se confirman en orden
+        CREAR_TABLA_VERSION_CATALOGO,
+        "INSERT IGNORE INTO catalogo_version (id, version) VALUES (1, 0)",
+        CREAR_TABLA_CAMBIOS_CATALOGO
+    ]),
+    (4, 'versiones_dimensiones', [
+        CREAR_TABLA_VERSIONES_DIMENSIONES
+    ]),
+    (5, 'contrasenas_con_hash', [
+        # Los hashes de pbkdf2/scrypt ocupan más de 100 caracteres
+        "ALTER TABLE usuarios MODIFY contraseña VARCHAR(255) NOT NULL"
+    ]),
+]
+
+def migraciones_aplicadas(cursor):
+    cursor.execute(CREAR_TABLA_MIGRACIONES)
+    cursor.execute("SELECT version FROM migraciones_aplicadas")
+    return {fila['version'] if isinstance(fila, dict) else fila[0] for fila in cursor.fetchall()}
+
+def aplicar_migraciones(al_aplicar=None):
+    """
+    Aplica las migraciones pendientes en orden de versión
+
+    Args:
+        al_aplicar: Función opcional (version, nombre) llamada antes de cada migración
+
+    Returns:
+        list: Versiones aplicadas en esta ejecución
+    """
+    cursor = mysql.connection.cursor()
+    aplicadas = []
+
+    try:
+        ya_aplicadas = migraciones_aplicadas(cursor)
+
+        for version, nombre, sentencias in sorted(MIGRACIONES):
+            if version in ya_aplicadas:
+                continue
+            if al_aplicar:
+                al_aplicar(version, nombre)
+
+            # Las sentencias DDL de MySQL confirman solas; cada una se puede reintentar
+            for sentencia in sentencias:
+                try:
+                    cursor.execute(sentencia)
+                except MySQLdb.OperationalError as e:
+                    if e.args[0] not in ERRORES_YA_APLICADO:
+                        raise
+
+            cursor.execute(
+                "INSERT INTO migraciones_aplicadas (version, nombre, fecha_aplicacion) VALUES (%s, %s, NOW())",
+                (version, nombre)
+            )
+            mysql.connection.commit()
+            aplicadas.append(version)
+    finally:
+        cursor.close()
+
+    return aplicadas
@@ -1,34 +1,83 @@
 from flask import Blueprint, request, jsonify
 from app.database import mysql
+from app.services.autenticacion import autenticacion, ErrorVerificacionOcupada
+from app.services.dimensiones import dimensiones
 
 auth_bp = Blueprint('auth', __name__)
 
+def _demasiados_intentos(espera):
+    respuesta = jsonify({
+        'success': False,
+        'message': f'Demasiados intentos de inicio de sesión. Intente nuevamente en {espera} segundos'
+    })
+    respuesta.headers['Retry-After'] = str(espera)
+    return respuesta, 429
+
 @auth_bp.route('/login', methods=['POST'])
 def login():
-    data = request.get_json()
+    data = request.get_json(silent=True) or {}
     nombre = data.get('nombre')
     password = data.get('password')
     if not nombre or not password:
         return jsonify({'success': False, 'message': 'Nombre y contraseña requeridos'}), 400
+    
+    # Límites de intentos antes de tocar la BD o calcular hashes
+    # (remote_addr es la IP del cliente si PROXY_SALTOS_CONFIABLES está bien configurado)
+    ip = request.remote_addr or 'desconocida'
+    espera = max(autenticacion.limitador_ip.espera(ip), autenticacion.retardo_usuario.espera(nombre))
+    if espera:
+        return _demasiados_intentos(espera)
+    autenticacion.limitador_ip.registrar(ip)
+    
     try:
         cursor = mysql.connection.cursor()
-        query = '''
-            SELECT u.id, u.nombre, u.email, u.contraseña, r.nombre as rol
-            FROM usuarios u
-            LEFT JOIN roles r ON u.rol_id = r.id
-            WHERE u.nombre = %s
-        '''
-        cursor.execute(query, (nombre,))
+        cursor.execute(
+            "SELECT id, nombre, email, contraseña, rol_id FROM usuarios WHERE nombre = %s",
+            (nombre,)
+        )
         usuario = cursor.fetchone()
-        cursor.close()
-        if not usuario or usuario[3] != password:
+        
+        try:
+            valida, hash_nuevo = autenticacion.verificar(password, usuario[3] if usuario else None)
+        except ErrorVerificacionOcupada as e:
+            cursor.close()
+            return jsonify({'success': False, 'message': str(e)}), 503
+        
+        if not valida:
+            cursor.close()
+            autenticacion.retardo_usuario.registrar(nombre)
             return jsonify({'success': False, 'message': 'Credenciales incorrectas'}), 401
+        
+        # Contraseña en texto plano o con otro factor de trabajo: guardar el hash actual
+        if hash_nuevo:
+            cursor.execute(
+                "UPDATE usuarios SET contraseña = %s WHERE id = %s",
+                (hash_nuevo, usuario[0])
+            )
+            mysql.connection.commit()
+        cursor.close()
+        autenticacion.retardo_usuario.limpiar(nombre)
+        
         usuario_data = {
             'id': usuario[0],
             'nombre': usuario[1],
             'email': usuario[2],
-            'rol': usuario[4]
+            'rol': dimensiones.nombre_rol(usuario[4])
         }
-        return jsonify({'success': True, 'usuario': usuario_data}), 200
+        return jsonify({
+            'success': True,
+            'usuario': usuario_data,
+            'token': autenticacion.emitir_token(usuario_data)
+        }), 200
     except Exception as e:
         return jsonify({'success': False, 'message': f'Error en el servidor: {str(e)}'}), 500
+
+@auth_bp.route('/sesion', methods=['GET'])
+def sesion():
+    """Usuario del token (Authorization: Bearer <token>) sin consultar la BD"""
+    encabezado = request.headers.get('Authorization', '')
+    token = encabezado[7:] if encabezado.startswith('Bearer ') else None
+    usuario = autenticacion.leer_token(token) if token else None
+    if usuario is None:
+        return jsonify({'success': False, 'message': 'Sesión inválida o vencida'}), 401
+    return jsonify({'success': True, 'usuario': usuario}), 200
@@ -1,5 +1,6 @@
 from flask import Blueprint, request, jsonify
 from ..database import mysql
+from ..services.dimensiones import dimensiones
 
 categorias_bp = Blueprint('categorias', __name__)
 
@@ -109,7 +110,9 @@ def crear_categoria():
         
         cursor.execute(query, valores)
         categoria_id = cursor.lastrowid
+        dimensiones.registrar_cambio(cursor, 'categorias')
         mysql.connection.commit()
+        dimensiones.invalidar()
         cursor.close()
         
         return jsonify({
@@ -184,7 +187,9 @@ def actualizar_categoria_parcial(categoria_id):
         valores.append(categoria_id)
         query = f"UPDATE categorias SET {', '.join(campos_actualizar)} WHERE id = %s"
         cursor.execute(query, valores)
+        dimensiones.registrar_cambio(cursor, 'categorias')
         mysql.connection.commit()
+        dimensiones.invalidar()
         cursor.close()
         
         return jsonify({
@@ -223,7 +228,9 @@ def eliminar_categoria(categoria_id):
             "DELETE FROM categorias WHERE id = %s",
             (categoria_id,)
         )
+        dimensiones.registrar_cambio(cursor, 'categorias')
         mysql.connection.commit()
+        dimensiones.invalidar()
         cursor.close()
         return jsonify({
             'success': True,
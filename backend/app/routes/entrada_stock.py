@@ -1,6 +1,10 @@
 from flask import Blueprint, request, jsonify
 from app.database import mysql
+from app.services.cache_reportes import cache_reportes
+from app.services.exportacion_service import exportar_consulta, FORMATOS_EXPORTACION
+from app.services.entrada_stock_lote_service import EntradaStockLoteService, LECTORES_ENTRADAS
 from datetime import datetime
+import io
 
 entrada_stock_bp = Blueprint('entrada_stock', __name__)
 
@@ -8,7 +12,6 @@ entrada_stock_bp = Blueprint('entrada_stock', __name__)
 def listar_entradas():
     """Listar todas las entradas de stock con información de productos y proveedores"""
     try:
-        cursor = mysql.connection.cursor()
         query = """
             SELECT 
                 es.id,
@@ -26,6 +29,16 @@ def listar_entradas():
             JOIN proveedores pr ON es.proveedor_id = pr.id
             ORDER BY es.fecha DESC
         """
+        # Exportación en streaming (?format=ndjson|csv)
+        formato = request.args.get('format')
+        if formato:
+            if formato not in FORMATOS_EXPORTACION:
+                return jsonify({
+                    'success': False,
+                    'message': 'Formato no soportado. Use ndjson o csv'
+                }), 400
+            return exportar_consulta(query, (), formato, 'entradas_stock')
+        cursor = mysql.connection.cursor()
         cursor.execute(query)
         columnas = [col[0] for col in cursor.description]
         entradas = [dict(zip(columnas, fila)) for fila in cursor.fetchall()]
@@ -116,9 +129,11 @@ def crear_entrada():
                 'message': 'El precio de compra no puede ser negativo'
             }), 400
         cursor = mysql.connection.cursor()
-        cursor.execute("SELECT id, stock_actual FROM productos WHERE id = %s", (producto_id,))
+        # Bloquear la fila del producto hasta el commit para leer un stock consistente
+        cursor.execute("SELECT id, stock_actual FROM productos WHERE id = %s FOR UPDATE", (producto_id,))
         producto = cursor.fetchone()
         if not producto:
+            mysql.connection.rollback()
             cursor.close()
             return jsonify({
                 'success': False,
@@ -127,6 +142,7 @@ def crear_entrada():
         cursor.execute("SELECT id FROM proveedores WHERE id = %s", (proveedor_id,))
         proveedor = cursor.fetchone()
         if not proveedor:
+            mysql.connection.rollback()
             cursor.close()
             return jsonify({
                 'success': False,
@@ -140,8 +156,9 @@ def crear_entrada():
         cursor.execute(query_entrada, (producto_id, proveedor_id, usuario_id, cantidad, precio_compra, precio_venta))
         id_nueva_entrada = cursor.lastrowid
         nuevo_stock = producto[1] + cantidad
-        cursor.execute("UPDATE productos SET stock_actual = %s WHERE id = %s", (nuevo_stock, producto_id))
+        cursor.execute("UPDATE productos SET stock_actual = stock_actual + %s WHERE id = %s", (cantidad, producto_id))
         mysql.connection.commit()
+        cache_reportes.invalidar()
         cursor.close()
         return jsonify({
             'success': True,
@@ -160,6 +177,50 @@ def crear_entrada():
             'message': f'Error al crear entrada de stock: {str(e)}'
         }), 500
 
+@entrada_stock_bp.route('/entradas-stock/lote', methods=['POST'])
+def importar_entradas():
+    """Importar muchas entradas de stock desde un archivo CSV/JSON/NDJSON o un arreglo JSON"""
+    try:
+        if 'archivo' in request.files:
+            # Archivo subido (multipart): el formato sale de la extensión o de ?formato=
+            archivo = request.files['archivo']
+            formato = request.args.get('formato') or archivo.filename.rsplit('.', 1)[-1].lower()
+            if formato not in LECTORES_ENTRADAS:
+                return jsonify({
+                    'success': False,
+                    'message': 'Formato no soportado. Use csv, json o ndjson'
+                }), 400
+            texto = io.TextIOWrapper(archivo.stream, encoding='utf-8-sig', newline='')
+            filas = LECTORES_ENTRADAS[formato](texto)
+        elif request.mimetype in ('text/csv', 'application/x-ndjson'):
+            formato = 'csv' if request.mimetype == 'text/csv' else 'ndjson'
+            texto = io.TextIOWrapper(request.stream, encoding='utf-8-sig', newline='')
+            filas = LECTORES_ENTRADAS[formato](texto)
+        else:
+            data = request.get_json(silent=True)
+            filas = data.get('entradas') if isinstance(data, dict) else data
+            if not isinstance(filas, list):
+                return jsonify({
+                    'success': False,
+                    'message': 'Se requiere un archivo o una lista de entradas'
+                }), 400
+        
+        resumen = EntradaStockLoteService.importar(filas)
+        if resumen['importadas']:
+            cache_reportes.invalidar()
+        
+        return jsonify({
+            'success': True,
+            'message': f"{resumen['importadas']} entradas importadas, {resumen['con_error']} con error",
+            'data': resumen
+        }), 200
+    except Exception as e:
+        mysql.connection.rollback()
+        return jsonify({
+            'success': False,
+            'message': f'Error al importar entradas de stock: {str(e)}'
+        }), 500
+
 #-----------------TEST HASTA HERE 
 @entrada_stock_bp.route('/entradas-stock/<int:id>', methods=['PATCH'])
 def modificar_entrada(id):
@@ -182,12 +243,14 @@ def modificar_entrada(id):
             FROM entrada_stock es
             JOIN productos p ON es.producto_id = p.id
             WHERE es.id = %s
+            FOR UPDATE
         """
         
         cursor.execute(query_entrada, (id,))
         entrada_actual = cursor.fetchone()
         
         if not entrada_actual:
+            mysql.connection.rollback()
             cursor.close()
             return jsonify({
                 'success': False,
@@ -209,6 +272,7 @@ def modificar_entrada(id):
                 campos_actualizar.append("cantidad = %s")
                 valores.append(cantidad_nueva)
             except (ValueError, TypeError) as e:
+                mysql.connection.rollback()
                 cursor.close()
                 return jsonify({
                     'success': False,
@@ -223,6 +287,7 @@ def modificar_entrada(id):
                 campos_actualizar.append("precio_compra = %s")
                 valores.append(precio_compra)
             except (ValueError, TypeError) as e:
+                mysql.connection.rollback()
                 cursor.close()
                 return jsonify({
                     'success': False,
@@ -230,6 +295,7 @@ def modificar_entrada(id):
                 }), 400
         
         if not campos_actualizar:
+            mysql.connection.rollback()
             cursor.close()
             return jsonify({
                 'success': False,
@@ -241,6 +307,7 @@ def modificar_entrada(id):
         nuevo_stock = entrada_actual['stock_actual'] + diferencia_cantidad
         
         if nuevo_stock < 0:
+            mysql.connection.rollback()
             cursor.close()
             return jsonify({
                 'success': False,
@@ -252,12 +319,22 @@ def modificar_entrada(id):
         valores.append(id)
         cursor.execute(query_update, valores)
         
-        # Actualizar stock del producto si cambió la cantidad
+        # Actualizar stock del producto si cambió la cantidad (ajuste relativo, sin bajar de 0)
         if diferencia_cantidad != 0:
-            cursor.execute("UPDATE productos SET stock_actual = %s WHERE id = %s", 
-                          (nuevo_stock, entrada_actual['producto_id']))
+            cursor.execute(
+                "UPDATE productos SET stock_actual = stock_actual + %s WHERE id = %s AND stock_actual + %s >= 0",
+                (diferencia_cantidad, entrada_actual['producto_id'], diferencia_cantidad)
+            )
+            if cursor.rowcount != 1:
+                mysql.connection.rollback()
+                cursor.close()
+                return jsonify({
+                    'success': False,
+                    'message': 'La modificación resultaría en stock negativo'
+                }), 409
         
         mysql.connection.commit()
+        cache_reportes.invalidar()
         cursor.close()
         
         return jsonify({
@@ -290,13 +367,15 @@ def anular_entrada(id):
                    p.stock_actual, p.nombre as nombre_producto
             FROM entrada_stock es
             JOIN productos p ON es.producto_id = p.id
-            WHERE es.id = %s
+            WHERE es.id = %s AND es.activo = 1
+            FOR UPDATE
         """
         
         cursor.execute(query_entrada, (id,))
         entrada = cursor.fetchone()
         
         if not entrada:
+            mysql.connection.rollback()
             cursor.close()
             return jsonify({
                 'success': False,
@@ -305,6 +384,7 @@ def anular_entrada(id):
         
         # Verificar que hay suficiente stock para restar
         if entrada['stock_actual'] < entrada['cantidad']:
+            mysql.connection.rollback()
             cursor.close()
             return jsonify({
                 'success': False,
@@ -317,11 +397,21 @@ def anular_entrada(id):
         # Anular entrada (soft delete)
         cursor.execute("UPDATE entrada_stock SET activo = 0 WHERE id = %s", (id,))
         
-        # Actualizar stock del producto
-        cursor.execute("UPDATE productos SET stock_actual = %s WHERE id = %s", 
-                      (nuevo_stock, entrada['producto_id']))
+        # Actualizar stock del producto (descuento relativo y condicionado)
+        cursor.execute(
+            "UPDATE productos SET stock_actual = stock_actual - %s WHERE id = %s AND stock_actual >= %s",
+            (entrada['cantidad'], entrada['producto_id'], entrada['cantidad'])
+        )
+        if cursor.rowcount != 1:
+            mysql.connection.rollback()
+            cursor.close()
+            return jsonify({
+                'success': False,
+                'message': 'No se puede anular: el stock cambió y ya no alcanza para restar la entrada'
+            }), 409
         
         mysql.connection.commit()
+        cache_reportes.invalidar()
         cursor.close()
         
         return jsonify({
@@ -1,9 +1,38 @@
 from flask import Blueprint, request, jsonify
 from app.database import mysql
-from datetime import datetime
+from app.services.cache_reportes import cache_reportes
+from app.services.catalogo_productos import catalogo_productos
+from app.services.exportacion_service import exportar_consulta, FORMATOS_EXPORTACION
+from app.services.ventas_diarias_service import VentasDiariasService
+from app.services.facturacion_lote_service import FacturacionLoteService, MAX_FACTURAS_POR_LOTE
+from app.routes.paginacion import ajustar_limite, codificar_cursor, decodificar_cursor, parametro_entero
+from app.services.detalle_facturas_service import DetalleFacturasService, ErrorLoteDemasiadoGrande
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+import json
 
 facturas_bp = Blueprint('facturas', __name__)
 
+def _parametro_decimal(nombre):
+    """Lee un parámetro numérico opcional de la query string"""
+    valor = request.args.get(nombre)
+    if valor is None or valor == '':
+        return None
+    try:
+        return Decimal(valor)
+    except InvalidOperation:
+        raise ValueError(f"El parámetro '{nombre}' debe ser un número")
+
+def _parametro_fecha(nombre):
+    """Lee un parámetro de fecha opcional (YYYY-MM-DD) de la query string"""
+    valor = request.args.get(nombre)
+    if valor is None or valor == '':
+        return None
+    try:
+        return datetime.strptime(valor, '%Y-%m-%d')
+    except ValueError:
+        raise ValueError(f"El parámetro '{nombre}' debe tener formato YYYY-MM-DD")
+
 @facturas_bp.route('/facturas', methods=['POST'])
 def crear_factura():
     """
@@ -51,8 +80,7 @@ def crear_factura():
             }), 404
         
         # 📦 PASO 3: VALIDAR PRODUCTOS Y STOCK
-        productos_validados = []
-        total_factura = 0
+        lineas = []
         
         for idx, producto in enumerate(productos):
             # Validar campos del producto
@@ -90,82 +118,159 @@ def crear_factura():
                     'message': f'Producto {idx + 1}: el precio debe ser mayor a 0'
                 }), 400
             
-            # Verificar que el producto existe y hay stock suficiente
-            cursor.execute("SELECT id, nombre, stock_actual FROM productos WHERE id = %s", (producto_id,))
-            
-            producto_bd = cursor.fetchone()
-            
-            if not producto_bd:
+            lineas.append((producto_id, cantidad, precio_unitario))
+        
+        # Validar existencia contra el catálogo en memoria antes de bloquear filas
+        ids_productos = sorted({producto_id for producto_id, _, _ in lineas})
+        catalogo = catalogo_productos.obtener_varios(ids_productos)
+        for producto_id, _, _ in lineas:
+            if producto_id not in catalogo:
                 cursor.close()
                 return jsonify({
                     'success': False,
                     'message': f'Producto con ID {producto_id} no encontrado'
                 }), 404
-            
-            if producto_bd[2] < cantidad:
+        
+        # Bloquear el stock de todos los productos de la factura en una sola consulta.
+        # Se bloquean en orden de id para que dos ventas simultáneas no se
+        # esperen mutuamente (deadlock); el stock leído no cambia hasta el commit
+        marcadores = ', '.join(['%s'] * len(ids_productos))
+        cursor.execute(
+            f"SELECT id, stock_actual FROM productos WHERE id IN ({marcadores}) ORDER BY id FOR UPDATE",
+            ids_productos
+        )
+        productos_bd = {
+            fila[0]: (fila[0], catalogo[fila[0]].nombre, fila[1])
+            for fila in cursor.fetchall()
+        }
+        
+        # Verificar que cada producto sigue existiendo y que alcanza el stock
+        # (sumando las líneas que repiten el mismo producto)
+        cantidad_por_producto = {}
+        for producto_id, cantidad, _ in lineas:
+            if producto_id not in productos_bd:
+                mysql.connection.rollback()
                 cursor.close()
                 return jsonify({
                     'success': False,
-                    'message': f'Stock insuficiente para {producto_bd[1]}. Stock disponible: {producto_bd[2]}, solicitado: {cantidad}'
-                }), 400
-            
-            # 💰 CALCULAR SUBTOTAL
+                    'message': f'Producto con ID {producto_id} no encontrado'
+                }), 404
+            cantidad_por_producto[producto_id] = cantidad_por_producto.get(producto_id, 0) + cantidad
+        
+        conflictos = [
+            {
+                'producto_id': producto_id,
+                'producto': productos_bd[producto_id][1],
+                'stock_disponible': productos_bd[producto_id][2],
+                'solicitado': cantidad
+            }
+            for producto_id, cantidad in cantidad_por_producto.items()
+            if productos_bd[producto_id][2] < cantidad
+        ]
+        
+        if conflictos:
+            mysql.connection.rollback()
+            cursor.close()
+            primero = conflictos[0]
+            return jsonify({
+                'success': False,
+                'message': f"Stock insuficiente para {primero['producto']}. Stock disponible: {primero['stock_disponible']}, solicitado: {primero['solicitado']}",
+                'conflictos': conflictos
+            }), 400
+        
+        # 💰 CALCULAR SUBTOTALES
+        productos_validados = []
+        total_factura = 0
+        
+        for producto_id, cantidad, precio_unitario in lineas:
             subtotal = cantidad * precio_unitario
             total_factura += subtotal
             
-            # Guardar producto validado
             productos_validados.append({
                 'producto_id': producto_id,
-                'nombre': producto_bd[1],
+                'nombre': productos_bd[producto_id][1],
                 'cantidad': cantidad,
                 'precio_unitario': precio_unitario,
-                'subtotal': subtotal,
-                'stock_actual': producto_bd[2]
+                'subtotal': subtotal
             })
         
         # 📝 PASO 4: CREAR FACTURA (tabla facturas)
+        # La fecha se fija una vez y viaja como parámetro: con NOW() dentro de
+        # VALUES, executemany no puede armar un INSERT de varias filas
+        fecha = datetime.now().replace(microsecond=0)
         query_factura = """
             INSERT INTO facturas (cliente_id, fecha, total)
-            VALUES (%s, NOW(), %s)
+            VALUES (%s, %s, %s)
         """
         
-        cursor.execute(query_factura, (cliente_id, total_factura))
+        cursor.execute(query_factura, (cliente_id, fecha, total_factura))
         factura_id = cursor.lastrowid
         
-        # 📋 PASO 5: CREAR DETALLES (tabla detalle_factura)
+        # 📋 PASO 5: CREAR DETALLES (tabla detalle_factura) en un solo INSERT
+        query_detalle = """
+            INSERT INTO detalle_factura (factura_id, producto_id, cantidad, precio_unitario)
+            VALUES (%s, %s, %s, %s)
+        """
+        
+        cursor.executemany(query_detalle, [
+            (factura_id, producto['producto_id'], producto['cantidad'], producto['precio_unitario'])
+            for producto in productos_validados
+        ])
+        
+        # 📦 PASO 6: ACTUALIZAR STOCK (un solo UPDATE para todos los productos)
+        # Descuento relativo y condicionado: nunca deja stock negativo
+        casos = ' '.join(['WHEN %s THEN %s'] * len(cantidad_por_producto))
+        valores_casos = [valor for par in cantidad_por_producto.items() for valor in par]
+        marcadores = ', '.join(['%s'] * len(cantidad_por_producto))
+        
+        cursor.execute(
+            f"""
+            UPDATE productos
+            SET stock_actual = stock_actual - CASE id {casos} END
+            WHERE id IN ({marcadores})
+                AND stock_actual >= CASE id {casos} END
+            """,
+            valores_casos + list(cantidad_por_producto) + valores_casos
+        )
+        
+        if cursor.rowcount != len(cantidad_por_producto):
+            mysql.connection.rollback()
+            cursor.close()
+            return jsonify({
+                'success': False,
+                'message': 'El stock cambió mientras se procesaba la factura. Intente nuevamente'
+            }), 409
+        
+        # 📊 REGISTRAR EN DEMANDA_HISTORICA (para IA)
+        cursor.executemany(
+            "INSERT INTO demanda_historica (producto_id, fecha, cantidad_vendida) VALUES (%s, %s, %s)",
+            [(producto['producto_id'], fecha, producto['cantidad']) for producto in productos_validados]
+        )
+        
+        # Detalle del stock por línea (las líneas repetidas descuentan en orden)
         stock_actualizado = []
+        stock_restante = {producto_id: fila[2] for producto_id, fila in productos_bd.items()}
         
         for producto in productos_validados:
-            # Insertar detalle
-            query_detalle = """
-                INSERT INTO detalle_factura (factura_id, producto_id, cantidad, precio_unitario)
-                VALUES (%s, %s, %s, %s)
-            """
-            
-            cursor.execute(query_detalle, (
-                factura_id,
-                producto['producto_id'],
-                producto['cantidad'],
-                producto['precio_unitario']
-            ))
-            
-            # 📦 PASO 6: ACTUALIZAR STOCK
-            nuevo_stock = producto['stock_actual'] - producto['cantidad']
-            
-            cursor.execute("UPDATE productos SET stock_actual = %s WHERE id = %s", (nuevo_stock, producto['producto_id']))
-            
-             # 📊 NUEVO: REGISTRAR EN DEMANDA_HISTORICA (para IA)
-            cursor.execute("INSERT INTO demanda_historica (producto_id, fecha, cantidad_vendida) VALUES (%s, NOW(), %s)", (producto['producto_id'], producto['cantidad']))
+            stock_anterior = stock_restante[producto['producto_id']]
+            stock_restante[producto['producto_id']] = stock_anterior - producto['cantidad']
             
             stock_actualizado.append({
                 'producto': producto['nombre'],
                 'cantidad_vendida': producto['cantidad'],
-                'stock_anterior': producto['stock_actual'],
-                'stock_nuevo': nuevo_stock
+                'stock_anterior': stock_anterior,
+                'stock_nuevo': stock_restante[producto['producto_id']]
             })
         
+        # 📊 ACTUALIZAR RESUMEN DE VENTAS DIARIAS (misma transacción)
+        VentasDiariasService.registrar_ventas(cursor, [
+            (producto['producto_id'], producto['cantidad'], fecha)
+            for producto in productos_validados
+        ])
+        
         # 💾 GUARDAR TODO
         mysql.connection.commit()
+        cache_reportes.invalidar()
         cursor.close()
         
         # ✅ PASO 7: RESPONDER
@@ -177,7 +282,7 @@ def crear_factura():
                 'cliente': cliente[1],
                 'total': total_factura,
                 'productos_vendidos': len(productos_validados),
-                'fecha': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'fecha': fecha.strftime('%Y-%m-%d %H:%M:%S'),
                 'stock_actualizado': stock_actualizado
             }
         }), 201
@@ -189,15 +294,133 @@ def crear_factura():
             'message': f'Error al crear factura: {str(e)}'
         }), 500
 
+@facturas_bp.route('/facturas/lote', methods=['POST'])
+def crear_facturas_lote():
+    """
+    CAMINITO POR LOTE: Recibir muchas facturas → Validar por conjuntos → Guardar por tramos
+    Acepta un arreglo JSON, {"facturas": [...]} o NDJSON (una factura por línea).
+    Cada factura puede traer 'clave_idempotencia' para que reintentar sea seguro.
+    """
+    try:
+        # 📥 PASO 1: RECIBIR DATOS
+        if request.mimetype == 'application/x-ndjson':
+            facturas = []
+            for linea in request.get_data(as_text=True).splitlines():
+                if not linea.strip():
+                    continue
+                try:
+                    facturas.append(json.loads(linea))
+                except ValueError:
+                    facturas.append(None)  # Se informa como factura inválida
+        else:
+            data = request.get_json(silent=True)
+            facturas = data.get('facturas') if isinstance(data, dict) else data
+        
+        if not isinstance(facturas, list) or len(facturas) == 0:
+            return jsonify({
+                'success': False,
+                'message': 'Se requiere una lista de facturas'
+            }), 400
+        
+        if len(facturas) > MAX_FACTURAS_POR_LOTE:
+            return jsonify({
+                'success': False,
+                'message': f'Máximo {MAX_FACTURAS_POR_LOTE} facturas por lote'
+            }), 413
+        
+        # 📝 PASO 2: REGISTRAR (resultado por factura)
+        resultados = FacturacionLoteService.procesar(facturas)
+        
+        creadas = len([r for r in resultados if r['success'] and not r.get('duplicada')])
+        duplicadas = len([r for r in resultados if r['success'] and r.get('duplicada')])
+        
+        if creadas:
+            cache_reportes.invalidar()
+        
+        # ✅ PASO 3: RESPONDER
+        return jsonify({
+            'success': True,
+            'message': f'{creadas} facturas creadas, {duplicadas} ya registradas, {len(resultados) - creadas - duplicadas} con error',
+            'data': {
+                'creadas': creadas,
+                'duplicadas': duplicadas,
+                'con_error': len(resultados) - creadas - duplicadas,
+                'resultados': resultados
+            }
+        }), 200
+        
+    except Exception as e:
+        mysql.connection.rollback()
+        return jsonify({
+            'success': False,
+            'message': f'Error al procesar lote de facturas: {str(e)}'
+        }), 500
+
 @facturas_bp.route('/facturas', methods=['GET'])
 def listar_facturas():
     """
-    CAMINITO: Consultar BD → Traer facturas con datos de cliente → Responder lista
+    CAMINITO: Leer filtros → Consultar página de facturas con datos de cliente →
+    Calcular estadísticas en SQL → Responder lista
+
+    Filtros opcionales: desde / hasta (YYYY-MM-DD, ambos inclusive), cliente_id,
+    total_min y total_max. Sin limit/after devuelve todas las facturas filtradas;
+    con limit/after pagina por cursor sobre (fecha, id), de la más reciente a la más antigua
     """
     try:
-        cursor = mysql.connection.cursor()
+        # 📥 PASO 1: LEER Y VALIDAR FILTROS
+        try:
+            desde = _parametro_fecha('desde')
+            hasta = _parametro_fecha('hasta')
+            cliente_id = parametro_entero('cliente_id')
+            total_min = _parametro_decimal('total_min')
+            total_max = _parametro_decimal('total_max')
+            limit = parametro_entero('limit')
+            after = request.args.get('after')
+            formato = request.args.get('format')
+            
+            if formato and formato not in FORMATOS_EXPORTACION:
+                raise ValueError('Formato no soportado. Use ndjson o csv')
+            
+            posicion = decodificar_cursor(after) if after else None
+            if posicion is not None and len(posicion) != 2:
+                raise ValueError("Cursor 'after' inválido")
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 400
+        
+        paginar = limit is not None or after is not None
+        if paginar:
+            limit = ajustar_limite(limit)
+        
+        condiciones = []
+        valores = []
+        
+        if desde is not None:
+            condiciones.append("f.fecha >= %s")
+            valores.append(desde)
+        if hasta is not None:
+            # Hasta inclusive: todo el día indicado
+            condiciones.append("f.fecha < %s")
+            valores.append(hasta + timedelta(days=1))
+        if cliente_id is not None:
+            condiciones.append("f.cliente_id = %s")
+            valores.append(cliente_id)
+        if total_min is not None:
+            condiciones.append("f.total >= %s")
+            valores.append(total_min)
+        if total_max is not None:
+            condiciones.append("f.total <= %s")
+            valores.append(total_max)
         
         # 🔍 CONSULTAR FACTURAS CON DATOS DEL CLIENTE
+        # (el mismo FROM/JOIN para la página y las estadísticas: una factura
+        # sin cliente no aparece en ninguna de las dos)
+        desde_sql = """
+            FROM facturas f
+            JOIN clientes c ON f.cliente_id = c.id
+        """
         query = """
             SELECT 
                 f.id,
@@ -206,27 +429,64 @@ def listar_facturas():
                 c.email as email_cliente,
                 f.fecha,
                 f.total
-            FROM facturas f
-            JOIN clientes c ON f.cliente_id = c.id
-            ORDER BY f.fecha DESC
-        """
+        """ + desde_sql
+        orden_sql = " ORDER BY f.fecha DESC, f.id DESC"
         
-        cursor.execute(query)
-        facturas = cursor.fetchall()
-        cursor.close()
+        # 📤 EXPORTACIÓN EN STREAMING (?format=ndjson|csv): todo lo filtrado, sin paginar
+        if formato:
+            query_exportacion = query
+            if condiciones:
+                query_exportacion += " WHERE " + " AND ".join(condiciones)
+            return exportar_consulta(query_exportacion + orden_sql, valores, formato, 'facturas')
         
-        # 📊 ESTADÍSTICAS ADICIONALES
-        total_vendido = sum(factura[5] for factura in facturas)
+        cursor = mysql.connection.cursor()
         
-        return jsonify({
+        # 📊 ESTADÍSTICAS: agregado sobre el mismo filtro (no solo sobre la página)
+        query_estadisticas = "SELECT COUNT(*), COALESCE(SUM(f.total), 0)" + desde_sql
+        if condiciones:
+            query_estadisticas += " WHERE " + " AND ".join(condiciones)
+        cursor.execute(query_estadisticas, valores)
+        total_facturas, total_vendido = cursor.fetchone()
+        
+        # Posición del cursor (keyset): seguir después de la última factura devuelta
+        condiciones_pagina = list(condiciones)
+        valores_pagina = list(valores)
+        if posicion is not None:
+            condiciones_pagina.append("(f.fecha < %s OR (f.fecha = %s AND f.id < %s))")
+            valores_pagina.extend([posicion[0], posicion[0], posicion[1]])
+        
+        if condiciones_pagina:
+            query += " WHERE " + " AND ".join(condiciones_pagina)
+        query += orden_sql
+        if paginar:
+            # Pedir una de más para saber si hay página siguiente
+            query += " LIMIT %s"
+            valores_pagina.append(limit + 1)
+        
+        cursor.execute(query, valores_pagina)
+        facturas = list(cursor.fetchall())
+        cursor.close()
+        
+        respuesta = {
             'success': True,
             'data': facturas,
             'estadisticas': {
-                'total_facturas': len(facturas),
+                'total_facturas': total_facturas,
                 'total_vendido': total_vendido,
-                'promedio_por_factura': round(total_vendido / len(facturas), 2) if len(facturas) > 0 else 0
+                'promedio_por_factura': round(total_vendido / total_facturas, 2) if total_facturas > 0 else 0
             }
-        }), 200
+        }
+        
+        if paginar:
+            siguiente = None
+            if len(facturas) > limit:
+                facturas = facturas[:limit]
+                ultima = facturas[-1]
+                siguiente = codificar_cursor([str(ultima[4]), ultima[0]])
+            respuesta['data'] = facturas
+            respuesta['paginacion'] = {'limit': limit, 'siguiente': siguiente}
+        
+        return jsonify(respuesta), 200
         
     except Exception as e:
         return jsonify({
@@ -306,4 +566,83 @@ def ver_factura(factura_id):
         return jsonify({
             'success': False,
             'message': f'Error al obtener factura: {str(e)}'
-        }), 500
\ No newline at end of file
+        }), 500
+
+@facturas_bp.route('/facturas/detalles', methods=['GET', 'POST'])
+def ver_facturas_lote():
+    """
+    CAMINITO: Leer ids o rango → Traer encabezados y líneas por tramos → Responder facturas completas
+
+    GET /facturas/detalles?ids=1,2,3 o ?desde=YYYY-MM-DD&hasta=YYYY-MM-DD[&cliente_id=N]
+    POST con JSON {"ids": [...]} para listas que no caben en la URL.
+    Con format=ndjson envía una factura completa por línea en streaming.
+    """
+    try:
+        # 📥 PASO 1: LEER Y VALIDAR PARÁMETROS
+        try:
+            data = request.get_json(silent=True) if request.method == 'POST' else None
+            data = data or {}
+            formato = request.args.get('format') or data.get('format')
+            if formato and formato != 'ndjson':
+                raise ValueError('Formato no soportado. Use ndjson')
+            
+            ids = data.get('ids')
+            if ids is None and request.args.get('ids'):
+                ids = request.args['ids'].split(',')
+            
+            factura_ids = None
+            desde = hasta = cliente_id = None
+            if ids is not None:
+                if not isinstance(ids, list) or not ids:
+                    raise ValueError('Se requiere una lista de ids de facturas')
+                try:
+                    # Sin repetidos, respetando el orden pedido
+                    factura_ids = list(dict.fromkeys(int(factura_id) for factura_id in ids))
+                except (ValueError, TypeError):
+                    raise ValueError('Los ids de facturas deben ser enteros')
+            else:
+                desde = _parametro_fecha('desde')
+                hasta = _parametro_fecha('hasta')
+                cliente_id = parametro_entero('cliente_id')
+                if desde is None or hasta is None:
+                    raise ValueError('Se requieren ids o un rango desde/hasta')
+                if hasta < desde:
+                    raise ValueError("'hasta' no puede ser anterior a 'desde'")
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 400
+        
+        # 📤 STREAMING (?format=ndjson): sin límite de facturas
+        if formato:
+            return DetalleFacturasService.exportar_ndjson(factura_ids, desde, hasta, cliente_id)
+        
+        # 📋 PASO 2: TRAER FACTURAS COMPLETAS
+        try:
+            facturas = DetalleFacturasService.obtener(factura_ids, desde, hasta, cliente_id)
+        except ErrorLoteDemasiadoGrande as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 413
+        
+        respuesta = {
+            'success': True,
+            'data': facturas,
+            'total_facturas': len(facturas)
+        }
+        if factura_ids is not None:
+            encontradas = {factura['factura'][0] for factura in facturas}
+            respuesta['no_encontradas'] = [
+                factura_id for factura_id in factura_ids if factura_id not in encontradas
+            ]
+        
+        # ✅ PASO 3: RESPONDER
+        return jsonify(respuesta), 200
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Error al obtener facturas: {str(e)}'
+        }), 500
@@ -22,5 +22,7 @@ def test_db():
    
     return jsonify({"base_de_datos_actual": db_actual, "tablas": tables})
 
-
-
+# Estado del pool de conexiones de este proceso
+@main_bp.route('/db-pool')
+def estado_pool():
+    return jsonify(mysql.estadisticas())
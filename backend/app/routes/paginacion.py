@@ -0,0 +1,38 @@
+# backend/app/routes/paginacion.py
+
+#--> Paginación por cursor compartida por los listados (/productos, /facturas):
+#    tamaño de página, cursor opaco con la clave de la última fila y lectura
+#    de parámetros enteros de la query string.
+import base64
+import json
+
+from flask import request
+
+# Tamaño de página por defecto y máximo
+LIMITE_POR_DEFECTO = 100
+LIMITE_MAXIMO = 1000
+
+def ajustar_limite(limit):
+    """Tamaño de página pedido, acotado entre 1 y LIMITE_MAXIMO"""
+    return min(max(limit or LIMITE_POR_DEFECTO, 1), LIMITE_MAXIMO)
+
+def codificar_cursor(valores):
+    """Convierte la clave de la última fila de la página en un cursor opaco"""
+    return base64.urlsafe_b64encode(json.dumps(valores).encode()).decode()
+
+def decodificar_cursor(cursor_texto):
+    """Devuelve la lista de valores guardada en el cursor (ValueError si es inválido)"""
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor_texto.encode()))
+    except Exception:
+        raise ValueError("Cursor 'after' inválido")
+
+def parametro_entero(nombre):
+    """Lee un parámetro entero opcional de la query string"""
+    valor = request.args.get(nombre)
+    if valor is None or valor == '':
+        return None
+    try:
+        return int(valor)
+    except ValueError:
+        raise ValueError(f"El parámetro '{nombre}' debe ser un entero")
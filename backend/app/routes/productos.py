@@ -1,60 +1,196 @@
 # backend/app/routes/productos.py
 from flask import Blueprint, jsonify,request
 from app.database import mysql
+from app.services.cache_reportes import cache_reportes
+from app.services.catalogo_productos import catalogo_productos, ErrorCatalogo
+from app.services.dimensiones import dimensiones
+from app.services.exportacion_service import exportar_consulta, FORMATOS_EXPORTACION
+from app.routes.paginacion import ajustar_limite, codificar_cursor, decodificar_cursor, parametro_entero
 
 # Creamos el blueprint para productos
 productos_bp = Blueprint('productos', __name__)
 
+def _con_nombres(fila):
+    """Reemplaza categoria_id y proveedor_id (columnas 7 y 8) por sus nombres"""
+    return (
+        *fila[:7],
+        dimensiones.nombre_categoria(fila[7]),
+        dimensiones.nombre_proveedor(fila[8]),
+        *fila[9:]
+    )
+
 # Ruta para listar todos los productos
+# Sin parámetros devuelve el catálogo completo; con limit/after pagina por cursor
+# y admite filtros: categoria_id, proveedor_id, stock_min, stock_max, nombre (prefijo),
+# orden (id | nombre) e incluir_total=1; con format=ndjson|csv exporta en streaming
 @productos_bp.route('/productos', methods=['GET'])
 def listar_productos():
-    cursor = mysql.connection.cursor()
+    try:
+        limit = parametro_entero('limit')
+        categoria_id = parametro_entero('categoria_id')
+        proveedor_id = parametro_entero('proveedor_id')
+        stock_min = parametro_entero('stock_min')
+        stock_max = parametro_entero('stock_max')
+        after = request.args.get('after')
+        orden = request.args.get('orden', 'id')
+        nombre = request.args.get('nombre', '').strip()
+        incluir_total = request.args.get('incluir_total') in ('1', 'true')
+        formato = request.args.get('format')
+        
+        if formato and formato not in FORMATOS_EXPORTACION:
+            raise ValueError("Formato no soportado. Use ndjson o csv")
+        if orden not in ('id', 'nombre'):
+            raise ValueError("El parámetro 'orden' debe ser 'id' o 'nombre'")
+        
+        posicion = decodificar_cursor(after) if after else None
+        if posicion is not None and len(posicion) != (1 if orden == 'id' else 2):
+            raise ValueError("Cursor 'after' inválido para este orden")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    paginar = limit is not None or after is not None
+    if paginar:
+        limit = ajustar_limite(limit)
+    
+    # Filtros del lado del servidor
+    condiciones = []
+    valores = []
     
-    # Consulta SQL con JOIN para traer nombres de categoría y proveedor
+    if categoria_id is not None:
+        condiciones.append("p.categoria_id = %s")
+        valores.append(categoria_id)
+    if proveedor_id is not None:
+        condiciones.append("p.proveedor_id = %s")
+        valores.append(proveedor_id)
+    if stock_min is not None:
+        condiciones.append("p.stock_actual >= %s")
+        valores.append(stock_min)
+    if stock_max is not None:
+        condiciones.append("p.stock_actual <= %s")
+        valores.append(stock_max)
+    if nombre:
+        # Prefijo: escapar comodines de LIKE
+        prefijo = nombre.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        condiciones.append("p.nombre LIKE %s")
+        valores.append(prefijo + '%')
+    
+    # Solo columnas de productos: los nombres de categoría y proveedor
+    # se resuelven en memoria con la caché de dimensiones
     query = """
     SELECT 
         p.id, p.nombre, p.descripcion, p.precio_compra, p.precio_venta,
         p.stock_actual, p.stock_minimo,
-        c.nombre as categoria_nombre,
-        pr.nombre as proveedor_nombre
+        p.categoria_id, p.proveedor_id
     FROM productos p
-    LEFT JOIN categorias c ON p.categoria_id = c.id
-    LEFT JOIN proveedores pr ON p.proveedor_id = pr.id
     """
+    orden_sql = " ORDER BY p.id" if orden == 'id' else " ORDER BY p.nombre, p.id"
+    
+    # Exportación en streaming (?format=ndjson|csv): todo el resultado filtrado, sin paginar.
+    # Las filas van directo del cursor a la respuesta, así que aquí se mantiene el JOIN
+    if formato:
+        query_exportacion = """
+        SELECT 
+            p.id, p.nombre, p.descripcion, p.precio_compra, p.precio_venta,
+            p.stock_actual, p.stock_minimo,
+            c.nombre as categoria_nombre,
+            pr.nombre as proveedor_nombre
+        FROM productos p
+        LEFT JOIN categorias c ON p.categoria_id = c.id
+        LEFT JOIN proveedores pr ON p.proveedor_id = pr.id
+        """
+        if condiciones:
+            query_exportacion += " WHERE " + " AND ".join(condiciones)
+        return exportar_consulta(query_exportacion + orden_sql, valores, formato, 'productos')
     
-    cursor.execute(query)
-    productos = cursor.fetchall()
+    cursor = mysql.connection.cursor()
+    
+    total = None
+    if incluir_total:
+        query_total = "SELECT COUNT(*) FROM productos p"
+        if condiciones:
+            query_total += " WHERE " + " AND ".join(condiciones)
+        cursor.execute(query_total, valores)
+        total = cursor.fetchone()[0]
+    
+    # Posición del cursor (keyset): seguir después del último producto devuelto
+    condiciones_pagina = list(condiciones)
+    valores_pagina = list(valores)
+    if posicion is not None:
+        if orden == 'id':
+            condiciones_pagina.append("p.id > %s")
+            valores_pagina.append(posicion[0])
+        else:
+            condiciones_pagina.append("(p.nombre > %s OR (p.nombre = %s AND p.id > %s))")
+            valores_pagina.extend([posicion[0], posicion[0], posicion[1]])
+    
+    if condiciones_pagina:
+        query += " WHERE " + " AND ".join(condiciones_pagina)
+    query += orden_sql
+    if paginar:
+        # Pedir uno de más para saber si hay página siguiente
+        query += " LIMIT %s"
+        valores_pagina.append(limit + 1)
+    
+    cursor.execute(query, valores_pagina)
+    productos = [_con_nombres(fila) for fila in cursor.fetchall()]
     cursor.close()
     
-    return jsonify({"productos": productos})
+    if not paginar:
+        respuesta = {"productos": productos}
+        if total is not None:
+            respuesta["total"] = total
+        return jsonify(respuesta)
+    
+    siguiente = None
+    if len(productos) > limit:
+        productos = productos[:limit]
+        ultimo = productos[-1]
+        siguiente = codificar_cursor([ultimo[0]] if orden == 'id' else [ultimo[1], ultimo[0]])
+    
+    paginacion = {"limit": limit, "siguiente": siguiente}
+    if total is not None:
+        paginacion["total"] = total
+    
+    return jsonify({"productos": productos, "paginacion": paginacion})
 
 # Ruta para ver un producto específico
 @productos_bp.route('/productos/<int:producto_id>', methods=['GET'])
 def obtener_producto(producto_id):
-    cursor = mysql.connection.cursor()
+    # Atributos estáticos desde el catálogo en memoria; el stock, siempre de la BD
+    producto = catalogo_productos.obtener(producto_id)
     
-    # Consulta SQL para un producto específico
-    query = """
-    SELECT 
-        p.id, p.nombre, p.descripcion, p.precio_compra, p.precio_venta,
-        p.stock_actual, p.stock_minimo,
-        c.nombre as categoria_nombre,
-        pr.nombre as proveedor_nombre
-    FROM productos p
-    LEFT JOIN categorias c ON p.categoria_id = c.id
-    LEFT JOIN proveedores pr ON p.proveedor_id = pr.id
-    WHERE p.id = %s
-    """
+    # Si no encuentra el producto
+    if not producto:
+        return jsonify({"error": "Producto no encontrado"}), 404
     
-    cursor.execute(query, (producto_id,))
-    producto = cursor.fetchone()
+    cursor = mysql.connection.cursor()
+    stock = catalogo_productos.stock_de(cursor, [producto_id])
     cursor.close()
     
-    # Si no encuentra el producto
-    if not producto:
+    # Eliminado después de la última verificación del catálogo
+    if producto_id not in stock:
         return jsonify({"error": "Producto no encontrado"}), 404
     
-    return jsonify({"producto": producto})
+    return jsonify({"producto": catalogo_productos.fila(producto, stock[producto_id])})
+
+def _confirmar_cambio(cursor, producto_id):
+    """
+    Registra el cambio en el catálogo, confirma la transacción y cierra el cursor
+
+    Returns:
+        Respuesta de error si faltan las tablas del catálogo, o None
+    """
+    try:
+        catalogo_productos.registrar_cambio(cursor, [producto_id])
+    except ErrorCatalogo as e:
+        mysql.connection.rollback()
+        cursor.close()
+        return jsonify({"success": False, "message": str(e)}), 503
+    mysql.connection.commit()
+    cache_reportes.invalidar()
+    catalogo_productos.invalidar()
+    cursor.close()
+    return None
 
 # Ruta para agregar un producto nuevo- para esto tuvimos que importar 
 #request 
@@ -90,11 +226,12 @@ def agregar_producto():
     )
     
     cursor.execute(query, valores)
-    mysql.connection.commit()
     
     # Obtener el ID del producto recién creado
     producto_id = cursor.lastrowid
-    cursor.close()
+    error = _confirmar_cambio(cursor, producto_id)
+    if error:
+        return error
     
     return jsonify({
         "mensaje": "Producto agregado exitosamente",
@@ -115,8 +252,9 @@ def eliminar_producto(producto_id):
     
     # Eliminar el producto
     cursor.execute("DELETE FROM productos WHERE id = %s", (producto_id,))
-    mysql.connection.commit()
-    cursor.close()
+    error = _confirmar_cambio(cursor, producto_id)
+    if error:
+        return error
     
     return jsonify({"mensaje": f"Producto {producto_id} eliminado exitosamente"}), 200    
 
@@ -160,8 +298,9 @@ def actualizar_producto(producto_id):
     # Ejecutar la actualización
     query = f"UPDATE productos SET {', '.join(campos_actualizar)} WHERE id = %s"
     cursor.execute(query, valores)
-    mysql.connection.commit()
-    cursor.close()
+    error = _confirmar_cambio(cursor, producto_id)
+    if error:
+        return error
     
     return jsonify({"mensaje": f"Producto {producto_id} actualizado exitosamente"}), 200
 
@@ -176,17 +315,15 @@ def productos_stock_bajo():
     query = """
     SELECT p.id, p.nombre, p.descripcion, p.precio_compra, p.precio_venta,
            p.stock_actual, p.stock_minimo, 
-           c.nombre as categoria, pr.nombre as proveedor,
+           p.categoria_id, p.proveedor_id,
            (p.stock_actual - p.stock_minimo) as diferencia
     FROM productos p
-    LEFT JOIN categorias c ON p.categoria_id = c.id
-    LEFT JOIN proveedores pr ON p.proveedor_id = pr.id
     WHERE p.stock_actual <= p.stock_minimo
     ORDER BY (p.stock_actual - p.stock_minimo) ASC, p.stock_actual ASC
     """
     
     cursor.execute(query)
-    productos = cursor.fetchall()
+    productos = [_con_nombres(fila) for fila in cursor.fetchall()]
     cursor.close()
     
     if not productos:
@@ -203,34 +340,24 @@ def productos_stock_bajo():
 
 @productos_bp.route('/productos/categoria/<int:categoria_id>', methods=['GET'])
 def productos_por_categoria(categoria_id):
-    cursor = mysql.connection.cursor()
-    
     # Verificar que la categoría existe
-    cursor.execute("SELECT nombre FROM categorias WHERE id = %s", (categoria_id,))
-    categoria = cursor.fetchone()
+    categoria = dimensiones.nombre_categoria(categoria_id)
     
-    if not categoria:
-        cursor.close()
+    if categoria is None:
         return jsonify({"error": "Categoría no encontrada"}), 404
     
-    # Obtener productos de la categoría
-    query = """
-    SELECT p.id, p.nombre, p.descripcion, p.precio_compra, p.precio_venta,
-           p.stock_actual, p.stock_minimo, 
-           c.nombre as categoria, pr.nombre as proveedor
-    FROM productos p
-    LEFT JOIN categorias c ON p.categoria_id = c.id
-    LEFT JOIN proveedores pr ON p.proveedor_id = pr.id
-    WHERE p.categoria_id = %s
-    ORDER BY p.nombre ASC
-    """
-    
-    cursor.execute(query, (categoria_id,))
-    productos = cursor.fetchall()
+    # Productos de la categoría desde el catálogo en memoria, con su stock actual
+    catalogo = catalogo_productos.por_categoria(categoria_id)
+    cursor = mysql.connection.cursor()
+    stock = catalogo_productos.stock_de(cursor, [producto.id for producto in catalogo])
     cursor.close()
+    productos = [
+        catalogo_productos.fila(producto, stock[producto.id])
+        for producto in catalogo if producto.id in stock
+    ]
     
     return jsonify({
-        "categoria": categoria[0],
+        "categoria": categoria,
         "categoria_id": categoria_id,
         "total_productos": len(productos),
         "productos": productos
@@ -239,34 +366,24 @@ def productos_por_categoria(categoria_id):
 
 @productos_bp.route('/productos/proveedor/<int:proveedor_id>', methods=['GET'])
 def productos_por_proveedor(proveedor_id):
-    cursor = mysql.connection.cursor()
-    
     # Verificar que el proveedor existe
-    cursor.execute("SELECT nombre FROM proveedores WHERE id = %s", (proveedor_id,))
-    proveedor = cursor.fetchone()
+    proveedor = dimensiones.nombre_proveedor(proveedor_id)
     
-    if not proveedor:
-        cursor.close()
+    if proveedor is None:
         return jsonify({"error": "Proveedor no encontrado"}), 404
     
-    # Obtener productos del proveedor
-    query = """
-    SELECT p.id, p.nombre, p.descripcion, p.precio_compra, p.precio_venta,
-           p.stock_actual, p.stock_minimo, 
-           c.nombre as categoria, pr.nombre as proveedor
-    FROM productos p
-    LEFT JOIN categorias c ON p.categoria_id = c.id
-    LEFT JOIN proveedores pr ON p.proveedor_id = pr.id
-    WHERE p.proveedor_id = %s
-    ORDER BY p.nombre ASC
-    """
-    
-    cursor.execute(query, (proveedor_id,))
-    productos = cursor.fetchall()
+    # Productos del proveedor desde el catálogo en memoria, con su stock actual
+    catalogo = catalogo_productos.por_proveedor(proveedor_id)
+    cursor = mysql.connection.cursor()
+    stock = catalogo_productos.stock_de(cursor, [producto.id for producto in catalogo])
     cursor.close()
+    productos = [
+        catalogo_productos.fila(producto, stock[producto.id])
+        for producto in catalogo if producto.id in stock
+    ]
     
     return jsonify({
-        "proveedor": proveedor[0],
+        "proveedor": proveedor,
         "proveedor_id": proveedor_id,
         "total_productos": len(productos),
         "productos": productos
@@ -1,5 +1,6 @@
 from flask import Blueprint, jsonify, request
 from app.database import mysql
+from app.services.dimensiones import dimensiones
 
 proveedores_bp = Blueprint('proveedores', __name__)
 
@@ -86,8 +87,10 @@ def crear_proveedor():
             VALUES (%s, %s, %s, %s, %s)
         """
         cursor.execute(query, (nombre, contacto, telefono, email, direccion))
-        mysql.connection.commit()
         nuevo_id = cursor.lastrowid
+        dimensiones.registrar_cambio(cursor, 'proveedores')
+        mysql.connection.commit()
+        dimensiones.invalidar()
         cursor.close()
         return jsonify({
             'success': True,
@@ -163,7 +166,9 @@ def actualizar_proveedor(id):
         valores.append(id)
         query = f"UPDATE proveedores SET {', '.join(campos_actualizar)} WHERE id = %s"
         cursor.execute(query, valores)
+        dimensiones.registrar_cambio(cursor, 'proveedores')
         mysql.connection.commit()
+        dimensiones.invalidar()
         cursor.close()
         return jsonify({
             'success': True,
@@ -204,7 +209,9 @@ def eliminar_proveedor(id):
                 'message': f'No se puede eliminar el proveedor porque tiene {productos_count} productos asociados'
             }), 400
         cursor.execute("DELETE FROM proveedores WHERE id = %s", (id,))
+        dimensiones.registrar_cambio(cursor, 'proveedores')
         mysql.connection.commit()
+        dimensiones.invalidar()
         cursor.close()
         return jsonify({
             'success': True,
@@ -3,11 +3,47 @@ Rutas de Reportes con IA
 5 endpoints que devuelven reportes agrupados con períodos automáticos
 """
 
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, request, Response
 from app.services.reporte_service import ReporteService
+from app.services.contexto_reporte import ContextoReporte
+from app.services.cache_reportes import cache_reportes
+from app.services.pronostico_service import PronosticoService
+from app.services.cola_trabajos import cola_trabajos, ErrorTrabajo
 
 reportes_bp = Blueprint('reportes', __name__, url_prefix='/reportes')
 
+def _reporte_en_cache(nombre, generar):
+    """
+    Obtiene un reporte desde la caché o lo genera
+    Los reportes con success=False no se guardan
+    """
+    return cache_reportes.obtener(
+        nombre, generar,
+        es_valido=lambda reporte: reporte.get('success', True)
+    )
+
+def _actualizar_pronosticos_si_se_pide():
+    """
+    Con ?actualizar=1, recalcula antes los pronósticos de los productos
+    facturados desde la última corrida materializada
+
+    Sin corridas previas eso sería el catálogo completo: en lugar de hacerlo
+    dentro de la solicitud se encola un trabajo 'pronosticos' y el reporte de
+    esta solicitud se calcula en vivo
+
+    Returns:
+        dict: El trabajo encolado, o None
+    """
+    if request.args.get('actualizar') != '1':
+        return None
+    if not PronosticoService.hay_corridas():
+        trabajo, _ = cola_trabajos.enviar('pronosticos', {'parcial': False})
+        return trabajo
+    corrida = PronosticoService.materializar(parcial=True)
+    if corrida and corrida['productos_calculados']:
+        cache_reportes.invalidar()
+    return None
+
 @reportes_bp.route('/stock-critico', methods=['GET'])
 def obtener_reporte_stock_critico():
     """
@@ -15,7 +51,7 @@ def obtener_reporte_stock_critico():
     Agrupado por niveles: Crítico, Medio, Bueno
     """
     try:
-        reporte = ReporteService.obtener_reporte_stock_critico()
+        reporte = _reporte_en_cache('stock-critico', ReporteService.obtener_reporte_stock_critico)
         
         # Agrupar por niveles de criticidad
         resultado = {
@@ -69,7 +105,8 @@ def obtener_reporte_prediccion_demanda():
     Período automático: últimos 30 días para predecir próximos 30 días
     """
     try:
-        reporte = ReporteService.obtener_reporte_prediccion_demanda()
+        trabajo_pronosticos = _actualizar_pronosticos_si_se_pide()
+        reporte = _reporte_en_cache('prediccion-demanda', ReporteService.obtener_reporte_prediccion_demanda)
         
         # Agrupar por niveles de demanda
         resultado = {
@@ -85,6 +122,8 @@ def obtener_reporte_prediccion_demanda():
             'por_categoria': {},
             'productos_alta_demanda': [p for p in reporte['predicciones'] if p['nivel_demanda'] == 'ALTA']
         }
+        if trabajo_pronosticos:
+            resultado['trabajo_pronosticos'] = trabajo_pronosticos
         
         # Agrupar por categoría
         for prediccion in reporte['predicciones']:
@@ -125,7 +164,8 @@ def obtener_reporte_prediccion_agotamiento():
     Período automático: ventas de últimos 15 días
     """
     try:
-        reporte = ReporteService.obtener_reporte_prediccion_agotamiento()
+        trabajo_pronosticos = _actualizar_pronosticos_si_se_pide()
+        reporte = _reporte_en_cache('prediccion-agotamiento', ReporteService.obtener_reporte_prediccion_agotamiento)
         
         # Agrupar por urgencia de agotamiento
         resultado = {
@@ -140,6 +180,8 @@ def obtener_reporte_prediccion_agotamiento():
             'por_categoria': {},
             'productos_urgentes': [p for p in reporte['predicciones'] if p['urgencia'] == 'URGENTE']
         }
+        if trabajo_pronosticos:
+            resultado['trabajo_pronosticos'] = trabajo_pronosticos
         
         # Agrupar por categoría
         for prediccion in reporte['predicciones']:
@@ -185,7 +227,7 @@ def obtener_reporte_sobrestock():
     Estado actual del inventario
     """
     try:
-        reporte = ReporteService.obtener_reporte_sobrestock()
+        reporte = _reporte_en_cache('sobrestock', ReporteService.obtener_reporte_sobrestock)
         
         # Agrupar por nivel de sobrestock
         resultado = {
@@ -240,7 +282,7 @@ def obtener_reporte_rotacion_productos():
     Período automático: último mes (30 días)
     """
     try:
-        reporte = ReporteService.obtener_reporte_rotacion_productos()
+        reporte = _reporte_en_cache('rotacion-productos', ReporteService.obtener_reporte_rotacion_productos)
         
         # Agrupar por velocidad de rotación
         resultado = {
@@ -302,10 +344,23 @@ def obtener_resumen_general():
     Dashboard principal
     """
     try:
-        # Obtener todos los reportes
-        stock_critico = ReporteService.obtener_reporte_stock_critico()
-        sobrestock = ReporteService.obtener_reporte_sobrestock()
-        rotacion = ReporteService.obtener_reporte_rotacion_productos()
+        def generar_reportes():
+            # Cargar productos y ventas una sola vez y compartirlos entre reportes
+            contexto = ContextoReporte.cargar()
+            
+            return {
+                'stock_critico': ReporteService.obtener_reporte_stock_critico(contexto),
+                'sobrestock': ReporteService.obtener_reporte_sobrestock(contexto),
+                'rotacion': ReporteService.obtener_reporte_rotacion_productos(contexto)
+            }
+        
+        reportes = cache_reportes.obtener(
+            'resumen-general', generar_reportes,
+            es_valido=lambda r: all(reporte.get('success', True) for reporte in r.values())
+        )
+        stock_critico = reportes['stock_critico']
+        sobrestock = reportes['sobrestock']
+        rotacion = reportes['rotacion']
         
         resultado = {
             'fecha_generacion': stock_critico['fecha_generacion'],
@@ -351,4 +406,106 @@ def obtener_resumen_general():
             'success': False,
             'error': str(e)
         }), 500
-        
\ No newline at end of file
+        
+
+@reportes_bp.route('/cache', methods=['GET'])
+def obtener_estadisticas_cache():
+    """
+    Estadísticas de la caché de reportes (aciertos, fallos, invalidaciones)
+    """
+    return jsonify({
+        'success': True,
+        'data': cache_reportes.estadisticas()
+    })
+
+# Reportes que se pueden pedir como trabajo en segundo plano (POST /reportes/jobs)
+for _nombre, _generar in [
+    ('stock-critico', ReporteService.obtener_reporte_stock_critico),
+    ('prediccion-demanda', ReporteService.obtener_reporte_prediccion_demanda),
+    ('prediccion-agotamiento', ReporteService.obtener_reporte_prediccion_agotamiento),
+    ('sobrestock', ReporteService.obtener_reporte_sobrestock),
+    ('rotacion-productos', ReporteService.obtener_reporte_rotacion_productos)
+]:
+    # El resultado queda también en la caché de reportes
+    cola_trabajos.registrar(_nombre, lambda nombre=_nombre, generar=_generar: _reporte_en_cache(nombre, generar))
+
+def _materializar_pronosticos(parcial=False, avance=None):
+    corrida = PronosticoService.materializar(parcial=bool(parcial), avance=avance)
+    if corrida and corrida['productos_calculados']:
+        cache_reportes.invalidar()
+    return corrida
+
+cola_trabajos.registrar('pronosticos', _materializar_pronosticos, ['parcial'], con_avance=True)
+
+@reportes_bp.route('/jobs', methods=['POST'])
+def crear_trabajo():
+    """
+    Encola un reporte pesado: {"tipo": "prediccion-demanda", "parametros": {}}
+    Si ya hay un trabajo igual pendiente o en curso, devuelve ese
+    """
+    data = request.get_json(silent=True) or {}
+    
+    if not data.get('tipo'):
+        return jsonify({
+            'success': False,
+            'message': f"Se requiere tipo ({', '.join(cola_trabajos.tipos())})"
+        }), 400
+    
+    parametros = data.get('parametros') or {}
+    if not isinstance(parametros, dict):
+        return jsonify({
+            'success': False,
+            'message': 'parametros debe ser un objeto JSON'
+        }), 400
+    
+    try:
+        trabajo, es_nuevo = cola_trabajos.enviar(data['tipo'], parametros)
+    except ErrorTrabajo as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
+    
+    return jsonify({
+        'success': True,
+        'message': 'Trabajo encolado' if es_nuevo else 'Ya existe un trabajo igual en curso',
+        'data': trabajo
+    }), 202
+
+@reportes_bp.route('/jobs/<trabajo_id>', methods=['GET'])
+def obtener_trabajo(trabajo_id):
+    """
+    Estado y progreso de un trabajo (pendiente, en_curso, completado, fallido)
+    """
+    trabajo = cola_trabajos.obtener(trabajo_id)
+    if not trabajo:
+        return jsonify({
+            'success': False,
+            'message': 'Trabajo no encontrado'
+        }), 404
+    
+    return jsonify({
+        'success': True,
+        'data': trabajo
+    })
+
+@reportes_bp.route('/jobs/<trabajo_id>/resultado', methods=['GET'])
+def obtener_resultado_trabajo(trabajo_id):
+    """
+    Resultado del trabajo en JSON, tal como lo devolvió el reporte
+    """
+    trabajo = cola_trabajos.obtener(trabajo_id, incluir_resultado=True)
+    if not trabajo:
+        return jsonify({
+            'success': False,
+            'message': 'Trabajo no encontrado'
+        }), 404
+    
+    if trabajo['resultado'] is None:
+        return jsonify({
+            'success': False,
+            'message': f"El trabajo está {trabajo['estado']}",
+            'error': trabajo['error']
+        }), 409
+    
+    return Response(trabajo['resultado'], mimetype='application/json')
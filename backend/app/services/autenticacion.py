@@ -0,0 +1,236 @@
+"""
+Autenticación
+Hash de contraseñas con factor de trabajo configurable y verificación en
+tiempo constante, tokens de sesión firmados (sin estado en el servidor) y
+límites de intentos guardados en memoria.
+
+La verificación del hash (y el rehash al iniciar sesión) es deliberadamente
+costosa en CPU; un semáforo acota cuántas corren a la vez para que una ráfaga
+de intentos no deje sin hilos al resto de las rutas.
+
+Los fallos se cuentan por usuario con espera exponencial: rotar de IP no
+multiplica los intentos contra una cuenta, y como la espera tiene tope y no
+hay bloqueo, un atacante solo puede demorar al dueño, no dejarlo afuera. El
+límite por IP acota a quien prueba muchos usuarios desde la misma IP. Los
+límites son por proceso.
+"""
+
+import hmac
+import os
+import secrets
+import threading
+import time
+from collections import deque
+
+from itsdangerous import BadSignature, SignatureExpired, URLSafeTimedSerializer
+from werkzeug.security import check_password_hash, generate_password_hash
+
+# Prefijos de los hashes de werkzeug; cualquier otro valor es una contraseña en texto plano heredada
+PREFIJOS_HASH = ('pbkdf2:', 'scrypt:')
+
+SAL_TOKEN_SESION = 'sesion-usuario'
+
+class ErrorVerificacionOcupada(Exception):
+    """Todas las verificaciones de contraseña permitidas están en curso"""
+
+class RetardoExponencial:
+    """
+    Espera creciente por clave tras varios fallos seguidos: después de
+    `libres` fallos, 1, 2, 4... segundos hasta `espera_maxima`. Los fallos se
+    olvidan tras `olvido_segundos` sin fallar o con limpiar() (acierto)
+    """
+
+    def __init__(self, libres, espera_maxima, olvido_segundos, max_claves=100000):
+        self.libres = libres
+        self.espera_maxima = espera_maxima
+        self.olvido_segundos = olvido_segundos
+        self.max_claves = max_claves
+        self._fallos = {}  # clave -> (fallos seguidos, instante del último)
+        self._lock = threading.Lock()
+
+    def _retardo(self, fallos):
+        if fallos < self.libres:
+            return 0
+        return min(self.espera_maxima, 2 ** (fallos - self.libres))
+
+    def _vigente(self, clave, ahora):
+        entrada = self._fallos.get(clave)
+        if entrada is not None and ahora - entrada[1] > self.olvido_segundos:
+            del self._fallos[clave]
+            return None
+        return entrada
+
+    def espera(self, clave):
+        """Segundos hasta que la clave pueda volver a intentar (0 si puede ahora)"""
+        ahora = time.monotonic()
+        with self._lock:
+            entrada = self._vigente(clave, ahora)
+            if entrada is None:
+                return 0
+            restante = entrada[1] + self._retardo(entrada[0]) - ahora
+            return max(1, int(restante) + 1) if restante > 0 else 0
+
+    def registrar(self, clave):
+        ahora = time.monotonic()
+        with self._lock:
+            if clave not in self._fallos and len(self._fallos) >= self.max_claves:
+                for vieja in list(self._fallos):
+                    self._vigente(vieja, ahora)
+            entrada = self._vigente(clave, ahora)
+            self._fallos[clave] = ((entrada[0] if entrada else 0) + 1, ahora)
+
+    def limpiar(self, clave):
+        with self._lock:
+            self._fallos.pop(clave, None)
+
+class LimitadorIntentos:
+    """Ventana deslizante de intentos por clave (usuario o IP)"""
+
+    def __init__(self, maximo, ventana_segundos, max_claves=100000):
+        self.maximo = maximo
+        self.ventana_segundos = ventana_segundos
+        self.max_claves = max_claves
+        self._intentos = {}  # clave -> deque de instantes
+        self._lock = threading.Lock()
+
+    def _vigentes(self, clave, ahora):
+        instantes = self._intentos.get(clave)
+        if instantes is None:
+            return None
+        while instantes and instantes[0] <= ahora - self.ventana_segundos:
+            instantes.popleft()
+        if not instantes:
+            del self._intentos[clave]
+            return None
+        return instantes
+
+    def espera(self, clave):
+        """Segundos hasta que la clave pueda volver a intentar (0 si no está bloqueada)"""
+        ahora = time.monotonic()
+        with self._lock:
+            instantes = self._vigentes(clave, ahora)
+            if instantes is None or len(instantes) < self.maximo:
+                return 0
+            return max(1, int(instantes[0] + self.ventana_segundos - ahora) + 1)
+
+    def registrar(self, clave):
+        ahora = time.monotonic()
+        with self._lock:
+            if clave not in self._intentos and len(self._intentos) >= self.max_claves:
+                # Ráfaga con muchas claves distintas: descartar las ya vencidas
+                for vieja in list(self._intentos):
+                    self._vigentes(vieja, ahora)
+            self._intentos.setdefault(clave, deque()).append(ahora)
+
+    def limpiar(self, clave):
+        with self._lock:
+            self._intentos.pop(clave, None)
+
+class Autenticacion:
+
+    def __init__(self):
+        self.metodo_hash = 'pbkdf2:sha256:600000'
+        self.duracion_token = 8 * 3600
+        self.espera_verificacion = 2
+        self._serializador = None
+        self._verificaciones = threading.BoundedSemaphore(4)
+        self._hash_ficticio = None
+        self.retardo_usuario = RetardoExponencial(5, 900, 3600)
+        self.limitador_ip = LimitadorIntentos(30, 60)
+
+    def init_app(self, app):
+        """
+        Lee AUTH_METODO_HASH, AUTH_VERIFICACIONES_SIMULTANEAS, AUTH_ESPERA_VERIFICACION,
+        AUTH_DURACION_TOKEN, AUTH_INTENTOS_USUARIO, AUTH_ESPERA_MAXIMA_USUARIO,
+        AUTH_OLVIDO_FALLOS, AUTH_INTENTOS_IP y AUTH_VENTANA_IP
+        """
+        if not app.config.get('SECRET_KEY'):
+            app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY')
+        if not app.config.get('SECRET_KEY'):
+            # Sin SECRET_KEY fija, cada proceso firma con su propia clave: un
+            # token emitido por un worker no vale en otro ni tras reiniciar
+            app.config['SECRET_KEY'] = secrets.token_hex(32)
+            app.logger.warning(
+                'SECRET_KEY no está configurada: se generó una clave aleatoria para este proceso. '
+                'Los tokens de sesión no valen en otros workers ni sobreviven a un reinicio. '
+                'Defina la variable de entorno SECRET_KEY en producción.'
+            )
+
+        self.metodo_hash = app.config.get('AUTH_METODO_HASH', self.metodo_hash)
+        self.duracion_token = app.config.get('AUTH_DURACION_TOKEN', self.duracion_token)
+        self.espera_verificacion = app.config.get('AUTH_ESPERA_VERIFICACION', self.espera_verificacion)
+        self._verificaciones = threading.BoundedSemaphore(app.config.get('AUTH_VERIFICACIONES_SIMULTANEAS', 4))
+        self._serializador = URLSafeTimedSerializer(app.config['SECRET_KEY'], salt=SAL_TOKEN_SESION)
+        self._hash_ficticio = None
+        self.retardo_usuario = RetardoExponencial(
+            app.config.get('AUTH_INTENTOS_USUARIO', 5),
+            app.config.get('AUTH_ESPERA_MAXIMA_USUARIO', 900),
+            app.config.get('AUTH_OLVIDO_FALLOS', 3600)
+        )
+        self.limitador_ip = LimitadorIntentos(
+            app.config.get('AUTH_INTENTOS_IP', 30),
+            app.config.get('AUTH_VENTANA_IP', 60)
+        )
+
+    # ------------------------------------------------------------------
+    # Contraseñas
+    # ------------------------------------------------------------------
+
+    def hashear(self, password):
+        return generate_password_hash(password, method=self.metodo_hash)
+
+    def requiere_rehash(self, almacenada):
+        """True si la contraseña guardada es texto plano o usa otro factor de trabajo"""
+        return not almacenada.startswith(self.metodo_hash + '$')
+
+    def verificar(self, password, almacenada):
+        """
+        Compara la contraseña contra el valor guardado en tiempo constante.
+        Con almacenada=None (usuario inexistente) igual calcula un hash, para que
+        el tiempo de respuesta no revele qué usuarios existen
+
+        Si la contraseña es correcta pero está en texto plano o con otro factor
+        de trabajo, calcula también el hash nuevo, dentro del mismo lugar del
+        semáforo
+
+        Returns:
+            tuple: (valida, hash_nuevo); hash_nuevo es None si no hay que reemplazarlo
+
+        Raises:
+            ErrorVerificacionOcupada: Si no se liberó un lugar en espera_verificacion segundos
+        """
+        if not self._verificaciones.acquire(timeout=self.espera_verificacion):
+            raise ErrorVerificacionOcupada('Demasiados inicios de sesión simultáneos. Intente nuevamente')
+        try:
+            if almacenada is None:
+                if self._hash_ficticio is None:
+                    self._hash_ficticio = self.hashear(secrets.token_hex(16))
+                check_password_hash(self._hash_ficticio, password)
+                return False, None
+            if almacenada.startswith(PREFIJOS_HASH):
+                valida = check_password_hash(almacenada, password)
+            else:
+                # Texto plano heredado: se reemplaza por el hash al iniciar sesión
+                valida = hmac.compare_digest(almacenada.encode('utf-8'), password.encode('utf-8'))
+            if valida and self.requiere_rehash(almacenada):
+                return True, self.hashear(password)
+            return valida, None
+        finally:
+            self._verificaciones.release()
+
+    # ------------------------------------------------------------------
+    # Tokens de sesión
+    # ------------------------------------------------------------------
+
+    def emitir_token(self, usuario):
+        """Token firmado con los datos del usuario (id, nombre, email, rol)"""
+        return self._serializador.dumps(usuario)
+
+    def leer_token(self, token):
+        """Datos del usuario del token, o None si la firma no es válida o venció"""
+        try:
+            return self._serializador.loads(token, max_age=self.duracion_token)
+        except (BadSignature, SignatureExpired):
+            return None
+
+autenticacion = Autenticacion()
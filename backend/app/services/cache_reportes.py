@@ -0,0 +1,138 @@
+"""
+Caché de Reportes
+Guarda en memoria el resultado de los reportes de IA por nombre y parámetros,
+con vencimiento (TTL), límite de entradas (LRU) e invalidación explícita
+desde las rutas que modifican stock, facturas o productos.
+
+La caché es por proceso: cada worker tiene la suya y el TTL acota cuánto
+puede tardar un worker en ver una escritura hecha en otro.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+class _CalculoEnCurso:
+    """Cálculo de un reporte que otros hilos pueden esperar en vez de repetirlo"""
+
+    def __init__(self, generacion):
+        self.generacion = generacion
+        self.evento = threading.Event()
+        self.valor = None
+        self.error = None
+
+class CacheReportes:
+
+    def __init__(self, ttl_segundos=300, max_entradas=64):
+        self.ttl_segundos = ttl_segundos
+        self.max_entradas = max_entradas
+        self._entradas = OrderedDict()  # clave -> (vence_en, valor)
+        self._en_curso = {}             # clave -> _CalculoEnCurso
+        self._generacion = 0
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+        self.coalescidos = 0
+        self.invalidaciones = 0
+
+    def init_app(self, app):
+        """Lee REPORTES_CACHE_TTL y REPORTES_CACHE_MAX_ENTRADAS de la configuración"""
+        self.ttl_segundos = app.config.get('REPORTES_CACHE_TTL', self.ttl_segundos)
+        self.max_entradas = app.config.get('REPORTES_CACHE_MAX_ENTRADAS', self.max_entradas)
+
+    @staticmethod
+    def _clave(nombre, parametros):
+        return (nombre, tuple(sorted(parametros.items())))
+
+    def obtener(self, nombre, calcular, es_valido=None, **parametros):
+        """
+        Devuelve el reporte desde la caché o lo calcula una sola vez
+
+        Si varios hilos piden el mismo reporte sin caché, solo el primero lo
+        calcula y el resto espera su resultado.
+
+        Args:
+            nombre: Nombre del reporte (parte de la clave)
+            calcular: Función sin argumentos que genera el reporte
+            es_valido: Función opcional que decide si el resultado se guarda
+                       (por ejemplo, no guardar reportes con error)
+            **parametros: Parámetros del reporte (parte de la clave)
+
+        Returns:
+            El resultado del reporte
+        """
+        clave = self._clave(nombre, parametros)
+
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is not None:
+                if entrada[0] > time.monotonic():
+                    self._entradas.move_to_end(clave)
+                    self.aciertos += 1
+                    return entrada[1]
+                del self._entradas[clave]
+
+            calculo = self._en_curso.get(clave)
+            if calculo is None:
+                calculo = _CalculoEnCurso(self._generacion)
+                self._en_curso[clave] = calculo
+                self.fallos += 1
+                es_lider = True
+            else:
+                self.coalescidos += 1
+                es_lider = False
+
+        if not es_lider:
+            calculo.evento.wait()
+            if calculo.error is not None:
+                raise calculo.error
+            return calculo.valor
+
+        try:
+            calculo.valor = calcular()
+        except Exception as e:
+            calculo.error = e
+            raise
+        finally:
+            with self._lock:
+                self._en_curso.pop(clave, None)
+
+                # No guardar si hubo error o si se invalidó mientras se calculaba
+                guardar = (
+                    calculo.error is None
+                    and calculo.generacion == self._generacion
+                    and (es_valido is None or es_valido(calculo.valor))
+                )
+                if guardar:
+                    self._entradas[clave] = (time.monotonic() + self.ttl_segundos, calculo.valor)
+                    self._entradas.move_to_end(clave)
+                    while len(self._entradas) > self.max_entradas:
+                        self._entradas.popitem(last=False)
+
+            calculo.evento.set()
+
+        return calculo.valor
+
+    def invalidar(self):
+        """Descarta todos los reportes guardados (llamar después de un commit que cambie datos)"""
+        with self._lock:
+            self._entradas.clear()
+            self._generacion += 1
+            self.invalidaciones += 1
+
+    def estadisticas(self):
+        """Contadores de uso de la caché"""
+        with self._lock:
+            consultas = self.aciertos + self.fallos + self.coalescidos
+            return {
+                'entradas': len(self._entradas),
+                'max_entradas': self.max_entradas,
+                'ttl_segundos': self.ttl_segundos,
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'coalescidos': self.coalescidos,
+                'invalidaciones': self.invalidaciones,
+                'tasa_aciertos': round(self.aciertos / consultas, 3) if consultas else 0
+            }
+
+cache_reportes = CacheReportes()
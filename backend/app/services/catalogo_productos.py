@@ -0,0 +1,342 @@
+"""
+Catálogo de Productos en Memoria
+Guarda por proceso los atributos estáticos de cada producto (nombre, precios,
+stock mínimo, categoría y proveedor) con índices por categoría y proveedor,
+para que las lecturas frecuentes no vuelvan a MySQL. Los nombres de categoría
+y proveedor se resuelven con la caché de dimensiones.
+
+El stock no se guarda aquí: cambia con cada venta y entrada, y se consulta
+aparte con una lectura angosta por clave primaria (stock_de).
+
+Las rutas que modifican productos registran el cambio en la tabla
+catalogo_cambios dentro de su transacción; cada proceso lee esa tabla cada
+pocos segundos y recarga solo los productos cambiados (versión incremental).
+
+La versión de cada cambio sale del contador de una sola fila de
+catalogo_version, incrementado dentro de la misma transacción: el bloqueo de
+esa fila hace que las versiones se confirmen en orden, así que un lector que
+ya vio la versión N nunca verá aparecer después una versión menor. Las
+tablas y la fila del contador las crea `flask migrar` (migración 3).
+"""
+
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+
+import MySQLdb
+
+from app.database import mysql
+from app.services.dimensiones import dimensiones
+
+# Productos leídos por consulta al cargar o recargar
+TAMANO_LOTE_CATALOGO = 1000
+
+CREAR_TABLA_CAMBIOS_CATALOGO = """
+CREATE TABLE IF NOT EXISTS catalogo_cambios (
+    id BIGINT UNSIGNED NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    version BIGINT UNSIGNED NOT NULL,
+    producto_id INT NULL,
+    fecha DATETIME NOT NULL,
+    INDEX idx_catalogo_cambios_version (version),
+    INDEX idx_catalogo_cambios_fecha (fecha)
+)
+"""
+
+CREAR_TABLA_VERSION_CATALOGO = """
+CREATE TABLE IF NOT EXISTS catalogo_version (
+    id TINYINT UNSIGNED NOT NULL PRIMARY KEY,
+    version BIGINT UNSIGNED NOT NULL
+)
+"""
+
+QUERY_CATALOGO = """
+    SELECT
+        p.id, p.nombre, p.descripcion, p.precio_compra, p.precio_venta,
+        p.stock_minimo, p.categoria_id, p.proveedor_id
+    FROM productos p
+"""
+
+ProductoCatalogo = namedtuple('ProductoCatalogo', [
+    'id', 'nombre', 'descripcion', 'precio_compra', 'precio_venta',
+    'stock_minimo', 'categoria_id', 'proveedor_id'
+])
+
+ERROR_TABLA_INEXISTENTE = 1146
+
+def _marcadores(cantidad):
+    return ', '.join(['%s'] * cantidad)
+
+class ErrorCatalogo(Exception):
+    """Faltan las tablas del catálogo (no se ejecutó `flask migrar`)"""
+
+class CatalogoProductos:
+
+    def __init__(self, intervalo_verificacion=2, retencion_cambios=86400):
+        self.intervalo_verificacion = intervalo_verificacion
+        self.retencion_cambios = retencion_cambios
+        self._productos = None          # id -> ProductoCatalogo (None: sin cargar)
+        self._por_categoria = {}        # categoria_id -> set(ids)
+        self._por_proveedor = {}        # proveedor_id -> set(ids)
+        self._version = 0               # último cambio aplicado de catalogo_cambios
+        self._proxima_verificacion = 0.0
+        self._ultima_verificacion = 0.0
+        self._cambios_registrados = 0
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+        self.recargas_completas = 0
+        self.recargas_parciales = 0
+
+    def init_app(self, app):
+        """Lee CATALOGO_INTERVALO_VERIFICACION y CATALOGO_RETENCION_CAMBIOS de la configuración"""
+        self.intervalo_verificacion = app.config.get('CATALOGO_INTERVALO_VERIFICACION', self.intervalo_verificacion)
+        self.retencion_cambios = app.config.get('CATALOGO_RETENCION_CAMBIOS', self.retencion_cambios)
+
+    # ------------------------------------------------------------------
+    # Escrituras
+    # ------------------------------------------------------------------
+
+    def registrar_cambio(self, cursor, producto_ids=None):
+        """
+        Anota productos modificados para que todos los procesos los recarguen.
+        Llamar dentro de la transacción de la escritura, antes del commit
+
+        Args:
+            cursor: Cursor de la transacción en curso
+            producto_ids: Ids modificados; None recarga el catálogo completo
+
+        Raises:
+            ErrorCatalogo: Si faltan catalogo_version o su fila
+        """
+        # Bloquea la fila del contador hasta el commit; lastrowid devuelve el
+        # valor pasado a LAST_INSERT_ID()
+        try:
+            cursor.execute("UPDATE catalogo_version SET version = LAST_INSERT_ID(version + 1) WHERE id = 1")
+            actualizadas = cursor.rowcount
+        except MySQLdb.ProgrammingError as e:
+            if e.args[0] != ERROR_TABLA_INEXISTENTE:
+                raise
+            actualizadas = 0
+        if actualizadas != 1:
+            raise ErrorCatalogo('Falta el contador de versiones del catálogo: ejecutar flask migrar')
+        version = cursor.lastrowid
+
+        ids = [None] if producto_ids is None else list(producto_ids)
+        fecha = datetime.now().replace(microsecond=0)
+        cursor.executemany(
+            "INSERT INTO catalogo_cambios (version, producto_id, fecha) VALUES (%s, %s, %s)",
+            [(version, producto_id, fecha) for producto_id in ids]
+        )
+        # Depuración ocasional de cambios que ya leyeron todos los procesos activos
+        self._cambios_registrados += 1
+        if self._cambios_registrados % 100 == 0:
+            cursor.execute(
+                "DELETE FROM catalogo_cambios WHERE fecha < NOW() - INTERVAL %s SECOND",
+                (self.retencion_cambios,)
+            )
+
+    def invalidar(self):
+        """Fuerza a verificar cambios en la próxima lectura (llamar después del commit)"""
+        self._proxima_verificacion = 0.0
+
+    # ------------------------------------------------------------------
+    # Carga y recarga
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _leer(cursor, producto_ids=None):
+        """Filas del catálogo (todas o las de los ids dados) en lotes"""
+        if producto_ids is not None:
+            for inicio in range(0, len(producto_ids), TAMANO_LOTE_CATALOGO):
+                lote = producto_ids[inicio:inicio + TAMANO_LOTE_CATALOGO]
+                cursor.execute(QUERY_CATALOGO + f" WHERE p.id IN ({_marcadores(len(lote))})", lote)
+                yield from cursor.fetchall()
+            return
+
+        ultimo_id = 0
+        while True:
+            cursor.execute(QUERY_CATALOGO + " WHERE p.id > %s ORDER BY p.id LIMIT %s",
+                           (ultimo_id, TAMANO_LOTE_CATALOGO))
+            filas = cursor.fetchall()
+            yield from filas
+            if len(filas) < TAMANO_LOTE_CATALOGO:
+                return
+            ultimo_id = filas[-1][0]
+
+    def _quitar(self, producto):
+        for indice, clave in ((self._por_categoria, producto.categoria_id),
+                              (self._por_proveedor, producto.proveedor_id)):
+            ids = indice.get(clave)
+            if ids is not None:
+                ids.discard(producto.id)
+                if not ids:
+                    del indice[clave]
+
+    def _poner(self, fila):
+        producto = ProductoCatalogo(*fila)
+        anterior = self._productos.get(producto.id)
+        if anterior is not None:
+            self._quitar(anterior)
+        self._productos[producto.id] = producto
+        self._por_categoria.setdefault(producto.categoria_id, set()).add(producto.id)
+        self._por_proveedor.setdefault(producto.proveedor_id, set()).add(producto.id)
+
+    def _cargar_completo(self, cursor):
+        cursor.execute("SELECT version FROM catalogo_version WHERE id = 1")
+        fila = cursor.fetchone()
+        version = fila[0] if fila else 0
+        self._productos, self._por_categoria, self._por_proveedor = {}, {}, {}
+        for fila in self._leer(cursor):
+            self._poner(fila)
+        self._version = version
+        self.recargas_completas += 1
+
+    def _recargar(self, cursor, producto_ids):
+        encontrados = set()
+        for fila in self._leer(cursor, producto_ids):
+            self._poner(fila)
+            encontrados.add(fila[0])
+        for producto_id in set(producto_ids) - encontrados:
+            eliminado = self._productos.pop(producto_id, None)
+            if eliminado is not None:
+                self._quitar(eliminado)
+        self.recargas_parciales += 1
+
+    def _actualizar(self):
+        """Carga el catálogo la primera vez y luego aplica los cambios pendientes"""
+        ahora = time.monotonic()
+        if self._productos is not None and ahora < self._proxima_verificacion:
+            return
+
+        with self._lock:
+            if self._productos is not None and time.monotonic() < self._proxima_verificacion:
+                return
+
+            cursor = mysql.connection.cursor()
+            try:
+                # Un proceso inactivo más tiempo que la retención pudo perder cambios
+                vencido = ahora - self._ultima_verificacion > self.retencion_cambios
+                if self._productos is None or vencido:
+                    self._cargar_completo(cursor)
+                else:
+                    cursor.execute(
+                        "SELECT version, producto_id FROM catalogo_cambios WHERE version > %s ORDER BY version",
+                        (self._version,)
+                    )
+                    cambios = cursor.fetchall()
+                    if cambios:
+                        if any(producto_id is None for _, producto_id in cambios):
+                            self._cargar_completo(cursor)
+                        else:
+                            self._recargar(cursor, sorted({producto_id for _, producto_id in cambios}))
+                        self._version = max(self._version, cambios[-1][0])
+            finally:
+                cursor.close()
+
+            self._ultima_verificacion = time.monotonic()
+            self._proxima_verificacion = self._ultima_verificacion + self.intervalo_verificacion
+
+    # ------------------------------------------------------------------
+    # Lecturas
+    # ------------------------------------------------------------------
+
+    def obtener_varios(self, producto_ids):
+        """
+        Atributos estáticos de los productos pedidos
+
+        Los ids que no están en memoria se buscan en MySQL (pueden haberse creado
+        en otro proceso después de la última verificación); los que tampoco
+        existen allí no aparecen en el resultado.
+
+        Returns:
+            dict: {producto_id: ProductoCatalogo}
+        """
+        self._actualizar()
+        productos = {}
+        faltantes = []
+        with self._lock:
+            for producto_id in producto_ids:
+                producto = self._productos.get(producto_id)
+                if producto is None:
+                    faltantes.append(producto_id)
+                else:
+                    productos[producto_id] = producto
+            self.aciertos += len(productos)
+            self.fallos += len(faltantes)
+
+        if faltantes:
+            cursor = mysql.connection.cursor()
+            try:
+                filas = list(self._leer(cursor, faltantes))
+            finally:
+                cursor.close()
+            with self._lock:
+                for fila in filas:
+                    self._poner(fila)
+                    productos[fila[0]] = self._productos[fila[0]]
+        return productos
+
+    def obtener(self, producto_id):
+        """Atributos estáticos de un producto (None si no existe)"""
+        return self.obtener_varios([producto_id]).get(producto_id)
+
+    def por_categoria(self, categoria_id):
+        """Productos de una categoría ordenados por nombre"""
+        self._actualizar()
+        with self._lock:
+            return self._ordenados(self._por_categoria.get(categoria_id, ()))
+
+    def por_proveedor(self, proveedor_id):
+        """Productos de un proveedor ordenados por nombre"""
+        self._actualizar()
+        with self._lock:
+            return self._ordenados(self._por_proveedor.get(proveedor_id, ()))
+
+    def _ordenados(self, ids):
+        productos = [self._productos[producto_id] for producto_id in ids]
+        self.aciertos += len(productos)
+        return sorted(productos, key=lambda producto: (producto.nombre.casefold(), producto.id))
+
+    @staticmethod
+    def stock_de(cursor, producto_ids):
+        """
+        Stock actual de los productos, leído siempre de MySQL
+
+        Returns:
+            dict: {producto_id: stock_actual}
+        """
+        stock = {}
+        producto_ids = list(producto_ids)
+        for inicio in range(0, len(producto_ids), TAMANO_LOTE_CATALOGO):
+            lote = producto_ids[inicio:inicio + TAMANO_LOTE_CATALOGO]
+            cursor.execute(
+                f"SELECT id, stock_actual FROM productos WHERE id IN ({_marcadores(len(lote))})",
+                lote
+            )
+            stock.update((fila[0], fila[1]) for fila in cursor.fetchall())
+        return stock
+
+    @staticmethod
+    def fila(producto, stock_actual):
+        """Fila con las columnas de las rutas de productos (id ... stock_minimo, categoría, proveedor)"""
+        return (
+            producto.id, producto.nombre, producto.descripcion,
+            producto.precio_compra, producto.precio_venta,
+            stock_actual, producto.stock_minimo,
+            dimensiones.nombre_categoria(producto.categoria_id),
+            dimensiones.nombre_proveedor(producto.proveedor_id)
+        )
+
+    def estadisticas(self):
+        """Contadores de uso del catálogo"""
+        return {
+            'productos': len(self._productos) if self._productos is not None else 0,
+            'version': self._version,
+            'aciertos': self.aciertos,
+            'fallos': self.fallos,
+            'recargas_completas': self.recargas_completas,
+            'recargas_parciales': self.recargas_parciales
+        }
+
+catalogo_productos = CatalogoProductos()
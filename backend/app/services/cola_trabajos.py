@@ -0,0 +1,331 @@
+"""
+Cola de Trabajos de Reportes
+Ejecuta reportes pesados fuera de la solicitud HTTP: el cliente recibe un id
+de trabajo, consulta su estado y descarga el resultado cuando termina.
+
+Los trabajos se guardan en un archivo SQLite compartido por todos los workers
+del servidor (cualquiera puede responder el estado de un trabajo) y los ejecutan
+hilos dentro de cada proceso. Cambiar el archivo por una cola externa solo
+requiere reemplazar esta clase.
+
+Mientras un trabajo corre, su hilo renueva actualizado_en cada
+intervalo_latido segundos. Un trabajo 'en_curso' sin latido por más de
+vencimiento_segundos quedó huérfano (el worker se reinició o murió) y se
+marca como fallido, para que no bloquee los envíos iguales para siempre.
+
+Los trabajos registrados con con_avance=True reciben además un argumento
+avance(fraccion) para informar qué parte del trabajo (0 a 1) ya hicieron;
+el estado lo devuelve como progreso (0 a 100).
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+
+from app.metricas import metricas, BUCKETS_REPORTE
+
+CREAR_TABLA_TRABAJOS = """
+CREATE TABLE IF NOT EXISTS trabajos (
+    id TEXT PRIMARY KEY,
+    tipo TEXT NOT NULL,
+    parametros TEXT NOT NULL,
+    clave TEXT NOT NULL,
+    estado TEXT NOT NULL,
+    progreso INTEGER NOT NULL DEFAULT 0,
+    resultado TEXT,
+    error TEXT,
+    creado_en REAL NOT NULL,
+    actualizado_en REAL NOT NULL
+)
+"""
+
+CREAR_INDICE_CLAVE = "CREATE INDEX IF NOT EXISTS idx_trabajos_clave ON trabajos (clave, estado)"
+CREAR_INDICE_ESTADO = "CREATE INDEX IF NOT EXISTS idx_trabajos_estado ON trabajos (estado, creado_en)"
+
+ESTADOS_ACTIVOS = ('pendiente', 'en_curso')
+
+class ErrorTrabajo(Exception):
+    """Tipo de trabajo o parámetros inválidos"""
+
+class ColaTrabajos:
+
+    def __init__(self, ruta_db=None, hilos=1, retencion_segundos=86400, intervalo_sondeo=2,
+                 intervalo_latido=30, vencimiento_segundos=300):
+        self.ruta_db = ruta_db
+        self.hilos = hilos
+        self.retencion_segundos = retencion_segundos
+        self.intervalo_sondeo = intervalo_sondeo
+        self.intervalo_latido = intervalo_latido
+        self.vencimiento_segundos = vencimiento_segundos
+        self.app = None
+        self._tipos = {}  # tipo -> (funcion, parametros_permitidos, con_avance)
+        self._despertar = threading.Event()
+        self._lock = threading.Lock()
+        self._hilos_activos = []
+        self._pid = None
+
+    def init_app(self, app):
+        """
+        Lee REPORTES_TRABAJOS_DB, REPORTES_TRABAJOS_HILOS, REPORTES_TRABAJOS_RETENCION,
+        REPORTES_TRABAJOS_LATIDO y REPORTES_TRABAJOS_VENCIMIENTO
+        """
+        self.app = app
+        self.ruta_db = app.config.get(
+            'REPORTES_TRABAJOS_DB',
+            self.ruta_db or os.path.join(app.instance_path, 'trabajos_reportes.sqlite3')
+        )
+        self.hilos = app.config.get('REPORTES_TRABAJOS_HILOS', self.hilos)
+        self.retencion_segundos = app.config.get('REPORTES_TRABAJOS_RETENCION', self.retencion_segundos)
+        self.intervalo_latido = app.config.get('REPORTES_TRABAJOS_LATIDO', self.intervalo_latido)
+        self.vencimiento_segundos = app.config.get('REPORTES_TRABAJOS_VENCIMIENTO', self.vencimiento_segundos)
+
+    def registrar(self, tipo, funcion, parametros_permitidos=(), con_avance=False):
+        """
+        Registra un tipo de trabajo
+
+        Args:
+            tipo: Nombre del trabajo (por ejemplo 'prediccion-demanda')
+            funcion: Función que recibe los parámetros como argumentos con nombre
+                     y devuelve un resultado serializable a JSON
+            parametros_permitidos: Nombres de parámetros aceptados
+            con_avance: Pasar a la función avance(fraccion) para informar el progreso
+        """
+        self._tipos[tipo] = (funcion, set(parametros_permitidos), con_avance)
+
+    def tipos(self):
+        return sorted(self._tipos)
+
+    def _conectar(self):
+        conexion = sqlite3.connect(self.ruta_db, timeout=10, isolation_level=None)
+        conexion.row_factory = sqlite3.Row
+        return conexion
+
+    def _asegurar_esquema(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.ruta_db)), exist_ok=True)
+        conexion = self._conectar()
+        try:
+            conexion.execute('PRAGMA journal_mode=WAL')
+            conexion.execute(CREAR_TABLA_TRABAJOS)
+            conexion.execute(CREAR_INDICE_CLAVE)
+            conexion.execute(CREAR_INDICE_ESTADO)
+        finally:
+            conexion.close()
+
+    def _iniciar_hilos(self):
+        """Arranca los hilos de este proceso la primera vez que se usa la cola"""
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._asegurar_esquema()
+            self._hilos_activos = [
+                threading.Thread(target=self._ciclo, name=f'cola-trabajos-{i}', daemon=True)
+                for i in range(self.hilos)
+            ]
+            for hilo in self._hilos_activos:
+                hilo.start()
+            self._pid = os.getpid()
+
+    def _vencer_huerfanos(self, conexion, ahora):
+        """Marca como fallidos los trabajos en curso sin latido reciente (dentro de la transacción)"""
+        conexion.execute(
+            """
+            UPDATE trabajos SET estado = 'fallido', error = ?, actualizado_en = ?
+            WHERE estado = 'en_curso' AND actualizado_en < ?
+            """,
+            ('El worker que ejecutaba el trabajo se detuvo', ahora, ahora - self.vencimiento_segundos)
+        )
+
+    @staticmethod
+    def _clave(tipo, parametros):
+        texto = json.dumps([tipo, parametros], sort_keys=True)
+        return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+
+    def enviar(self, tipo, parametros=None):
+        """
+        Encola un trabajo, o devuelve el que ya está pendiente o en curso con los
+        mismos parámetros
+
+        Returns:
+            tuple: (trabajo, es_nuevo)
+
+        Raises:
+            ErrorTrabajo: Si el tipo no existe o hay parámetros no permitidos
+        """
+        parametros = parametros or {}
+        if tipo not in self._tipos:
+            raise ErrorTrabajo(f'Tipo de trabajo desconocido: {tipo}')
+        no_permitidos = set(parametros) - self._tipos[tipo][1]
+        if no_permitidos:
+            raise ErrorTrabajo(f'Parámetros no permitidos: {", ".join(sorted(no_permitidos))}')
+
+        self._iniciar_hilos()
+        clave = self._clave(tipo, parametros)
+        ahora = time.time()
+
+        conexion = self._conectar()
+        try:
+            conexion.execute('BEGIN IMMEDIATE')
+            self._vencer_huerfanos(conexion, ahora)
+            existente = conexion.execute(
+                f"SELECT * FROM trabajos WHERE clave = ? AND estado IN ({', '.join('?' * len(ESTADOS_ACTIVOS))}) LIMIT 1",
+                (clave, *ESTADOS_ACTIVOS)
+            ).fetchone()
+            if existente:
+                conexion.execute('COMMIT')
+                return self._a_dict(existente), False
+
+            trabajo_id = uuid.uuid4().hex
+            conexion.execute(
+                """
+                INSERT INTO trabajos (id, tipo, parametros, clave, estado, creado_en, actualizado_en)
+                VALUES (?, ?, ?, ?, 'pendiente', ?, ?)
+                """,
+                (trabajo_id, tipo, json.dumps(parametros), clave, ahora, ahora)
+            )
+            conexion.execute('COMMIT')
+        finally:
+            conexion.close()
+
+        self._despertar.set()
+        return self.obtener(trabajo_id), True
+
+    def obtener(self, trabajo_id, incluir_resultado=False):
+        """Estado de un trabajo (None si no existe)"""
+        self._iniciar_hilos()
+        conexion = self._conectar()
+        try:
+            fila = conexion.execute("SELECT * FROM trabajos WHERE id = ?", (trabajo_id,)).fetchone()
+        finally:
+            conexion.close()
+        return self._a_dict(fila, incluir_resultado) if fila else None
+
+    @staticmethod
+    def _a_dict(fila, incluir_resultado=False):
+        trabajo = {
+            'id': fila['id'],
+            'tipo': fila['tipo'],
+            'parametros': json.loads(fila['parametros']),
+            'estado': fila['estado'],
+            'progreso': fila['progreso'],
+            'error': fila['error'],
+            'creado_en': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(fila['creado_en'])),
+            'actualizado_en': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(fila['actualizado_en']))
+        }
+        if incluir_resultado:
+            trabajo['resultado'] = fila['resultado']
+        return trabajo
+
+    def _actualizar(self, trabajo_id, **campos):
+        campos['actualizado_en'] = time.time()
+        asignaciones = ', '.join(f'{campo} = ?' for campo in campos)
+        conexion = self._conectar()
+        try:
+            conexion.execute(
+                f"UPDATE trabajos SET {asignaciones} WHERE id = ?",
+                (*campos.values(), trabajo_id)
+            )
+        finally:
+            conexion.close()
+
+    def _tomar_siguiente(self):
+        """Marca como en curso el trabajo pendiente más antiguo (atómico entre procesos)"""
+        ahora = time.time()
+        conexion = self._conectar()
+        try:
+            conexion.execute('BEGIN IMMEDIATE')
+            self._vencer_huerfanos(conexion, ahora)
+            fila = conexion.execute(
+                "SELECT * FROM trabajos WHERE estado = 'pendiente' ORDER BY creado_en LIMIT 1"
+            ).fetchone()
+            if fila:
+                conexion.execute(
+                    "UPDATE trabajos SET estado = 'en_curso', actualizado_en = ? WHERE id = ?",
+                    (ahora, fila['id'])
+                )
+            conexion.execute(
+                "DELETE FROM trabajos WHERE estado NOT IN ('pendiente', 'en_curso') AND actualizado_en < ?",
+                (ahora - self.retencion_segundos,)
+            )
+            conexion.execute('COMMIT')
+            return fila
+        finally:
+            conexion.close()
+
+    def _ciclo(self):
+        while True:
+            try:
+                fila = self._tomar_siguiente()
+            except sqlite3.Error:
+                fila = None
+            if fila is None:
+                self._despertar.wait(self.intervalo_sondeo)
+                self._despertar.clear()
+                continue
+            self._ejecutar(fila)
+
+    def _latir(self, trabajo_id, terminado):
+        """Renueva actualizado_en del trabajo hasta que termine"""
+        while not terminado.wait(self.intervalo_latido):
+            try:
+                self._actualizar(trabajo_id)
+            except sqlite3.Error:
+                pass
+
+    def _avance(self, trabajo_id):
+        """Callback avance(fraccion) de un trabajo: guarda el progreso solo cuando cambia"""
+        ultimo = [0]
+
+        def avance(fraccion):
+            progreso = int(max(0.0, min(1.0, fraccion)) * 100)
+            if progreso == ultimo[0]:
+                return
+            ultimo[0] = progreso
+            try:
+                self._actualizar(trabajo_id, progreso=progreso)
+            except sqlite3.Error:
+                pass
+
+        return avance
+
+    def _ejecutar(self, fila):
+        funcion, _, con_avance = self._tipos.get(fila['tipo'], (None, None, False))
+        if funcion is None:
+            self._actualizar(fila['id'], estado='fallido', error=f"Tipo de trabajo desconocido: {fila['tipo']}")
+            return
+
+        terminado = threading.Event()
+        threading.Thread(
+            target=self._latir, args=(fila['id'], terminado),
+            name=f"cola-trabajos-latido-{fila['id'][:8]}", daemon=True
+        ).start()
+
+        inicio = time.perf_counter()
+        try:
+            # Cada trabajo usa su propio contexto (y su conexión del pool MySQL)
+            with self.app.app_context():
+                parametros = json.loads(fila['parametros'])
+                if con_avance:
+                    parametros['avance'] = self._avance(fila['id'])
+                resultado = funcion(**parametros)
+                texto = self.app.json.dumps(resultado)
+        except Exception as e:
+            self.app.logger.error('Trabajo %s (%s) falló:\n%s', fila['id'], fila['tipo'], traceback.format_exc())
+            self._actualizar(fila['id'], estado='fallido', error=str(e))
+            return
+        finally:
+            terminado.set()
+            metricas.observar('erp_trabajo_duracion_segundos', (('tipo', fila['tipo']),),
+                              time.perf_counter() - inicio, BUCKETS_REPORTE)
+
+        # Los reportes informan sus errores con success=False en lugar de excepciones
+        if isinstance(resultado, dict) and resultado.get('success') is False:
+            self._actualizar(fila['id'], estado='fallido', error=resultado.get('message'), resultado=texto)
+        else:
+            self._actualizar(fila['id'], estado='completado', progreso=100, resultado=texto)
+
+cola_trabajos = ColaTrabajos()
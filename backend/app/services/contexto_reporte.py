@@ -0,0 +1,132 @@
+"""
+Contexto compartido de Reportes
+Carga una sola vez la foto de productos activos y sus ventas de los últimos 90 días,
+para que varios reportes se calculen en memoria sobre los mismos datos
+"""
+
+from app.database import mysql
+from app.services.dimensiones import dimensiones
+from datetime import date, timedelta
+
+# Cantidad máxima de ids por consulta IN (...) al traer ventas en lote
+TAMANO_LOTE_PRODUCTOS = 1000
+
+def filas_como_dict(cursor):
+    """Filas del último resultado como dict, sin importar la clase de cursor"""
+    columnas = [columna[0] for columna in cursor.description]
+    return [
+        fila if isinstance(fila, dict) else dict(zip(columnas, fila))
+        for fila in cursor.fetchall()
+    ]
+
+class ContextoReporte:
+
+    # Ventana más larga que usa cualquier reporte (rotación y predicción)
+    DIAS_VENTANA = 90
+
+    def __init__(self, productos, ventas_por_producto, fecha_corte=None):
+        """
+        Args:
+            productos: Lista de dict de productos activos (ver cargar)
+            ventas_por_producto: {producto_id: [{'fecha': '2024-01-01', 'cantidad': 5}, ...]}
+                                 ordenado por fecha
+            fecha_corte: Día de referencia de las ventanas (hoy por defecto)
+        """
+        self.productos = productos
+        self.ventas_por_producto = ventas_por_producto
+        self.fecha_corte = fecha_corte or date.today()
+
+    @classmethod
+    def cargar(cls, producto_ids=None):
+        """
+        Carga productos activos y ventas de los últimos DIAS_VENTANA días
+        con una consulta de productos y las consultas de ventas en lote
+
+        Args:
+            producto_ids: Limitar el contexto a estos productos (opcional)
+        """
+        cursor = mysql.connection.cursor()
+
+        try:
+            query = """
+            SELECT
+                p.id, p.nombre, p.stock_actual, p.stock_minimo,
+                p.precio_compra, p.precio_venta,
+                p.categoria_id, p.proveedor_id
+            FROM productos p
+            WHERE p.activo = 1
+            """
+
+            cursor.execute(query)
+            productos = filas_como_dict(cursor)
+            if producto_ids is not None:
+                seleccionados = set(producto_ids)
+                productos = [producto for producto in productos if producto['id'] in seleccionados]
+
+            # Nombres de categoría y proveedor desde la caché de dimensiones
+            for producto in productos:
+                producto['categoria_nombre'] = dimensiones.nombre_categoria(producto.pop('categoria_id'))
+                producto['proveedor_nombre'] = dimensiones.nombre_proveedor(producto.pop('proveedor_id'))
+
+            ventas_por_producto = cls._obtener_ventas_por_producto(
+                cursor, [producto['id'] for producto in productos], cls.DIAS_VENTANA
+            )
+        finally:
+            cursor.close()
+
+        return cls(productos, ventas_por_producto)
+
+    @staticmethod
+    def _obtener_ventas_por_producto(cursor, producto_ids, dias):
+        """
+        Obtiene el historial de ventas diarias de muchos productos a la vez,
+        en lotes de TAMANO_LOTE_PRODUCTOS ids, en lugar de una consulta por producto.
+        Lee del resumen ventas_diarias_producto (ver VentasDiariasService)
+
+        Args:
+            cursor: Cursor abierto sobre la conexión actual
+            producto_ids: Lista de ids de productos
+            dias: Días hacia atrás a considerar
+
+        Returns:
+            dict: {producto_id: [{'fecha': '2024-01-01', 'cantidad': 5}, ...]}
+        """
+        ventas_por_producto = {}
+
+        for inicio in range(0, len(producto_ids), TAMANO_LOTE_PRODUCTOS):
+            lote = producto_ids[inicio:inicio + TAMANO_LOTE_PRODUCTOS]
+            marcadores = ', '.join(['%s'] * len(lote))
+
+            ventas_query = f"""
+            SELECT producto_id, fecha, cantidad
+            FROM ventas_diarias_producto
+            WHERE producto_id IN ({marcadores})
+                AND fecha >= DATE_SUB(CURDATE(), INTERVAL %s DAY)
+            ORDER BY producto_id, fecha
+            """
+
+            cursor.execute(ventas_query, (*lote, dias))
+
+            # Agrupar en memoria por producto
+            for venta in filas_como_dict(cursor):
+                ventas_por_producto.setdefault(venta['producto_id'], []).append({
+                    'fecha': venta['fecha'].strftime('%Y-%m-%d'),
+                    'cantidad': int(venta['cantidad'])
+                })
+
+        return ventas_por_producto
+
+    def ventas(self, producto_id, dias):
+        """
+        Ventas diarias de un producto dentro de los últimos `dias` días
+
+        Returns:
+            list: [{'fecha': '2024-01-01', 'cantidad': 5}, ...] (vacía si no hubo ventas)
+        """
+        ventas = self.ventas_por_producto.get(producto_id, [])
+        if dias >= self.DIAS_VENTANA:
+            return ventas
+
+        # Las fechas 'YYYY-MM-DD' se comparan bien como texto
+        limite = (self.fecha_corte - timedelta(days=dias)).strftime('%Y-%m-%d')
+        return [venta for venta in ventas if venta['fecha'] >= limite]
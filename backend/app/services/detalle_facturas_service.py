@@ -0,0 +1,187 @@
+"""
+Servicio de Detalle de Facturas por Lote
+Devuelve varias facturas completas (encabezado con datos del cliente y sus
+líneas) con dos consultas por tramo, una de encabezados y otra de líneas,
+que se unen en memoria por factura_id. Reemplaza una llamada a
+GET /facturas/<id> por factura al imprimir o exportar un lote.
+"""
+
+from datetime import timedelta
+
+from flask import Response, current_app, stream_with_context
+
+from app.database import mysql
+
+# Facturas consultadas por tramo (encabezados + líneas)
+TAMANO_TRAMO_DETALLE = 500
+
+# Máximo de facturas en una respuesta JSON; lotes mayores deben pedirse en NDJSON
+MAX_FACTURAS_DETALLE = 2000
+
+QUERY_ENCABEZADOS = """
+    SELECT
+        f.id,
+        f.cliente_id,
+        c.nombre as nombre_cliente,
+        c.email as email_cliente,
+        c.telefono as telefono_cliente,
+        f.fecha,
+        f.total
+    FROM facturas f
+    JOIN clientes c ON f.cliente_id = c.id
+"""
+
+QUERY_DETALLES = """
+    SELECT
+        df.factura_id,
+        df.id,
+        df.producto_id,
+        p.nombre as nombre_producto,
+        df.cantidad,
+        df.precio_unitario
+    FROM detalle_factura df
+    JOIN productos p ON df.producto_id = p.id
+    WHERE df.factura_id IN ({marcadores})
+    ORDER BY df.factura_id, df.id
+"""
+
+def _marcadores(cantidad):
+    return ', '.join(['%s'] * cantidad)
+
+class ErrorLoteDemasiadoGrande(ValueError):
+    """El lote supera MAX_FACTURAS_DETALLE para una respuesta JSON"""
+
+class DetalleFacturasService:
+
+    @staticmethod
+    def _armar(encabezados, cursor):
+        """
+        Trae las líneas de los encabezados dados y arma cada factura
+        con la misma forma que GET /facturas/<id>
+        """
+        if not encabezados:
+            return []
+
+        ids = [encabezado[0] for encabezado in encabezados]
+        cursor.execute(QUERY_DETALLES.format(marcadores=_marcadores(len(ids))), ids)
+        detalles_por_factura = {}
+        for fila in cursor.fetchall():
+            detalles_por_factura.setdefault(fila[0], []).append(fila[1:])
+
+        facturas = []
+        for encabezado in encabezados:
+            detalles = detalles_por_factura.get(encabezado[0], [])
+            facturas.append({
+                'factura': encabezado,
+                'detalles': detalles,
+                'resumen': {
+                    'total_productos': sum(detalle[3] for detalle in detalles),
+                    'total_lineas': len(detalles),
+                    'total_factura': encabezado[6]
+                }
+            })
+        return facturas
+
+    @staticmethod
+    def _tramos_por_ids(factura_ids):
+        """Genera tramos de facturas en el orden de los ids pedidos (sin los que no existen)"""
+        cursor = mysql.connection.cursor()
+        try:
+            for inicio in range(0, len(factura_ids), TAMANO_TRAMO_DETALLE):
+                tramo = factura_ids[inicio:inicio + TAMANO_TRAMO_DETALLE]
+                cursor.execute(
+                    QUERY_ENCABEZADOS + f" WHERE f.id IN ({_marcadores(len(tramo))})",
+                    tramo
+                )
+                por_id = {fila[0]: fila for fila in cursor.fetchall()}
+                encabezados = [por_id[factura_id] for factura_id in tramo if factura_id in por_id]
+                yield DetalleFacturasService._armar(encabezados, cursor)
+        finally:
+            cursor.close()
+
+    @staticmethod
+    def _tramos_por_fechas(desde, hasta, cliente_id=None):
+        """Genera tramos de facturas del rango (ambos días inclusive) por orden de (fecha, id)"""
+        condiciones = ["f.fecha >= %s", "f.fecha < %s"]
+        valores = [desde, hasta + timedelta(days=1)]
+        if cliente_id is not None:
+            condiciones.append("f.cliente_id = %s")
+            valores.append(cliente_id)
+
+        cursor = mysql.connection.cursor()
+        try:
+            posicion = None
+            while True:
+                condiciones_tramo = list(condiciones)
+                valores_tramo = list(valores)
+                if posicion is not None:
+                    # Keyset: seguir después de la última factura del tramo anterior
+                    condiciones_tramo.append("(f.fecha > %s OR (f.fecha = %s AND f.id > %s))")
+                    valores_tramo.extend([posicion[0], posicion[0], posicion[1]])
+                cursor.execute(
+                    QUERY_ENCABEZADOS
+                    + " WHERE " + " AND ".join(condiciones_tramo)
+                    + " ORDER BY f.fecha, f.id LIMIT %s",
+                    valores_tramo + [TAMANO_TRAMO_DETALLE]
+                )
+                encabezados = list(cursor.fetchall())
+                if not encabezados:
+                    break
+                yield DetalleFacturasService._armar(encabezados, cursor)
+                if len(encabezados) < TAMANO_TRAMO_DETALLE:
+                    break
+                posicion = (encabezados[-1][5], encabezados[-1][0])
+        finally:
+            cursor.close()
+
+    @staticmethod
+    def _tramos(factura_ids=None, desde=None, hasta=None, cliente_id=None):
+        if factura_ids is not None:
+            return DetalleFacturasService._tramos_por_ids(factura_ids)
+        return DetalleFacturasService._tramos_por_fechas(desde, hasta, cliente_id)
+
+    @staticmethod
+    def obtener(factura_ids=None, desde=None, hasta=None, cliente_id=None):
+        """
+        Facturas completas por lista de ids o por rango de fechas
+
+        Args:
+            factura_ids: Lista de ids (se respeta su orden); excluye el rango
+            desde, hasta: Fechas del rango, ambas inclusive
+            cliente_id: Filtro opcional del rango por cliente
+
+        Returns:
+            list: [{'factura', 'detalles', 'resumen'}, ...]
+
+        Raises:
+            ErrorLoteDemasiadoGrande: Si hay más de MAX_FACTURAS_DETALLE facturas
+        """
+        facturas = []
+        for tramo in DetalleFacturasService._tramos(factura_ids, desde, hasta, cliente_id):
+            facturas.extend(tramo)
+            if len(facturas) > MAX_FACTURAS_DETALLE:
+                raise ErrorLoteDemasiadoGrande(
+                    f'El lote supera {MAX_FACTURAS_DETALLE} facturas. Use format=ndjson'
+                )
+        return facturas
+
+    @staticmethod
+    def exportar_ndjson(factura_ids=None, desde=None, hasta=None, cliente_id=None):
+        """
+        Respuesta en streaming con una factura completa por línea, consultando
+        un tramo a la vez para que la memoria no crezca con el tamaño del lote
+
+        Returns:
+            flask.Response
+        """
+        def generar():
+            for tramo in DetalleFacturasService._tramos(factura_ids, desde, hasta, cliente_id):
+                yield ''.join(current_app.json.dumps(factura) + '\n' for factura in tramo)
+
+        return Response(
+            stream_with_context(generar()),
+            mimetype='application/x-ndjson',
+            headers={
+                'Content-Disposition': 'attachment; filename=facturas_detalle.ndjson'
+            }
+        )
@@ -0,0 +1,158 @@
+"""
+Caché de Dimensiones
+Guarda por proceso el nombre de cada categoría, proveedor y rol para que las
+consultas de productos, reportes e inicio de sesión no hagan LEFT JOIN solo
+para traerlo.
+
+Cada tabla tiene un número de versión en dimensiones_version que las rutas
+de categorías y proveedores incrementan dentro de su transacción; cada
+proceso compara las versiones cada pocos segundos y recarga la tabla
+completa (son pocas filas) cuando cambió. Los roles no tienen rutas de
+escritura: un rol nuevo se carga la primera vez que se pide su id.
+
+Los reportes en caché llevan nombres de categoría y proveedor, así que un
+cambio de dimensión también invalida la caché de reportes: en el proceso que
+escribió al confirmar, y en los demás al detectar la versión nueva. La
+tabla dimensiones_version la crea `flask migrar` (migración 4).
+"""
+
+import threading
+import time
+
+import MySQLdb
+
+from app.database import mysql
+from app.services.cache_reportes import cache_reportes
+
+CREAR_TABLA_VERSIONES_DIMENSIONES = """
+CREATE TABLE IF NOT EXISTS dimensiones_version (
+    tabla VARCHAR(50) NOT NULL PRIMARY KEY,
+    version BIGINT UNSIGNED NOT NULL
+)
+"""
+
+TABLAS_DIMENSION = ('categorias', 'proveedores', 'roles')
+
+ERROR_TABLA_INEXISTENTE = 1146
+
+# Segundos mínimos entre recargas provocadas por ids desconocidos
+ESPERA_RECARGA_POR_FALLO = 1
+
+class CacheDimensiones:
+
+    def __init__(self, intervalo_verificacion=2):
+        self.intervalo_verificacion = intervalo_verificacion
+        self._nombres = {}      # tabla -> {id: nombre}; se reemplaza entero al recargar
+        self._versiones = {}    # tabla -> versión cargada
+        self._proxima_verificacion = 0.0
+        self._ultima_recarga_por_fallo = 0.0
+        self._lock = threading.Lock()
+        self.recargas = 0
+
+    def init_app(self, app):
+        """Lee DIMENSIONES_INTERVALO_VERIFICACION de la configuración"""
+        self.intervalo_verificacion = app.config.get('DIMENSIONES_INTERVALO_VERIFICACION', self.intervalo_verificacion)
+
+    def registrar_cambio(self, cursor, tabla):
+        """
+        Incrementa la versión de una tabla de dimensión.
+        Llamar dentro de la transacción de la escritura, antes del commit
+        """
+        try:
+            cursor.execute(
+                "INSERT INTO dimensiones_version (tabla, version) VALUES (%s, 1) "
+                "ON DUPLICATE KEY UPDATE version = version + 1",
+                (tabla,)
+            )
+        except MySQLdb.ProgrammingError as e:
+            # Sin la tabla, los procesos recargan en cada verificación (ver _actualizar)
+            if e.args[0] != ERROR_TABLA_INEXISTENTE:
+                raise
+
+    def invalidar(self):
+        """
+        Fuerza a verificar versiones en la próxima lectura y descarta los
+        reportes en caché (llamar después del commit)
+        """
+        self._proxima_verificacion = 0.0
+        cache_reportes.invalidar()
+
+    def _actualizar(self, forzar=False):
+        """Recarga las tablas cuya versión cambió desde la última verificación"""
+        if not forzar and time.monotonic() < self._proxima_verificacion:
+            return
+
+        with self._lock:
+            if not forzar and time.monotonic() < self._proxima_verificacion:
+                return
+
+            cursor = mysql.connection.cursor()
+            cambio_de_version = False
+            try:
+                try:
+                    cursor.execute("SELECT tabla, version FROM dimensiones_version")
+                    versiones = {fila[0]: fila[1] for fila in cursor.fetchall()}
+                except MySQLdb.ProgrammingError as e:
+                    # Sin `flask migrar` no hay versiones: se recargan las
+                    # tablas en cada verificación en lugar de fallar
+                    if e.args[0] != ERROR_TABLA_INEXISTENTE:
+                        raise
+                    versiones = None
+                for tabla in TABLAS_DIMENSION:
+                    version = versiones.get(tabla, 0) if versiones is not None else None
+                    if (forzar or versiones is None or tabla not in self._nombres
+                            or self._versiones.get(tabla) != version):
+                        if tabla in self._versiones and self._versiones[tabla] != version:
+                            cambio_de_version = True
+                        cursor.execute(f"SELECT id, nombre FROM {tabla}")
+                        self._nombres[tabla] = {fila[0]: fila[1] for fila in cursor.fetchall()}
+                        self._versiones[tabla] = version
+                        self.recargas += 1
+            finally:
+                cursor.close()
+
+            if cambio_de_version:
+                # Cambio hecho en otro proceso: sus reportes en caché tienen nombres viejos
+                cache_reportes.invalidar()
+
+            self._proxima_verificacion = time.monotonic() + self.intervalo_verificacion
+
+    def _nombre(self, tabla, dimension_id):
+        if dimension_id is None:
+            return None
+        self._actualizar()
+        nombres = self._nombres[tabla]
+        if dimension_id not in nombres:
+            # Puede haberse creado en otro proceso después de la última verificación
+            ahora = time.monotonic()
+            if ahora - self._ultima_recarga_por_fallo >= ESPERA_RECARGA_POR_FALLO:
+                self._ultima_recarga_por_fallo = ahora
+                self._actualizar(forzar=True)
+                nombres = self._nombres[tabla]
+        return nombres.get(dimension_id)
+
+    def nombre_categoria(self, categoria_id):
+        """Nombre de la categoría (None si no existe)"""
+        return self._nombre('categorias', categoria_id)
+
+    def nombre_proveedor(self, proveedor_id):
+        """Nombre del proveedor (None si no existe)"""
+        return self._nombre('proveedores', proveedor_id)
+
+    def nombre_rol(self, rol_id):
+        """Nombre del rol (None si no existe)"""
+        return self._nombre('roles', rol_id)
+
+    def estadisticas(self):
+        """Filas y versión cargadas de cada tabla"""
+        estadisticas = {
+            tabla: {
+                'filas': len(self._nombres.get(tabla, {})),
+                'version': self._versiones.get(tabla)
+            }
+            for tabla in TABLAS_DIMENSION
+        }
+        estadisticas['recargas'] = self.recargas
+        return estadisticas
+
+dimensiones = CacheDimensiones()
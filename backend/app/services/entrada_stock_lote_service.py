@@ -0,0 +1,175 @@
+"""
+Servicio de Importación de Entradas de Stock
+Registra muchas entradas de stock (por ejemplo, la llegada de un contenedor)
+desde CSV, JSON o NDJSON, validando contra los ids precargados de productos
+y proveedores y confirmando por tramos
+"""
+
+import csv
+import json
+from datetime import datetime
+
+from app.database import mysql
+
+# Entradas confirmadas por transacción
+TAMANO_TRAMO_ENTRADAS = 500
+
+CAMPOS_REQUERIDOS_ENTRADA = ['producto_id', 'proveedor_id', 'cantidad', 'precio_compra']
+
+def leer_filas_csv(archivo):
+    """Genera un dict por fila de un archivo CSV de texto (con encabezado)"""
+    for fila in csv.DictReader(archivo):
+        yield fila
+
+def leer_filas_ndjson(archivo):
+    """Genera un dict por línea de un archivo NDJSON (None si la línea es inválida)"""
+    for linea in archivo:
+        if not linea.strip():
+            continue
+        try:
+            yield json.loads(linea)
+        except ValueError:
+            yield None
+
+def leer_filas_json(archivo):
+    """Genera las entradas de un arreglo JSON o de {"entradas": [...]}"""
+    data = json.load(archivo)
+    if isinstance(data, dict):
+        data = data.get('entradas', [])
+    for fila in data:
+        yield fila
+
+LECTORES_ENTRADAS = {
+    'csv': leer_filas_csv,
+    'ndjson': leer_filas_ndjson,
+    'json': leer_filas_json
+}
+
+class EntradaStockLoteService:
+
+    @staticmethod
+    def _validar_fila(fila, productos_existentes, proveedores_existentes):
+        """
+        Valida una entrada con las mismas reglas que POST /entradas-stock
+
+        Returns:
+            tuple: (valores_insert, None) o (None, mensaje_error)
+        """
+        if not isinstance(fila, dict):
+            return None, 'Fila con formato inválido'
+
+        for campo in CAMPOS_REQUERIDOS_ENTRADA:
+            if fila.get(campo) in (None, ''):
+                return None, f'El campo {campo} es requerido'
+
+        try:
+            producto_id = int(fila['producto_id'])
+            proveedor_id = int(fila['proveedor_id'])
+            cantidad = int(fila['cantidad'])
+            precio_compra = float(fila['precio_compra'])
+            precio_venta = float(fila.get('precio_venta') or 0)
+            usuario_id = int(fila.get('usuario_id') or 1)
+        except (ValueError, TypeError):
+            return None, 'Tipos de datos inválidos'
+
+        if cantidad <= 0:
+            return None, 'La cantidad debe ser mayor a 0'
+        if precio_compra < 0:
+            return None, 'El precio de compra no puede ser negativo'
+        if producto_id not in productos_existentes:
+            return None, f'Producto {producto_id} no encontrado'
+        if proveedor_id not in proveedores_existentes:
+            return None, f'Proveedor {proveedor_id} no encontrado'
+
+        return (producto_id, proveedor_id, usuario_id, cantidad, precio_compra, precio_venta), None
+
+    @staticmethod
+    def importar(filas, tamano_tramo=TAMANO_TRAMO_ENTRADAS):
+        """
+        Importa entradas de stock desde un iterable de dict (se consume en streaming)
+
+        Args:
+            filas: Iterable de dict con producto_id, proveedor_id, cantidad,
+                   precio_compra y opcionalmente precio_venta y usuario_id
+            tamano_tramo: Entradas por transacción
+
+        Returns:
+            dict: {'importadas', 'con_error', 'productos_actualizados', 'errores': [{'fila', 'message'}]}
+        """
+        cursor = mysql.connection.cursor()
+
+        try:
+            # Ids válidos precargados una sola vez
+            cursor.execute("SELECT id FROM productos")
+            productos_existentes = {fila[0] for fila in cursor.fetchall()}
+            cursor.execute("SELECT id FROM proveedores")
+            proveedores_existentes = {fila[0] for fila in cursor.fetchall()}
+
+            resumen = {'importadas': 0, 'con_error': 0, 'productos_actualizados': 0, 'errores': []}
+            productos_actualizados = set()
+            tramo = []  # (numero_fila, valores)
+
+            def confirmar_tramo():
+                try:
+                    EntradaStockLoteService._insertar_tramo(cursor, [valores for _, valores in tramo])
+                    mysql.connection.commit()
+                except Exception as e:
+                    mysql.connection.rollback()
+                    resumen['con_error'] += len(tramo)
+                    resumen['errores'].extend(
+                        {'fila': numero, 'message': f'Error al registrar el tramo: {str(e)}'}
+                        for numero, _ in tramo
+                    )
+                    return
+                resumen['importadas'] += len(tramo)
+                productos_actualizados.update(valores[0] for _, valores in tramo)
+
+            for numero, fila in enumerate(filas, start=1):
+                valores, error = EntradaStockLoteService._validar_fila(
+                    fila, productos_existentes, proveedores_existentes
+                )
+                if error:
+                    resumen['con_error'] += 1
+                    resumen['errores'].append({'fila': numero, 'message': error})
+                    continue
+
+                tramo.append((numero, valores))
+                if len(tramo) >= tamano_tramo:
+                    confirmar_tramo()
+                    tramo = []
+
+            if tramo:
+                confirmar_tramo()
+
+            resumen['productos_actualizados'] = len(productos_actualizados)
+            return resumen
+        finally:
+            cursor.close()
+
+    @staticmethod
+    def _insertar_tramo(cursor, entradas):
+        """Inserta las entradas del tramo y suma el stock agregado por producto"""
+        # La fecha va como parámetro: con NOW() dentro de VALUES, executemany
+        # manda una consulta por fila en vez de un solo INSERT
+        fecha = datetime.now().replace(microsecond=0)
+        cursor.executemany(
+            """
+            INSERT INTO entrada_stock
+            (producto_id, proveedor_id, usuario_id, cantidad, precio_compra, precio_venta, fecha)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+            """,
+            [entrada + (fecha,) for entrada in entradas]
+        )
+
+        incrementos = {}
+        for producto_id, _, _, cantidad, _, _ in entradas:
+            incrementos[producto_id] = incrementos.get(producto_id, 0) + cantidad
+
+        casos = ' '.join(['WHEN %s THEN %s'] * len(incrementos))
+        valores_casos = [valor for par in incrementos.items() for valor in par]
+        marcadores = ', '.join(['%s'] * len(incrementos))
+
+        cursor.execute(
+            f"UPDATE productos SET stock_actual = stock_actual + CASE id {casos} END WHERE id IN ({marcadores})",
+            valores_casos + list(incrementos)
+        )
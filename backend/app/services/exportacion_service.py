@@ -0,0 +1,105 @@
+"""
+Servicio de Exportación
+Envía el resultado de una consulta como NDJSON o CSV en streaming,
+leyendo con un cursor del lado del servidor en lotes de tamaño fijo,
+para que la memoria del worker no crezca con el tamaño de la tabla
+"""
+
+import csv
+import io
+import json
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from flask import Response, stream_with_context
+from MySQLdb.cursors import SSCursor
+
+from app.database import mysql
+
+# Filas leídas del servidor (y escritas a la respuesta) por lote
+TAMANO_LOTE_EXPORTACION = 1000
+
+FORMATOS_EXPORTACION = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv'
+}
+
+def _valor_exportable(valor):
+    """Convierte tipos de MySQL (fechas, Decimal) a valores serializables"""
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    if isinstance(valor, timedelta):
+        return str(valor)
+    if isinstance(valor, Decimal):
+        return float(valor)
+    return valor
+
+def _lotes(query, valores):
+    """
+    Lee la consulta en lotes con un cursor sin buffer: genera primero la
+    lista de columnas (aunque no haya filas) y después cada lote de filas
+    """
+    cursor = mysql.connection.cursor(SSCursor)
+    try:
+        cursor.execute(query, valores)
+        yield [col[0] for col in cursor.description]
+        while True:
+            filas = cursor.fetchmany(TAMANO_LOTE_EXPORTACION)
+            if not filas:
+                break
+            yield filas
+    finally:
+        cursor.close()
+
+def _generar_ndjson(query, valores):
+    lotes = _lotes(query, valores)
+    columnas = next(lotes)
+    for filas in lotes:
+        yield ''.join(
+            json.dumps(
+                {col: _valor_exportable(v) for col, v in zip(columnas, fila)},
+                ensure_ascii=False
+            ) + '\n'
+            for fila in filas
+        )
+
+def _generar_csv(query, valores):
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+
+    lotes = _lotes(query, valores)
+    # El encabezado sale aunque la consulta no devuelva filas
+    escritor.writerow(next(lotes))
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate(0)
+
+    for filas in lotes:
+        escritor.writerows([_valor_exportable(v) for v in fila] for fila in filas)
+
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+
+def exportar_consulta(query, valores, formato, nombre_archivo):
+    """
+    Respuesta en streaming con el resultado de la consulta
+
+    Args:
+        query: Consulta SQL (con marcadores %s)
+        valores: Valores de los marcadores
+        formato: 'ndjson' o 'csv'
+        nombre_archivo: Nombre base del archivo descargado (sin extensión)
+
+    Returns:
+        flask.Response
+    """
+    generador = _generar_ndjson if formato == 'ndjson' else _generar_csv
+
+    return Response(
+        stream_with_context(generador(query, valores)),
+        mimetype=FORMATOS_EXPORTACION[formato],
+        headers={
+            'Content-Disposition': f'attachment; filename={nombre_archivo}.{formato}'
+        }
+    )
@@ -0,0 +1,387 @@
+"""
+Servicio de Facturación por Lote
+Registra muchas facturas (por ejemplo, ventas acumuladas por un POS sin conexión)
+con validaciones por conjuntos, transacciones por tramos y claves de idempotencia
+para que reenviar el mismo lote no duplique ventas.
+
+La tabla facturas_idempotencia la crea `flask migrar` (migración 1).
+"""
+
+from datetime import date, datetime
+
+from app.database import mysql
+from app.services.ventas_diarias_service import VentasDiariasService
+
+# Facturas confirmadas por transacción
+TAMANO_TRAMO_FACTURAS = 200
+
+# Máximo de facturas aceptadas en una sola solicitud
+MAX_FACTURAS_POR_LOTE = 10000
+
+CREAR_TABLA_IDEMPOTENCIA = """
+CREATE TABLE IF NOT EXISTS facturas_idempotencia (
+    clave VARCHAR(100) NOT NULL PRIMARY KEY,
+    factura_id INT NOT NULL,
+    fecha_registro DATETIME NOT NULL
+)
+"""
+
+def _marcadores(cantidad):
+    return ', '.join(['%s'] * cantidad)
+
+def _leer_fecha(valor):
+    """Fecha original de la venta ('YYYY-MM-DD HH:MM:SS' o 'YYYY-MM-DD'), o None si es inválida"""
+    if not isinstance(valor, str):
+        return None
+    for formato in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(valor, formato)
+        except ValueError:
+            continue
+    return None
+
+class FacturacionLoteService:
+
+    @staticmethod
+    def _validar_factura(factura):
+        """
+        Valida la forma de una factura (mismas reglas que POST /facturas)
+
+        Returns:
+            tuple: (cliente_id, [(producto_id, cantidad, precio_unitario), ...], fecha, None)
+                   o (None, None, None, mensaje_error); fecha es None si la factura no la trae
+        """
+        if not isinstance(factura, dict):
+            return None, None, None, 'La factura debe ser un objeto JSON'
+
+        if 'cliente_id' not in factura or 'productos' not in factura:
+            return None, None, None, 'Se requieren cliente_id y productos'
+
+        productos = factura['productos']
+        if not productos or not isinstance(productos, list):
+            return None, None, None, 'Debe incluir al menos un producto'
+
+        try:
+            cliente_id = int(factura['cliente_id'])
+        except (ValueError, TypeError):
+            return None, None, None, 'cliente_id inválido'
+
+        fecha = None
+        if factura.get('fecha') is not None:
+            fecha = _leer_fecha(factura['fecha'])
+            if fecha is None:
+                return None, None, None, 'fecha inválida (use YYYY-MM-DD HH:MM:SS)'
+            if fecha.date() > date.today():
+                return None, None, None, 'La fecha no puede ser futura'
+
+        lineas = []
+        for idx, producto in enumerate(productos):
+            if not isinstance(producto, dict):
+                return None, None, None, f'Producto {idx + 1}: formato inválido'
+
+            for campo in ['producto_id', 'cantidad', 'precio_unitario']:
+                if campo not in producto:
+                    return None, None, None, f'Producto {idx + 1}: falta el campo {campo}'
+
+            try:
+                producto_id = int(producto['producto_id'])
+                cantidad = int(producto['cantidad'])
+                precio_unitario = float(producto['precio_unitario'])
+            except (ValueError, TypeError):
+                return None, None, None, f'Producto {idx + 1}: tipos de datos inválidos'
+
+            if cantidad <= 0:
+                return None, None, None, f'Producto {idx + 1}: la cantidad debe ser mayor a 0'
+
+            if precio_unitario <= 0:
+                return None, None, None, f'Producto {idx + 1}: el precio debe ser mayor a 0'
+
+            lineas.append((producto_id, cantidad, precio_unitario))
+
+        return cliente_id, lineas, fecha, None
+
+    @staticmethod
+    def procesar(facturas):
+        """
+        Registra una lista de facturas
+
+        Cada factura tiene la forma que acepta POST /facturas y opcionalmente
+        'clave_idempotencia' y 'fecha' (la de la venta original; sin ella se usa
+        la fecha actual). Si la clave ya fue registrada, se devuelve la
+        factura existente en lugar de crear otra.
+
+        Args:
+            facturas: Lista de dict de facturas
+
+        Returns:
+            list: Un resultado por factura, en el mismo orden:
+                  {'indice', 'success', 'factura_id', 'duplicada', 'message'}
+        """
+        resultados = [{'indice': i, 'success': False} for i in range(len(facturas))]
+        pendientes = []  # (indice, clave, cliente_id, lineas, fecha)
+
+        # 1) Validar forma de cada factura (sin tocar la base de datos)
+        for i, factura in enumerate(facturas):
+            cliente_id, lineas, fecha, error = FacturacionLoteService._validar_factura(factura)
+            if error:
+                resultados[i]['message'] = error
+                continue
+            clave = factura.get('clave_idempotencia')
+            pendientes.append((i, str(clave) if clave is not None else None, cliente_id, lineas, fecha))
+
+        if not pendientes:
+            return resultados
+
+        cursor = mysql.connection.cursor()
+
+        try:
+            # 2) Claves ya registradas en envíos anteriores
+            claves = sorted({clave for _, clave, _, _, _ in pendientes if clave is not None})
+            facturas_por_clave = {}
+            for inicio in range(0, len(claves), 1000):
+                tramo = claves[inicio:inicio + 1000]
+                cursor.execute(
+                    f"SELECT clave, factura_id FROM facturas_idempotencia WHERE clave IN ({_marcadores(len(tramo))})",
+                    tramo
+                )
+                facturas_por_clave.update({fila[0]: fila[1] for fila in cursor.fetchall()})
+
+            # 3) Clientes existentes (una consulta para todo el lote)
+            ids_clientes = sorted({cliente_id for _, _, cliente_id, _, _ in pendientes})
+            clientes_existentes = set()
+            for inicio in range(0, len(ids_clientes), 1000):
+                tramo = ids_clientes[inicio:inicio + 1000]
+                cursor.execute(
+                    f"SELECT id FROM clientes WHERE id IN ({_marcadores(len(tramo))})",
+                    tramo
+                )
+                clientes_existentes.update(fila[0] for fila in cursor.fetchall())
+
+            por_procesar = []
+            claves_en_lote = set()
+            for indice, clave, cliente_id, lineas, fecha in pendientes:
+                if clave is not None and (clave in facturas_por_clave or clave in claves_en_lote):
+                    # Se resuelve al final con el id de la factura original
+                    resultados[indice].update({'clave_idempotencia': clave, 'duplicada': True})
+                    continue
+                if cliente_id not in clientes_existentes:
+                    resultados[indice]['message'] = 'Cliente no encontrado'
+                    continue
+                if clave is not None:
+                    claves_en_lote.add(clave)
+                por_procesar.append((indice, clave, cliente_id, lineas, fecha))
+
+            # 4) Insertar por tramos, una transacción por tramo
+            for inicio in range(0, len(por_procesar), TAMANO_TRAMO_FACTURAS):
+                tramo = por_procesar[inicio:inicio + TAMANO_TRAMO_FACTURAS]
+                try:
+                    creadas = FacturacionLoteService._procesar_tramo(cursor, tramo, resultados)
+                    mysql.connection.commit()
+                except Exception as e:
+                    mysql.connection.rollback()
+                    for indice, clave, _, _, _ in tramo:
+                        resultados[indice].pop('duplicada', None)
+                        resultados[indice].update({
+                            'success': False,
+                            'factura_id': None,
+                            'message': f'Error al registrar factura: {str(e)}'
+                        })
+                        claves_en_lote.discard(clave)
+                    continue
+                facturas_por_clave.update(creadas)
+
+            # Claves que otra solicitud registró mientras se procesaba este lote
+            sin_resolver = sorted({
+                resultado['clave_idempotencia'] for resultado in resultados
+                if resultado.get('duplicada') and resultado['clave_idempotencia'] not in facturas_por_clave
+            })
+            for inicio in range(0, len(sin_resolver), 1000):
+                tramo = sin_resolver[inicio:inicio + 1000]
+                cursor.execute(
+                    f"SELECT clave, factura_id FROM facturas_idempotencia WHERE clave IN ({_marcadores(len(tramo))})",
+                    tramo
+                )
+                facturas_por_clave.update({fila[0]: fila[1] for fila in cursor.fetchall()})
+        finally:
+            cursor.close()
+
+        # 5) Duplicadas: devolver la factura original
+        for resultado in resultados:
+            if resultado.get('duplicada'):
+                factura_id = facturas_por_clave.get(resultado['clave_idempotencia'])
+                resultado.update({
+                    'success': factura_id is not None,
+                    'factura_id': factura_id,
+                    'message': 'Factura ya registrada con esta clave' if factura_id
+                               else 'La factura original con esta clave no pudo registrarse'
+                })
+
+        return resultados
+
+    @staticmethod
+    def _reclamar_claves(cursor, claves, fecha_registro):
+        """
+        Reclama las claves de idempotencia de un tramo dentro de la transacción actual
+
+        Un solo INSERT IGNORE de varias filas deja una fila provisional
+        (factura_id = 0) por clave nueva; si otra solicitud concurrente ya
+        insertó la clave, la fila queda bloqueada hasta que esa transacción
+        termine. Luego un SELECT ... FOR UPDATE lee el estado confirmado:
+        solo las filas que siguen en 0 son de esta transacción.
+
+        Returns:
+            set: Claves reclamadas por esta transacción
+        """
+        if not claves:
+            return set()
+
+        cursor.executemany(
+            "INSERT IGNORE INTO facturas_idempotencia (clave, factura_id, fecha_registro) VALUES (%s, %s, %s)",
+            [(clave, 0, fecha_registro) for clave in claves]
+        )
+        cursor.execute(
+            f"SELECT clave, factura_id FROM facturas_idempotencia WHERE clave IN ({_marcadores(len(claves))}) FOR UPDATE",
+            claves
+        )
+        return {fila[0] for fila in cursor.fetchall() if fila[1] == 0}
+
+    @staticmethod
+    def _procesar_tramo(cursor, tramo, resultados):
+        """
+        Registra un tramo de facturas dentro de la transacción actual
+
+        Las claves de idempotencia del tramo se reclaman juntas antes de crear
+        las facturas (ver _reclamar_claves): las que ya registró otra solicitud
+        se informan como duplicadas en lugar de crearse dos veces, y las de
+        facturas rechazadas por stock se liberan antes de confirmar.
+
+        Returns:
+            dict: {clave_idempotencia: factura_id} de las facturas creadas
+        """
+        # Las fechas viajan como parámetros: con NOW() o COALESCE dentro de
+        # VALUES, executemany manda una consulta por fila en vez de un INSERT
+        ahora = datetime.now().replace(microsecond=0)
+
+        reclamadas = FacturacionLoteService._reclamar_claves(
+            cursor, sorted({clave for _, clave, _, _, _ in tramo if clave is not None}), ahora
+        )
+
+        # Bloquear los productos del tramo en orden de id (ver crear_factura)
+        ids_productos = sorted({
+            producto_id for _, _, _, lineas, _ in tramo for producto_id, _, _ in lineas
+        })
+        cursor.execute(
+            f"SELECT id, nombre, stock_actual FROM productos WHERE id IN ({_marcadores(len(ids_productos))}) ORDER BY id FOR UPDATE",
+            ids_productos
+        )
+        stock_disponible = {fila[0]: fila[2] for fila in cursor.fetchall()}
+
+        detalles = []
+        ventas = []
+        descuentos = {}
+        creadas = {}
+        liberadas = []
+
+        for indice, clave, cliente_id, lineas, fecha in tramo:
+            if clave is not None and clave not in reclamadas:
+                resultados[indice].update({'clave_idempotencia': clave, 'duplicada': True})
+                continue
+
+            # Cantidad pedida por producto en esta factura
+            pedido = {}
+            for producto_id, cantidad, _ in lineas:
+                pedido[producto_id] = pedido.get(producto_id, 0) + cantidad
+
+            faltantes = [producto_id for producto_id in pedido if producto_id not in stock_disponible]
+            sin_stock = [
+                producto_id for producto_id, cantidad in pedido.items()
+                if producto_id in stock_disponible and stock_disponible[producto_id] < cantidad
+            ]
+            if faltantes:
+                resultados[indice]['message'] = f'Producto con ID {faltantes[0]} no encontrado'
+            elif sin_stock:
+                resultados[indice]['message'] = (
+                    f'Stock insuficiente para el producto {sin_stock[0]}. '
+                    f'Stock disponible: {stock_disponible[sin_stock[0]]}, solicitado: {pedido[sin_stock[0]]}'
+                )
+            if faltantes or sin_stock:
+                if clave is not None:
+                    liberadas.append(clave)
+                continue
+
+            # Una fila por factura: con innodb_autoinc_lock_mode = 2 los ids de
+            # un INSERT de varias filas no son necesariamente consecutivos
+            fecha = fecha or ahora
+            total = sum(cantidad * precio for _, cantidad, precio in lineas)
+            cursor.execute(
+                "INSERT INTO facturas (cliente_id, fecha, total) VALUES (%s, %s, %s)",
+                (cliente_id, fecha, total)
+            )
+            factura_id = cursor.lastrowid
+
+            for producto_id, cantidad in pedido.items():
+                stock_disponible[producto_id] -= cantidad
+                descuentos[producto_id] = descuentos.get(producto_id, 0) + cantidad
+
+            detalles.extend(
+                (factura_id, producto_id, cantidad, precio)
+                for producto_id, cantidad, precio in lineas
+            )
+            ventas.extend((producto_id, cantidad, fecha) for producto_id, cantidad, _ in lineas)
+
+            if clave is not None:
+                creadas[clave] = factura_id
+            resultados[indice].update({
+                'success': True,
+                'factura_id': factura_id,
+                'total': total
+            })
+
+        if liberadas:
+            cursor.execute(
+                f"DELETE FROM facturas_idempotencia WHERE clave IN ({_marcadores(len(liberadas))})",
+                liberadas
+            )
+
+        if not descuentos:
+            return creadas
+
+        cursor.executemany(
+            "INSERT INTO detalle_factura (factura_id, producto_id, cantidad, precio_unitario) VALUES (%s, %s, %s, %s)",
+            detalles
+        )
+        cursor.executemany(
+            "INSERT INTO demanda_historica (producto_id, fecha, cantidad_vendida) VALUES (%s, %s, %s)",
+            [(producto_id, fecha, cantidad) for producto_id, cantidad, fecha in ventas]
+        )
+
+        # Un solo UPDATE de stock para todo el tramo
+        casos = ' '.join(['WHEN %s THEN %s'] * len(descuentos))
+        valores_casos = [valor for par in descuentos.items() for valor in par]
+        cursor.execute(
+            f"""
+            UPDATE productos
+            SET stock_actual = stock_actual - CASE id {casos} END
+            WHERE id IN ({_marcadores(len(descuentos))})
+                AND stock_actual >= CASE id {casos} END
+            """,
+            valores_casos + list(descuentos) + valores_casos
+        )
+        if cursor.rowcount != len(descuentos):
+            raise RuntimeError('El stock cambió mientras se procesaba el tramo')
+
+        VentasDiariasService.registrar_ventas(cursor, ventas)
+
+        if creadas:
+            # Un solo UPDATE para asociar cada clave con su factura
+            casos = ' '.join(['WHEN %s THEN %s'] * len(creadas))
+            cursor.execute(
+                f"""
+                UPDATE facturas_idempotencia
+                SET factura_id = CASE clave {casos} END
+                WHERE clave IN ({_marcadores(len(creadas))})
+                """,
+                [valor for par in creadas.items() for valor in par] + list(creadas)
+            )
+
+        return creadas
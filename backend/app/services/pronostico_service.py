@@ -0,0 +1,334 @@
+"""
+Servicio de Pronósticos Materializados
+Calcula los pronósticos de demanda de todo el catálogo en una corrida por lotes
+(nocturna o bajo demanda) y los guarda por producto, versionados por corrida,
+para que los reportes de predicción lean la última foto con una consulta indexada.
+
+Las tablas las crea `flask migrar` (migración 1). Una foto más vieja que
+PRONOSTICOS_ANTIGUEDAD_MAXIMA no se usa y los reportes se calculan en vivo.
+"""
+
+from datetime import datetime, timedelta
+import time
+
+import MySQLdb
+import pandas as pd
+from flask import current_app
+
+from app.database import mysql
+from app.metricas import metricas, BUCKETS_REPORTE
+from app.ia.algoritmos import construir_matriz_ventas, calcular_promedio_movil_matriz
+from app.ia.ejecutor_pronosticos import predecir_catalogo_en_paralelo
+from app.services.contexto_reporte import ContextoReporte, TAMANO_LOTE_PRODUCTOS, filas_como_dict
+from app.services.dimensiones import dimensiones
+
+CREAR_TABLA_CORRIDAS = """
+CREATE TABLE IF NOT EXISTS pronosticos_corridas (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    tipo VARCHAR(10) NOT NULL,
+    estado VARCHAR(10) NOT NULL,
+    fecha_inicio DATETIME NOT NULL,
+    fecha_fin DATETIME NULL,
+    productos_calculados INT NOT NULL DEFAULT 0,
+    KEY idx_pronosticos_corridas_estado (estado, id)
+)
+"""
+
+CREAR_TABLA_PRONOSTICOS = """
+CREATE TABLE IF NOT EXISTS pronosticos_producto (
+    corrida_id INT NOT NULL,
+    producto_id INT NOT NULL,
+    promedio_diario DECIMAL(12, 4) NOT NULL,
+    demanda_estimada DECIMAL(12, 1) NOT NULL,
+    tendencia VARCHAR(20) NOT NULL,
+    confianza VARCHAR(10) NOT NULL,
+    promedio_diario_30 DECIMAL(12, 4) NULL,
+    PRIMARY KEY (corrida_id, producto_id)
+)
+"""
+
+# Corridas completas que se conservan (las anteriores se borran)
+CORRIDAS_RETENIDAS = 14
+
+# Evita que dos workers materialicen a la vez (GET_LOCK de MySQL)
+NOMBRE_BLOQUEO = 'pronosticos_materializacion'
+
+# Segundos de antigüedad de la última corrida a partir de los cuales se ignora
+ANTIGUEDAD_MAXIMA_POR_DEFECTO = 36 * 3600
+
+# Table doesn't exist (todavía no se ejecutó `flask migrar`)
+ERROR_TABLA_INEXISTENTE = 1146
+
+class PronosticoService:
+
+    @staticmethod
+    def _ultima_corrida(cursor):
+        """{'id', 'fecha_inicio'} de la última corrida completa, o None"""
+        cursor.execute("""
+            SELECT id, fecha_inicio
+            FROM pronosticos_corridas
+            WHERE estado = 'completa'
+            ORDER BY id DESC
+            LIMIT 1
+        """)
+        filas = filas_como_dict(cursor)
+        return filas[0] if filas else None
+
+    @staticmethod
+    def _productos_con_ventas_desde(cursor, desde):
+        """Ids de productos facturados desde la fecha dada"""
+        cursor.execute("""
+            SELECT DISTINCT d.producto_id
+            FROM facturas f
+            INNER JOIN detalle_factura d ON d.factura_id = f.id
+            WHERE f.fecha >= %s
+        """, (desde,))
+        return [fila['producto_id'] for fila in filas_como_dict(cursor)]
+
+    @staticmethod
+    def calcular(contexto, procesos=None):
+        """
+        Pronostica los productos del contexto que tienen ventas en la ventana
+
+        Returns:
+            list: Tuplas (producto_id, promedio_diario, demanda_estimada,
+                  tendencia, confianza, promedio_diario_30)
+        """
+        filas = [
+            {'producto_id': producto['id'], **venta}
+            for producto in contexto.productos
+            for venta in contexto.ventas(producto['id'], ContextoReporte.DIAS_VENTANA)
+        ]
+        ventas_df = pd.DataFrame(filas, columns=['producto_id', 'fecha', 'cantidad'])
+        if ventas_df.empty:
+            return []
+
+        # Predicción de demanda: últimos 90 días (igual que el reporte en vivo)
+        prediccion = predecir_catalogo_en_paralelo(ventas_df, 30, 30, procesos)
+
+        # Agotamiento: promedio de los días con ventas de los últimos 30 días
+        limite = (contexto.fecha_corte - timedelta(days=30)).strftime('%Y-%m-%d')
+        ids_30, matriz_30 = construir_matriz_ventas(ventas_df[ventas_df['fecha'] >= limite])
+        promedios_30 = dict(zip(ids_30.tolist(), calcular_promedio_movil_matriz(matriz_30, 30).tolist()))
+
+        return [
+            (
+                int(producto_id),
+                round(float(fila.promedio_diario), 4),
+                float(fila.demanda_estimada),
+                fila.tendencia,
+                fila.confianza,
+                round(promedios_30[producto_id], 4) if producto_id in promedios_30 else None
+            )
+            for producto_id, fila in zip(prediccion.index.tolist(), prediccion.itertuples(index=False))
+        ]
+
+    @staticmethod
+    def materializar(parcial=False, procesos=None, avance=None):
+        """
+        Ejecuta una corrida de pronósticos y la guarda como nueva versión
+
+        Args:
+            parcial: Recalcular solo los productos facturados desde la última
+                     corrida completa y copiar el resto de esa corrida
+            procesos: Procesos para el cálculo (ver predecir_catalogo_en_paralelo)
+            avance: Función opcional que recibe la fracción hecha (0 a 1)
+
+        Returns:
+            dict: {'corrida_id', 'tipo', 'productos_calculados', 'segundos'}
+                  o None si otra corrida está en curso
+        """
+        inicio = time.monotonic()
+        avance = avance or (lambda fraccion: None)
+        cursor = mysql.connection.cursor()
+
+        try:
+            cursor.execute("SELECT GET_LOCK(%s, 0) AS obtenido", (NOMBRE_BLOQUEO,))
+            if not filas_como_dict(cursor)[0]['obtenido']:
+                return None
+
+            try:
+                anterior = PronosticoService._ultima_corrida(cursor)
+
+                producto_ids = None
+                if parcial and anterior:
+                    producto_ids = PronosticoService._productos_con_ventas_desde(cursor, anterior['fecha_inicio'])
+                    if not producto_ids:
+                        return {
+                            'corrida_id': anterior['id'],
+                            'tipo': 'parcial',
+                            'productos_calculados': 0,
+                            'segundos': round(time.monotonic() - inicio, 3)
+                        }
+                tipo = 'parcial' if producto_ids is not None else 'completa'
+
+                cursor.execute(
+                    "INSERT INTO pronosticos_corridas (tipo, estado, fecha_inicio) VALUES (%s, 'en_curso', NOW())",
+                    (tipo,)
+                )
+                corrida_id = cursor.lastrowid
+                mysql.connection.commit()
+
+                try:
+                    contexto = ContextoReporte.cargar(producto_ids)
+                    avance(0.3)
+                    pronosticos = PronosticoService.calcular(contexto, procesos)
+                    avance(0.6)
+                    PronosticoService._guardar(
+                        cursor, corrida_id, pronosticos, anterior, producto_ids,
+                        lambda fraccion: avance(0.6 + 0.4 * fraccion)
+                    )
+
+                    cursor.execute("""
+                        UPDATE pronosticos_corridas
+                        SET estado = 'completa', fecha_fin = NOW(), productos_calculados = %s
+                        WHERE id = %s
+                    """, (len(pronosticos), corrida_id))
+                    PronosticoService._purgar_corridas(cursor)
+                    mysql.connection.commit()
+                except Exception:
+                    mysql.connection.rollback()
+                    cursor.execute(
+                        "UPDATE pronosticos_corridas SET estado = 'fallida', fecha_fin = NOW() WHERE id = %s",
+                        (corrida_id,)
+                    )
+                    mysql.connection.commit()
+                    raise
+            finally:
+                cursor.execute("SELECT RELEASE_LOCK(%s)", (NOMBRE_BLOQUEO,))
+                cursor.fetchall()
+        finally:
+            cursor.close()
+
+        segundos = time.monotonic() - inicio
+        metricas.observar('erp_pronostico_duracion_segundos', (('tipo', tipo),), segundos, BUCKETS_REPORTE)
+        metricas.fijar('erp_pronostico_productos', (('tipo', tipo),), len(pronosticos))
+
+        return {
+            'corrida_id': corrida_id,
+            'tipo': tipo,
+            'productos_calculados': len(pronosticos),
+            'segundos': round(segundos, 3)
+        }
+
+    @staticmethod
+    def _guardar(cursor, corrida_id, pronosticos, anterior, producto_ids, avance):
+        """
+        Escribe la corrida; en una parcial, copia primero los productos no recalculados
+        avance recibe la fracción de pronósticos escrita tras cada lote
+        """
+        if producto_ids is not None:
+            cursor.execute("""
+                INSERT INTO pronosticos_producto
+                    (corrida_id, producto_id, promedio_diario, demanda_estimada,
+                     tendencia, confianza, promedio_diario_30)
+                SELECT %s, producto_id, promedio_diario, demanda_estimada,
+                       tendencia, confianza, promedio_diario_30
+                FROM pronosticos_producto
+                WHERE corrida_id = %s
+            """, (corrida_id, anterior['id']))
+
+            for inicio in range(0, len(producto_ids), TAMANO_LOTE_PRODUCTOS):
+                lote = producto_ids[inicio:inicio + TAMANO_LOTE_PRODUCTOS]
+                marcadores = ', '.join(['%s'] * len(lote))
+                cursor.execute(
+                    f"DELETE FROM pronosticos_producto WHERE corrida_id = %s AND producto_id IN ({marcadores})",
+                    (corrida_id, *lote)
+                )
+
+        for inicio in range(0, len(pronosticos), TAMANO_LOTE_PRODUCTOS):
+            cursor.executemany(
+                """
+                INSERT INTO pronosticos_producto
+                    (corrida_id, producto_id, promedio_diario, demanda_estimada,
+                     tendencia, confianza, promedio_diario_30)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+                """,
+                [(corrida_id, *fila) for fila in pronosticos[inicio:inicio + TAMANO_LOTE_PRODUCTOS]]
+            )
+            avance(min(inicio + TAMANO_LOTE_PRODUCTOS, len(pronosticos)) / len(pronosticos))
+
+    @staticmethod
+    def _purgar_corridas(cursor):
+        """Borra los pronósticos de corridas más viejas que las CORRIDAS_RETENIDAS últimas"""
+        cursor.execute("""
+            SELECT id FROM pronosticos_corridas
+            WHERE estado = 'completa'
+            ORDER BY id DESC
+            LIMIT 1 OFFSET %s
+        """, (CORRIDAS_RETENIDAS - 1,))
+        mas_vieja = filas_como_dict(cursor)
+        if mas_vieja:
+            cursor.execute("DELETE FROM pronosticos_producto WHERE corrida_id < %s", (mas_vieja[0]['id'],))
+            cursor.execute("DELETE FROM pronosticos_corridas WHERE id < %s", (mas_vieja[0]['id'],))
+
+    @staticmethod
+    def hay_corridas():
+        """True si existe al menos una corrida completa"""
+        cursor = mysql.connection.cursor()
+        try:
+            return PronosticoService._ultima_corrida(cursor) is not None
+        except MySQLdb.ProgrammingError as e:
+            if e.args[0] != ERROR_TABLA_INEXISTENTE:
+                raise
+            return False
+        finally:
+            cursor.close()
+
+    @staticmethod
+    def cargar_ultimos(antiguedad_maxima=None):
+        """
+        Lee la última corrida completa junto con los datos actuales de cada producto
+
+        Args:
+            antiguedad_maxima: Segundos; una corrida más vieja se ignora
+                               (por defecto, PRONOSTICOS_ANTIGUEDAD_MAXIMA)
+
+        Returns:
+            dict: {'corrida_id', 'fecha_calculo', 'productos': [...]} o None si
+                  no hay corridas, la última es demasiado vieja o las tablas
+                  todavía no existen. Cada producto trae id, nombre,
+                  stock_actual, categoria_nombre, proveedor_nombre y las
+                  columnas del pronóstico
+        """
+        if antiguedad_maxima is None:
+            antiguedad_maxima = current_app.config.get('PRONOSTICOS_ANTIGUEDAD_MAXIMA', ANTIGUEDAD_MAXIMA_POR_DEFECTO)
+
+        cursor = mysql.connection.cursor()
+
+        try:
+            try:
+                corrida = PronosticoService._ultima_corrida(cursor)
+            except MySQLdb.ProgrammingError as e:
+                if e.args[0] != ERROR_TABLA_INEXISTENTE:
+                    raise
+                return None
+            if not corrida:
+                return None
+            corrida_id, fecha_inicio = corrida['id'], corrida['fecha_inicio']
+            if (datetime.now() - fecha_inicio).total_seconds() > antiguedad_maxima:
+                return None
+
+            cursor.execute("""
+                SELECT
+                    p.id, p.nombre, p.stock_actual,
+                    p.categoria_id, p.proveedor_id,
+                    f.promedio_diario, f.demanda_estimada, f.tendencia,
+                    f.confianza, f.promedio_diario_30
+                FROM pronosticos_producto f
+                INNER JOIN productos p ON p.id = f.producto_id
+                WHERE f.corrida_id = %s AND p.activo = 1
+            """, (corrida_id,))
+            productos = filas_como_dict(cursor)
+        finally:
+            cursor.close()
+
+        for producto in productos:
+            producto['categoria_nombre'] = dimensiones.nombre_categoria(producto.pop('categoria_id'))
+            producto['proveedor_nombre'] = dimensiones.nombre_proveedor(producto.pop('proveedor_id'))
+
+        return {
+            'corrida_id': corrida_id,
+            'fecha_calculo': fecha_inicio.strftime('%Y-%m-%d %H:%M:%S'),
+            'productos': productos
+        }
@@ -3,43 +3,38 @@ Servicio de Reportes de IA
 Conecta la base de datos con los algoritmos de IA para generar reportes inteligentes
 """
 
-from app.database import mysql
 from app.ia.algoritmos import (
     calcular_promedio_movil,
     calcular_dias_hasta_agotamiento,
     detectar_sobrestock,
     calcular_rotacion_producto,
-    identificar_stock_critico,
-    predecir_demanda_futura
+    identificar_stock_critico
 )
+from app.ia.ejecutor_pronosticos import predecir_catalogo_en_paralelo
+from app.services.contexto_reporte import ContextoReporte
+from app.services.pronostico_service import PronosticoService
+from app.metricas import metricas
+import pandas as pd
 from datetime import datetime, timedelta
 
 class ReporteService:
     
     @staticmethod
-    def obtener_reporte_stock_critico():
+    @metricas.medir_reporte('stock-critico')
+    def obtener_reporte_stock_critico(contexto=None):
         """
         Genera reporte de productos con stock crítico
+        
+        Args:
+            contexto: ContextoReporte ya cargado (opcional, se carga si no se pasa)
         """
         try:
-            cursor = mysql.connection.cursor()
+            contexto = contexto or ContextoReporte.cargar()
             
-            # Consulta productos con información completa
-            query = """
-            SELECT 
-                p.id, p.nombre, p.stock_actual, p.stock_minimo,
-                p.precio_venta, c.nombre as categoria_nombre,
-                pr.nombre as proveedor_nombre
-            FROM productos p
-            LEFT JOIN categorias c ON p.categoria_id = c.id
-            LEFT JOIN proveedores pr ON p.proveedor_id = pr.id
-            WHERE p.activo = 1
-            ORDER BY (p.stock_actual / NULLIF(p.stock_minimo, 0)) ASC
-            """
-            
-            cursor.execute(query)
-            productos = cursor.fetchall()
-            cursor.close()
+            # Ordenar por proporción stock actual / mínimo (sin mínimo primero)
+            productos = sorted(contexto.productos, key=lambda p: (
+                (0, 0) if not p['stock_minimo'] else (1, p['stock_actual'] / p['stock_minimo'])
+            ))
             
             productos_criticos = []
             
@@ -78,58 +73,45 @@ class ReporteService:
             }
     
     @staticmethod
-    def obtener_reporte_prediccion_demanda():
+    @metricas.medir_reporte('prediccion-demanda')
+    def obtener_reporte_prediccion_demanda(contexto=None):
         """
         Genera reporte de predicción de demanda basado en historial de ventas
+        
+        Sin contexto, usa la última corrida de pronósticos materializada
+        (ver PronosticoService) si existe
+        
+        Args:
+            contexto: ContextoReporte ya cargado (opcional, se carga si no se pasa)
         """
         try:
-            cursor = mysql.connection.cursor()
-            
-            # Obtener productos con sus ventas históricas
-            query = """
-            SELECT 
-                p.id, p.nombre, p.stock_actual,
-                c.nombre as categoria_nombre
-            FROM productos p
-            LEFT JOIN categorias c ON p.categoria_id = c.id
-            WHERE p.activo = 1
-            """
-            
-            cursor.execute(query)
-            productos = cursor.fetchall()
+            materializado = None if contexto else PronosticoService.cargar_ultimos()
+            
+            if materializado:
+                productos = materializado['productos']
+                predicciones_catalogo = {producto['id']: producto for producto in productos}
+            else:
+                contexto = contexto or ContextoReporte.cargar()
+                productos = contexto.productos
+                
+                # Promedio móvil y predicción de todo el catálogo (en varios procesos si es grande)
+                ventas_df = pd.DataFrame(
+                    [
+                        {'producto_id': producto['id'], **venta}
+                        for producto in productos
+                        for venta in contexto.ventas(producto['id'], 90)
+                    ],
+                    columns=['producto_id', 'fecha', 'cantidad']
+                )
+                predicciones_catalogo = predecir_catalogo_en_paralelo(ventas_df, 30, 30).to_dict('index')
             
             predicciones = []
             
             for producto in productos:
-                # Obtener historial de ventas del producto
-                ventas_query = """
-                SELECT 
-                    DATE(f.fecha_factura) as fecha,
-                    SUM(df.cantidad) as cantidad
-                FROM detalle_factura df
-                JOIN facturas f ON df.factura_id = f.id
-                WHERE df.producto_id = %s
-                    AND f.fecha_factura >= DATE_SUB(NOW(), INTERVAL 90 DAY)
-                GROUP BY DATE(f.fecha_factura)
-                ORDER BY fecha
-                """
-                
-                cursor.execute(ventas_query, (producto['id'],))
-                ventas_historial = cursor.fetchall()
+                prediccion = predicciones_catalogo.get(producto['id'])
                 
-                if ventas_historial:
-                    # Convertir a formato para algoritmos IA
-                    ventas_data = [
-                        {
-                            'fecha': venta['fecha'].strftime('%Y-%m-%d'),
-                            'cantidad': int(venta['cantidad'])
-                        }
-                        for venta in ventas_historial
-                    ]
-                    
-                    # Calcular promedio móvil y predicción
-                    promedio_diario = calcular_promedio_movil(ventas_data, 30)
-                    prediccion = predecir_demanda_futura(ventas_data, 30)
+                if prediccion:
+                    promedio_diario = float(prediccion['promedio_diario'])
                     
                     predicciones.append({
                         'id': producto['id'],
@@ -137,23 +119,25 @@ class ReporteService:
                         'stock_actual': producto['stock_actual'],
                         'categoria': producto['categoria_nombre'],
                         'promedio_ventas_diarias': round(promedio_diario, 2),
-                        'demanda_estimada_30_dias': prediccion['demanda_estimada'],
+                        'demanda_estimada_30_dias': float(prediccion['demanda_estimada']),
                         'tendencia': prediccion['tendencia'],
                         'confianza': prediccion['confianza'],
                         'stock_sugerido': max(
                             producto['stock_actual'], 
-                            int(prediccion['demanda_estimada'] * 1.2)  # 20% buffer
+                            int(float(prediccion['demanda_estimada']) * 1.2)  # 20% buffer
                         )
                     })
             
-            cursor.close()
-            
-            return {
+            reporte = {
                 'success': True,
                 'data': predicciones,
                 'total_productos': len(predicciones),
                 'fecha_reporte': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             }
+            if materializado:
+                reporte['corrida_id'] = materializado['corrida_id']
+                reporte['fecha_calculo'] = materializado['fecha_calculo']
+            return reporte
             
         except Exception as e:
             return {
@@ -163,57 +147,41 @@ class ReporteService:
             }
     
     @staticmethod
-    def obtener_reporte_prediccion_agotamiento():
+    @metricas.medir_reporte('prediccion-agotamiento')
+    def obtener_reporte_prediccion_agotamiento(contexto=None):
         """
         Predice cuándo se agotará cada producto
+        
+        Sin contexto, usa la última corrida de pronósticos materializada
+        (ver PronosticoService) si existe; los días se calculan con el stock actual
+        
+        Args:
+            contexto: ContextoReporte ya cargado (opcional, se carga si no se pasa)
         """
         try:
-            cursor = mysql.connection.cursor()
-            
-            # Obtener productos con ventas recientes
-            query = """
-            SELECT 
-                p.id, p.nombre, p.stock_actual, p.stock_minimo,
-                c.nombre as categoria_nombre,
-                pr.nombre as proveedor_nombre
-            FROM productos p
-            LEFT JOIN categorias c ON p.categoria_id = c.id
-            LEFT JOIN proveedores pr ON p.proveedor_id = pr.id
-            WHERE p.activo = 1 AND p.stock_actual > 0
-            """
-            
-            cursor.execute(query)
-            productos = cursor.fetchall()
+            materializado = None if contexto else PronosticoService.cargar_ultimos()
+            
+            if materializado:
+                productos = [p for p in materializado['productos'] if p['stock_actual'] > 0]
+                promedios = {
+                    p['id']: float(p['promedio_diario_30'])
+                    for p in productos if p['promedio_diario_30'] is not None
+                }
+            else:
+                contexto = contexto or ContextoReporte.cargar()
+                productos = [p for p in contexto.productos if p['stock_actual'] > 0]
+                
+                # Calcular promedio de ventas diarias de los productos con ventas
+                promedios = {
+                    p['id']: calcular_promedio_movil(contexto.ventas(p['id'], 30), 30)
+                    for p in productos if contexto.ventas(p['id'], 30)
+                }
             
             predicciones_agotamiento = []
             
             for producto in productos:
-                # Obtener ventas últimos 30 días
-                ventas_query = """
-                SELECT 
-                    DATE(f.fecha_factura) as fecha,
-                    SUM(df.cantidad) as cantidad
-                FROM detalle_factura df
-                JOIN facturas f ON df.factura_id = f.id
-                WHERE df.producto_id = %s
-                    AND f.fecha_factura >= DATE_SUB(NOW(), INTERVAL 30 DAY)
-                GROUP BY DATE(f.fecha_factura)
-                """
-                
-                cursor.execute(ventas_query, (producto['id'],))
-                ventas_recientes = cursor.fetchall()
-                
-                if ventas_recientes:
-                    # Calcular promedio de ventas diarias
-                    ventas_data = [
-                        {
-                            'fecha': venta['fecha'].strftime('%Y-%m-%d'),
-                            'cantidad': int(venta['cantidad'])
-                        }
-                        for venta in ventas_recientes
-                    ]
-                    
-                    promedio_diario = calcular_promedio_movil(ventas_data, 30)
+                if producto['id'] in promedios:
+                    promedio_diario = promedios[producto['id']]
                     dias_agotamiento = calcular_dias_hasta_agotamiento(
                         producto['stock_actual'], 
                         promedio_diario
@@ -239,8 +207,6 @@ class ReporteService:
                         'nivel_urgencia': urgencia
                     })
             
-            cursor.close()
-            
             # Ordenar por urgencia (críticos primero)
             predicciones_agotamiento.sort(key=lambda x: (
                 0 if x['nivel_urgencia'] == 'CRÍTICO' else
@@ -248,12 +214,16 @@ class ReporteService:
                 x['dias_hasta_agotamiento'] or 999
             ))
             
-            return {
+            reporte = {
                 'success': True,
                 'data': predicciones_agotamiento,
                 'total_productos': len(predicciones_agotamiento),
                 'fecha_reporte': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             }
+            if materializado:
+                reporte['corrida_id'] = materializado['corrida_id']
+                reporte['fecha_calculo'] = materializado['fecha_calculo']
+            return reporte
             
         except Exception as e:
             return {
@@ -263,53 +233,24 @@ class ReporteService:
             }
     
     @staticmethod
-    def obtener_reporte_sobrestock():
+    @metricas.medir_reporte('sobrestock')
+    def obtener_reporte_sobrestock(contexto=None):
         """
         Identifica productos con exceso de inventario
+        
+        Args:
+            contexto: ContextoReporte ya cargado (opcional, se carga si no se pasa)
         """
         try:
-            cursor = mysql.connection.cursor()
-            
-            # Obtener productos con stock alto
-            query = """
-            SELECT 
-                p.id, p.nombre, p.stock_actual, p.precio_compra,
-                c.nombre as categoria_nombre
-            FROM productos p
-            LEFT JOIN categorias c ON p.categoria_id = c.id
-            WHERE p.activo = 1 AND p.stock_actual > 0
-            """
-            
-            cursor.execute(query)
-            productos = cursor.fetchall()
+            contexto = contexto or ContextoReporte.cargar()
+            productos = [p for p in contexto.productos if p['stock_actual'] > 0]
             
             productos_sobrestock = []
             
             for producto in productos:
-                # Obtener ventas últimos 60 días
-                ventas_query = """
-                SELECT 
-                    DATE(f.fecha_factura) as fecha,
-                    SUM(df.cantidad) as cantidad
-                FROM detalle_factura df
-                JOIN facturas f ON df.factura_id = f.id
-                WHERE df.producto_id = %s
-                    AND f.fecha_factura >= DATE_SUB(NOW(), INTERVAL 60 DAY)
-                GROUP BY DATE(f.fecha_factura)
-                """
-                
-                cursor.execute(ventas_query, (producto['id'],))
-                ventas = cursor.fetchall()
+                ventas_data = contexto.ventas(producto['id'], 60)
                 
-                if ventas:
-                    ventas_data = [
-                        {
-                            'fecha': venta['fecha'].strftime('%Y-%m-%d'),
-                            'cantidad': int(venta['cantidad'])
-                        }
-                        for venta in ventas
-                    ]
-                    
+                if ventas_data:
                     promedio_diario = calcular_promedio_movil(ventas_data, 60)
                     analisis_sobrestock = detectar_sobrestock(
                         producto['stock_actual'], 
@@ -332,8 +273,6 @@ class ReporteService:
                             'sugerencia': analisis_sobrestock['sugerencia']
                         })
             
-            cursor.close()
-            
             # Ordenar por valor de exceso (mayor impacto primero)
             productos_sobrestock.sort(key=lambda x: x['valor_exceso'], reverse=True)
             
@@ -353,44 +292,25 @@ class ReporteService:
             }
     
     @staticmethod
-    def obtener_reporte_rotacion_productos():
+    @metricas.medir_reporte('rotacion-productos')
+    def obtener_reporte_rotacion_productos(contexto=None):
         """
         Analiza la rotación de inventario de todos los productos
+        
+        Args:
+            contexto: ContextoReporte ya cargado (opcional, se carga si no se pasa)
         """
         try:
-            cursor = mysql.connection.cursor()
-            
-            # Obtener productos con datos de inventario
-            query = """
-            SELECT 
-                p.id, p.nombre, p.stock_actual, p.precio_venta,
-                c.nombre as categoria_nombre
-            FROM productos p
-            LEFT JOIN categorias c ON p.categoria_id = c.id
-            WHERE p.activo = 1
-            """
-            
-            cursor.execute(query)
-            productos = cursor.fetchall()
+            contexto = contexto or ContextoReporte.cargar()
+            productos = contexto.productos
             
             analisis_rotacion = []
             
             for producto in productos:
-                # Obtener ventas últimos 90 días para calcular rotación
-                ventas_query = """
-                SELECT 
-                    SUM(df.cantidad) as total_vendido,
-                    COUNT(DISTINCT DATE(f.fecha_factura)) as dias_con_ventas
-                FROM detalle_factura df
-                JOIN facturas f ON df.factura_id = f.id
-                WHERE df.producto_id = %s
-                    AND f.fecha_factura >= DATE_SUB(NOW(), INTERVAL 90 DAY)
-                """
-                
-                cursor.execute(ventas_query, (producto['id'],))
-                resultado_ventas = cursor.fetchone()
+                ventas_data = contexto.ventas(producto['id'], 90)
                 
-                total_vendido = resultado_ventas['total_vendido'] or 0
+                total_vendido = sum(venta['cantidad'] for venta in ventas_data)
+                dias_con_ventas = len(ventas_data)
                 
                 if total_vendido > 0:
                     # Calcular stock promedio (simplificado)
@@ -411,12 +331,10 @@ class ReporteService:
                         'rotacion': rotacion_info['rotacion'],
                         'velocidad_rotacion': rotacion_info['velocidad'],
                         'ingresos_90_dias': round(ingresos_90_dias, 2),
-                        'dias_con_ventas': resultado_ventas['dias_con_ventas'],
-                        'frecuencia_ventas': round((resultado_ventas['dias_con_ventas'] / 90) * 100, 1)
+                        'dias_con_ventas': dias_con_ventas,
+                        'frecuencia_ventas': round((dias_con_ventas / 90) * 100, 1)
                     })
             
-            cursor.close()
-            
             # Ordenar por rotación (más alta primero)
             analisis_rotacion.sort(key=lambda x: x['rotacion'], reverse=True)
             
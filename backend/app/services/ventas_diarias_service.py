@@ -0,0 +1,89 @@
+"""
+Servicio de Ventas Diarias
+Mantiene la tabla resumen ventas_diarias_producto (unidades vendidas por producto y día)
+que usan los reportes de IA en lugar de re-agregar detalle_factura
+"""
+
+from datetime import date, datetime
+
+from app.database import mysql
+
+CREAR_TABLA_VENTAS_DIARIAS = """
+CREATE TABLE IF NOT EXISTS ventas_diarias_producto (
+    producto_id INT NOT NULL,
+    fecha DATE NOT NULL,
+    cantidad INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (producto_id, fecha),
+    KEY idx_ventas_diarias_fecha (fecha)
+)
+"""
+
+class VentasDiariasService:
+    
+    @staticmethod
+    def registrar_ventas(cursor, lineas):
+        """
+        Suma las unidades vendidas al resumen diario
+        No hace commit: se ejecuta dentro de la transacción de la factura
+        
+        Args:
+            cursor: Cursor de la transacción en curso
+            lineas: Lista de tuplas (producto_id, cantidad) o (producto_id, cantidad, fecha);
+                    sin fecha (o con None) se suma al día de hoy
+        """
+        if not lineas:
+            return
+        
+        # El día se resuelve aquí: con funciones dentro de VALUES, executemany
+        # manda una consulta por fila en vez de un solo INSERT
+        hoy = date.today()
+        filas = []
+        for linea in lineas:
+            fecha = (linea[2] if len(linea) > 2 else None) or hoy
+            if isinstance(fecha, datetime):
+                fecha = fecha.date()
+            filas.append((linea[0], fecha, linea[1]))
+        
+        query = """
+            INSERT INTO ventas_diarias_producto (producto_id, fecha, cantidad)
+            VALUES (%s, %s, %s)
+            ON DUPLICATE KEY UPDATE cantidad = cantidad + VALUES(cantidad)
+        """
+        cursor.executemany(query, filas)
+    
+    @staticmethod
+    def reconstruir():
+        """
+        Regenera por completo el resumen diario a partir de detalle_factura
+        
+        Returns:
+            int: Cantidad de filas (producto, día) generadas
+        """
+        cursor = mysql.connection.cursor()
+        
+        try:
+            cursor.execute(CREAR_TABLA_VENTAS_DIARIAS)
+            cursor.execute("DELETE FROM ventas_diarias_producto")
+            
+            query = """
+                INSERT INTO ventas_diarias_producto (producto_id, fecha, cantidad)
+                SELECT 
+                    df.producto_id,
+                    DATE(f.fecha) as fecha,
+                    SUM(df.cantidad) as cantidad
+                FROM detalle_factura df
+                JOIN facturas f ON df.factura_id = f.id
+                GROUP BY df.producto_id, DATE(f.fecha)
+            """
+            cursor.execute(query)
+            filas = cursor.rowcount
+            
+            mysql.connection.commit()
+            return filas
+        
+        except Exception:
+            mysql.connection.rollback()
+            raise
+        
+        finally:
+            cursor.close()
@@ -0,0 +1,20 @@
+# backend/asgi.py
+
+#--> Entrada ASGI: uvicorn asgi:app --workers 2
+#    Cada solicitud corre en un hilo de un pool de ASGI_HILOS hilos y el bucle
+#    de eventos solo maneja E/S de red. Ese es el límite real de concurrencia
+#    por proceso: hasta ASGI_HILOS solicitudes en curso (incluidas descargas
+#    en streaming y clientes lentos leyendo la respuesta); las demás esperan
+#    en la cola del pool. De ellas, solo MYSQL_POOL_MAX pueden tener una
+#    conexión MySQL a la vez (se toma en la primera consulta y se devuelve al
+#    terminar la solicitud); el resto espera hasta MYSQL_POOL_TIMEOUT segundos.
+#    Los hilos de más sirven a solicitudes que no tocan MySQL (reportes en
+#    caché, /sesion, /metricas) y a las que esperan conexión sin bloquear a
+#    las que ya la tienen.
+from a2wsgi import WSGIMiddleware
+
+from app import create_app
+
+flask_app = create_app()
+
+app = WSGIMiddleware(flask_app, workers=flask_app.config['ASGI_HILOS'])
@@ -0,0 +1,197 @@
+"""
+Benchmarks del ERP
+Genera (opcionalmente) datos sintéticos en una base aparte, ejecuta los
+escenarios con el cliente de pruebas de Flask y guarda latencias, rendimiento,
+consultas por solicitud y memoria pico en JSON para comparar entre versiones.
+
+Uso (desde backend/):
+    python -m benchmarks.ejecutar --escala 1k --generar --copiar-esquema-de inventario_ia
+    python -m benchmarks.ejecutar --escala 1k --salida base.json
+    python -m benchmarks.ejecutar --escala 1k --comparar base.json
+"""
+
+import argparse
+import json
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from app import create_app
+from app.database import mysql
+from app.migraciones import aplicar_migraciones
+from app.services.cache_reportes import cache_reportes
+from benchmarks.escenarios import ESCENARIOS, cargar_datos
+from benchmarks.generador import ESCALAS, copiar_esquema, generar
+
+BASE_BENCHMARKS = 'inventario_ia_bench'
+
+# Un escenario es regresión si su p95 empeora más que este factor
+UMBRAL_REGRESION = 1.2
+
+def _percentil(valores, porcentaje):
+    ordenados = sorted(valores)
+    indice = min(len(ordenados) - 1, max(0, round(porcentaje / 100 * len(ordenados)) - 1))
+    return ordenados[indice]
+
+def _consultas_totales():
+    """Contador global de sentencias del servidor MySQL (la base debe ser exclusiva)"""
+    cursor = mysql.connection.cursor()
+    try:
+        cursor.execute("SHOW GLOBAL STATUS LIKE 'Questions'")
+        fila = cursor.fetchone()
+        return int(fila[1] if not isinstance(fila, dict) else fila['Value'])
+    finally:
+        cursor.close()
+
+def _rss_pico_mb():
+    # ru_maxrss está en KB en Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+def ejecutar_escenario(app, nombre, iteraciones, concurrencia, datos, semilla):
+    armar, invalidar_cache = ESCENARIOS[nombre]
+    azar = random.Random(semilla)
+    solicitudes = [armar(datos, azar) for _ in range(iteraciones)]
+
+    def enviar(solicitud):
+        metodo, ruta, cuerpo = solicitud
+        if invalidar_cache:
+            cache_reportes.invalidar()
+        cliente = app.test_client()
+        inicio = time.perf_counter()
+        respuesta = cliente.open(ruta, method=metodo, json=cuerpo)
+        respuesta.get_data()
+        return time.perf_counter() - inicio, respuesta.status_code
+
+    # Calentamiento (no se mide)
+    for solicitud in solicitudes[:3]:
+        enviar(solicitud)
+
+    with app.app_context():
+        consultas_antes = _consultas_totales()
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrencia) as ejecutor:
+        resultados = list(ejecutor.map(enviar, solicitudes))
+    duracion = time.perf_counter() - inicio
+
+    with app.app_context():
+        # Se descuenta la propia consulta SHOW GLOBAL STATUS
+        consultas = _consultas_totales() - consultas_antes - 1
+
+    latencias = [segundos * 1000 for segundos, _ in resultados]
+    return {
+        'iteraciones': iteraciones,
+        'concurrencia': concurrencia,
+        'errores': sum(1 for _, estado in resultados if estado >= 400),
+        'p50_ms': round(_percentil(latencias, 50), 2),
+        'p95_ms': round(_percentil(latencias, 95), 2),
+        'p99_ms': round(_percentil(latencias, 99), 2),
+        'max_ms': round(max(latencias), 2),
+        'promedio_ms': round(statistics.mean(latencias), 2),
+        'solicitudes_por_segundo': round(iteraciones / duracion, 2),
+        'consultas_por_solicitud': round(consultas / iteraciones, 2),
+        'rss_pico_mb': _rss_pico_mb()
+    }
+
+def comparar(actual, anterior):
+    """
+    Compara p95 por escenario contra una corrida anterior
+
+    Returns:
+        list: Nombres de escenarios con regresión
+    """
+    regresiones = []
+    for nombre, metricas in actual['escenarios'].items():
+        previo = anterior.get('escenarios', {}).get(nombre)
+        if not previo or not previo['p95_ms']:
+            continue
+        factor = metricas['p95_ms'] / previo['p95_ms']
+        marca = 'REGRESIÓN' if factor > UMBRAL_REGRESION else ''
+        print(f"  {nombre:40s} p95 {previo['p95_ms']:>10.2f} -> {metricas['p95_ms']:>10.2f} ms  x{factor:.2f} {marca}")
+        if marca:
+            regresiones.append(nombre)
+    return regresiones
+
+def _commit_actual():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description='Benchmarks del ERP')
+    parser.add_argument('--escala', choices=sorted(ESCALAS), default='1k')
+    parser.add_argument('--base', default=BASE_BENCHMARKS, help='Base MySQL de benchmarks (exclusiva)')
+    parser.add_argument('--generar', action='store_true', help='Generar los datos sintéticos antes de medir')
+    parser.add_argument('--copiar-esquema-de', metavar='BASE', help='Crear las tablas copiando las de esta base')
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--iteraciones', type=int, default=50)
+    parser.add_argument('--concurrencia', type=int, default=1)
+    parser.add_argument('--escenarios', nargs='*', choices=sorted(ESCENARIOS), help='Por defecto, todos')
+    parser.add_argument('--salida', default=None, help='Archivo JSON de resultados')
+    parser.add_argument('--comparar', metavar='JSON', help='Resultados anteriores contra los que comparar')
+    args = parser.parse_args(argumentos)
+
+    app = create_app()
+    app.config['MYSQL_DB'] = args.base
+    app.config['MYSQL_POOL_MAX'] = max(app.config['MYSQL_POOL_MAX'], args.concurrencia + 2)
+    mysql.pool.max_conexiones = app.config['MYSQL_POOL_MAX']
+    app.testing = True
+
+    with app.app_context():
+        cursor = mysql.connection.cursor()
+        try:
+            if args.copiar_esquema_de:
+                copiar_esquema(cursor, args.copiar_esquema_de)
+            aplicar_migraciones()
+            if args.generar:
+                filas = generar(
+                    mysql.connection, args.escala, args.semilla,
+                    lambda mensaje: print(f'Generando {mensaje}...', file=sys.stderr)
+                )
+                print(f'Filas generadas: {filas}', file=sys.stderr)
+            datos = cargar_datos(cursor)
+        finally:
+            cursor.close()
+
+    resultado = {
+        'fecha': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'commit': _commit_actual(),
+        'escala': args.escala,
+        'semilla': args.semilla,
+        'escenarios': {}
+    }
+
+    for nombre in args.escenarios or ESCENARIOS:
+        print(f'Escenario {nombre}...', file=sys.stderr)
+        resultado['escenarios'][nombre] = ejecutar_escenario(
+            app, nombre, args.iteraciones, args.concurrencia, datos, args.semilla
+        )
+        metricas = resultado['escenarios'][nombre]
+        print(f"  p50 {metricas['p50_ms']} ms  p95 {metricas['p95_ms']} ms  p99 {metricas['p99_ms']} ms  "
+              f"{metricas['solicitudes_por_segundo']} sol/s  {metricas['consultas_por_solicitud']} consultas/sol  "
+              f"errores {metricas['errores']}", file=sys.stderr)
+
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as archivo:
+            json.dump(resultado, archivo, indent=2, ensure_ascii=False)
+    else:
+        print(json.dumps(resultado, indent=2, ensure_ascii=False))
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as archivo:
+            anterior = json.load(archivo)
+        print(f"Comparación contra {args.comparar} ({anterior.get('commit')}):", file=sys.stderr)
+        if comparar(resultado, anterior):
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,60 @@
+"""
+Escenarios de Benchmark
+Cada escenario arma una solicitud HTTP contra la aplicación a partir de los
+ids disponibles en la base de benchmarks
+"""
+
+REPORTES = [
+    'stock-critico',
+    'prediccion-demanda',
+    'prediccion-agotamiento',
+    'sobrestock',
+    'rotacion-productos',
+    'resumen-general'
+]
+
+def cargar_datos(cursor):
+    """
+    Ids de clientes y productos con stock holgado (para facturar sin quedarse sin stock)
+
+    Returns:
+        dict: {'clientes': [ids], 'productos': [(id, precio_venta)]}
+    """
+    cursor.execute("SELECT id FROM clientes ORDER BY id LIMIT 10000")
+    clientes = [fila[0] for fila in cursor.fetchall()]
+    cursor.execute("""
+        SELECT id, precio_venta FROM productos
+        WHERE activo = 1 AND stock_actual >= 500
+        ORDER BY id LIMIT 10000
+    """)
+    productos = [(fila[0], float(fila[1])) for fila in cursor.fetchall()]
+    return {'clientes': clientes, 'productos': productos}
+
+def _crear_factura(datos, azar):
+    elegidos = azar.sample(datos['productos'], k=min(3, len(datos['productos'])))
+    return 'POST', '/facturas', {
+        'cliente_id': azar.choice(datos['clientes']),
+        'productos': [
+            {'producto_id': producto_id, 'cantidad': 1, 'precio_unitario': precio}
+            for producto_id, precio in elegidos
+        ]
+    }
+
+def _get(ruta):
+    return lambda datos, azar: ('GET', ruta, None)
+
+# nombre -> (armar_solicitud(datos, azar), invalidar_cache_antes)
+ESCENARIOS = {
+    'crear_factura': (_crear_factura, False),
+    'listar_productos_pagina': (_get('/productos?limit=100'), False),
+    'listar_productos_completo': (_get('/productos'), False),
+    'listar_facturas_pagina': (_get('/facturas?limit=100'), False),
+    'listar_facturas': (_get('/facturas'), False),
+    'listar_entradas': (_get('/entradas-stock'), False),
+    'listar_clientes': (_get('/clientes'), False),
+    **{
+        f'reporte_{reporte}': (_get(f'/reportes/{reporte}'), True)
+        for reporte in REPORTES
+    },
+    'reporte_resumen-general_con_cache': (_get('/reportes/resumen-general'), False),
+}
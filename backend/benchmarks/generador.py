@@ -0,0 +1,171 @@
+"""
+Generador de Datos Sintéticos del ERP
+Llena una base de benchmarks con categorías, proveedores, productos, clientes,
+facturas con sus líneas, entradas de stock y demanda histórica. Con la misma
+escala y semilla genera siempre los mismos datos.
+"""
+
+import random
+from datetime import datetime, timedelta
+
+from app.services.ventas_diarias_service import VentasDiariasService
+
+ESCALAS = {
+    '1k': {'facturas': 1000, 'productos': 200, 'clientes': 100, 'categorias': 10, 'proveedores': 10},
+    '100k': {'facturas': 100000, 'productos': 5000, 'clientes': 10000, 'categorias': 40, 'proveedores': 100},
+    '1m': {'facturas': 1000000, 'productos': 20000, 'clientes': 50000, 'categorias': 100, 'proveedores': 300},
+}
+
+# Filas por executemany
+TAMANO_LOTE_INSERCION = 5000
+
+# Días hacia atrás que abarcan las ventas y entradas generadas
+DIAS_HISTORIAL = 180
+
+# Tablas que se copian de la base de origen (el repositorio no trae el esquema)
+TABLAS_ESQUEMA = [
+    'roles', 'usuarios', 'categorias', 'proveedores', 'productos', 'clientes',
+    'facturas', 'detalle_factura', 'entrada_stock', 'demanda_historica'
+]
+
+def copiar_esquema(cursor, base_origen):
+    """Crea en la base actual las tablas de la base de la aplicación (CREATE TABLE ... LIKE)"""
+    for tabla in TABLAS_ESQUEMA:
+        cursor.execute(f"CREATE TABLE IF NOT EXISTS {tabla} LIKE `{base_origen}`.{tabla}")
+
+def _insertar(cursor, query, filas):
+    for inicio in range(0, len(filas), TAMANO_LOTE_INSERCION):
+        cursor.executemany(query, filas[inicio:inicio + TAMANO_LOTE_INSERCION])
+
+def _primer_id(cursor, tabla):
+    """Siguiente id libre; los ids se insertan explícitos para poder referenciarlos"""
+    cursor.execute(f"SELECT COALESCE(MAX(id), 0) FROM {tabla}")
+    fila = cursor.fetchone()
+    return (fila[0] if not isinstance(fila, dict) else list(fila.values())[0]) + 1
+
+def generar(conexion, escala='1k', semilla=42, al_avanzar=None):
+    """
+    Inserta un juego de datos completo en la base de la conexión
+
+    Args:
+        conexion: Conexión MySQL (se confirma por tablas)
+        escala: Clave de ESCALAS
+        semilla: Semilla del generador pseudoaleatorio
+        al_avanzar: Función opcional (mensaje) para informar el progreso
+
+    Returns:
+        dict: Cantidad de filas generadas por tabla
+    """
+    tamanos = ESCALAS[escala]
+    azar = random.Random(semilla)
+    avisar = al_avanzar or (lambda mensaje: None)
+    hoy = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    cursor = conexion.cursor()
+    generadas = {}
+
+    try:
+        avisar('usuario de benchmarks')
+        id_rol = _primer_id(cursor, 'roles')
+        cursor.execute("INSERT INTO roles (id, nombre) VALUES (%s, %s)", (id_rol, 'bench'))
+        id_usuario = _primer_id(cursor, 'usuarios')
+        cursor.execute(
+            "INSERT INTO usuarios (id, nombre, email, contraseña, rol_id) VALUES (%s, %s, %s, %s, %s)",
+            (id_usuario, f'bench{id_usuario}', f'bench{id_usuario}@bench.local', 'bench', id_rol)
+        )
+        conexion.commit()
+
+        avisar('categorías y proveedores')
+        id_categoria = _primer_id(cursor, 'categorias')
+        _insertar(cursor, "INSERT INTO categorias (id, nombre, descripcion) VALUES (%s, %s, %s)", [
+            (id_categoria + i, f'Categoría {i}', f'Categoría sintética {i}') for i in range(tamanos['categorias'])
+        ])
+        id_proveedor = _primer_id(cursor, 'proveedores')
+        _insertar(cursor, "INSERT INTO proveedores (id, nombre, contacto, telefono, email, direccion) VALUES (%s, %s, %s, %s, %s, %s)", [
+            (id_proveedor + i, f'Proveedor {i}', f'Contacto {i}', f'11{i:08d}', f'proveedor{i}@bench.local', f'Calle {i}')
+            for i in range(tamanos['proveedores'])
+        ])
+        conexion.commit()
+
+        avisar('productos')
+        id_producto = _primer_id(cursor, 'productos')
+        productos = []
+        for i in range(tamanos['productos']):
+            precio_compra = round(azar.uniform(1, 500), 2)
+            productos.append((
+                id_producto + i, f'Producto {i:07d}', f'Producto sintético {i}', precio_compra,
+                round(precio_compra * azar.uniform(1.1, 1.8), 2),
+                azar.randint(0, 2000), azar.randint(5, 100),
+                id_categoria + azar.randrange(tamanos['categorias']),
+                id_proveedor + azar.randrange(tamanos['proveedores'])
+            ))
+        _insertar(cursor, """
+            INSERT INTO productos (id, nombre, descripcion, precio_compra, precio_venta,
+                                   stock_actual, stock_minimo, categoria_id, proveedor_id)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """, productos)
+        precios = [producto[4] for producto in productos]
+        conexion.commit()
+
+        avisar('clientes')
+        id_cliente = _primer_id(cursor, 'clientes')
+        _insertar(cursor, "INSERT INTO clientes (id, nombre, dni, telefono, email) VALUES (%s, %s, %s, %s, %s)", [
+            (id_cliente + i, f'Cliente {i}', f'{30000000 + i}', f'15{i:08d}', f'cliente{i}@bench.local')
+            for i in range(tamanos['clientes'])
+        ])
+        conexion.commit()
+
+        # Popularidad desigual: pocos productos concentran la mayoría de las ventas
+        pesos = [1 / (rango + 1) for rango in range(tamanos['productos'])]
+
+        avisar('facturas, líneas y demanda histórica')
+        id_factura = _primer_id(cursor, 'facturas')
+        lineas_totales = 0
+        for inicio in range(0, tamanos['facturas'], TAMANO_LOTE_INSERCION):
+            facturas, detalles, demanda = [], [], []
+            for numero in range(inicio, min(inicio + TAMANO_LOTE_INSERCION, tamanos['facturas'])):
+                fecha = hoy - timedelta(days=azar.randrange(DIAS_HISTORIAL)) + timedelta(seconds=azar.randrange(86400))
+                elegidos = set(azar.choices(range(tamanos['productos']), weights=pesos, k=azar.randint(1, 5)))
+                total = 0
+                for indice in elegidos:
+                    cantidad = azar.randint(1, 10)
+                    total += cantidad * precios[indice]
+                    detalles.append((id_factura + numero, id_producto + indice, cantidad, precios[indice]))
+                    demanda.append((id_producto + indice, fecha, cantidad))
+                facturas.append((id_factura + numero, id_cliente + azar.randrange(tamanos['clientes']), fecha, round(total, 2)))
+
+            _insertar(cursor, "INSERT INTO facturas (id, cliente_id, fecha, total) VALUES (%s, %s, %s, %s)", facturas)
+            _insertar(cursor, "INSERT INTO detalle_factura (factura_id, producto_id, cantidad, precio_unitario) VALUES (%s, %s, %s, %s)", detalles)
+            _insertar(cursor, "INSERT INTO demanda_historica (producto_id, fecha, cantidad_vendida) VALUES (%s, %s, %s)", demanda)
+            conexion.commit()
+            lineas_totales += len(detalles)
+
+        avisar('entradas de stock')
+        entradas = []
+        for _ in range(tamanos['facturas'] // 10):
+            indice = azar.randrange(tamanos['productos'])
+            entradas.append((
+                id_producto + indice, productos[indice][8], id_usuario, azar.randint(10, 500),
+                productos[indice][3], precios[indice], hoy - timedelta(days=azar.randrange(DIAS_HISTORIAL))
+            ))
+        _insertar(cursor, """
+            INSERT INTO entrada_stock (producto_id, proveedor_id, usuario_id, cantidad, precio_compra, precio_venta, fecha)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+        """, entradas)
+        conexion.commit()
+
+        generadas = {
+            'categorias': tamanos['categorias'],
+            'proveedores': tamanos['proveedores'],
+            'productos': tamanos['productos'],
+            'clientes': tamanos['clientes'],
+            'facturas': tamanos['facturas'],
+            'detalle_factura': lineas_totales,
+            'demanda_historica': lineas_totales,
+            'entrada_stock': len(entradas)
+        }
+    finally:
+        cursor.close()
+
+    avisar('resumen de ventas diarias')
+    generadas['ventas_diarias_producto'] = VentasDiariasService.reconstruir()
+    return generadas
@@ -0,0 +1,54 @@
+"""
+Las versiones matriciales de los algoritmos deben dar, producto por producto,
+lo mismo que las funciones originales sobre la lista de ventas
+"""
+
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.ia.algoritmos import (
+    calcular_promedio_movil,
+    predecir_demanda_futura,
+    predecir_demanda_catalogo
+)
+
+def _ventas_de_prueba(semilla=7, productos=40, dias=90):
+    """Ventas con días salteados, productos con pocos datos y tendencias mezcladas"""
+    generador = np.random.default_rng(semilla)
+    inicio = date(2024, 1, 1)
+    filas = []
+    for producto_id in range(1, productos + 1):
+        dias_con_ventas = generador.integers(1, dias + 1)
+        for dia in sorted(generador.choice(dias, size=dias_con_ventas, replace=False)):
+            base = 5 + (producto_id % 3 - 1) * dia / 15
+            filas.append({
+                'producto_id': producto_id,
+                'fecha': (inicio + timedelta(days=int(dia))).strftime('%Y-%m-%d'),
+                'cantidad': max(1, int(base + generador.integers(0, 4)))
+            })
+    return pd.DataFrame(filas, columns=['producto_id', 'fecha', 'cantidad'])
+
+@pytest.mark.parametrize('ventana_dias, dias_prediccion', [(30, 30), (7, 14), (120, 1)])
+def test_catalogo_coincide_con_las_funciones_por_producto(ventana_dias, dias_prediccion):
+    ventas_df = _ventas_de_prueba()
+
+    catalogo = predecir_demanda_catalogo(ventas_df, ventana_dias, dias_prediccion)
+
+    assert sorted(catalogo.index) == sorted(ventas_df['producto_id'].unique())
+    for producto_id, ventas in ventas_df.groupby('producto_id'):
+        ventas_data = ventas[['fecha', 'cantidad']].to_dict('records')
+        esperado = predecir_demanda_futura(ventas_data, dias_prediccion)
+        fila = catalogo.loc[producto_id]
+
+        assert fila['promedio_diario'] == pytest.approx(calcular_promedio_movil(ventas_data, ventana_dias))
+        assert fila['demanda_estimada'] == pytest.approx(esperado['demanda_estimada'])
+        assert fila['tendencia'] == esperado['tendencia']
+        assert fila['confianza'] == esperado['confianza']
+
+def test_catalogo_vacio():
+    vacio = pd.DataFrame(columns=['producto_id', 'fecha', 'cantidad'])
+
+    assert predecir_demanda_catalogo(vacio).empty
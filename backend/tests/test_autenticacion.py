@@ -0,0 +1,90 @@
+import pytest
+
+from app.services import autenticacion as modulo
+from app.services.autenticacion import LimitadorIntentos, RetardoExponencial
+
+class Reloj:
+    """Reemplazo de time.monotonic que avanza solo cuando se le pide"""
+
+    def __init__(self):
+        self.ahora = 1000.0
+
+    def __call__(self):
+        return self.ahora
+
+@pytest.fixture
+def reloj(monkeypatch):
+    reloj = Reloj()
+    monkeypatch.setattr(modulo.time, 'monotonic', reloj)
+    return reloj
+
+def test_retardo_libre_hasta_el_limite_y_luego_exponencial(reloj):
+    retardo = RetardoExponencial(libres=3, espera_maxima=8, olvido_segundos=3600)
+
+    for _ in range(2):
+        retardo.registrar('ana')
+    assert retardo.espera('ana') == 0
+
+    esperas = []
+    for _ in range(6):
+        retardo.registrar('ana')
+        esperas.append(retardo.espera('ana'))
+    # 1, 2, 4, 8 segundos y luego el tope (más el segundo de redondeo hacia arriba)
+    assert esperas == [2, 3, 5, 9, 9, 9]
+
+def test_retardo_se_cumple_y_se_olvida(reloj):
+    retardo = RetardoExponencial(libres=2, espera_maxima=900, olvido_segundos=60)
+    retardo.registrar('ana')
+    retardo.registrar('ana')
+    assert retardo.espera('ana') > 0
+
+    reloj.ahora += 2.5
+    assert retardo.espera('ana') == 0
+
+    # Sin fallos por más de olvido_segundos vuelve a empezar de cero
+    reloj.ahora += 61
+    retardo.registrar('ana')
+    assert retardo.espera('ana') == 0
+
+def test_retardo_por_clave_y_limpiar(reloj):
+    retardo = RetardoExponencial(libres=1, espera_maxima=900, olvido_segundos=3600)
+    retardo.registrar('ana')
+    retardo.registrar('ana')
+
+    assert retardo.espera('ana') > 0
+    assert retardo.espera('beto') == 0
+
+    retardo.limpiar('ana')
+    assert retardo.espera('ana') == 0
+
+def test_retardo_descarta_claves_vencidas_al_llenarse(reloj):
+    retardo = RetardoExponencial(libres=1, espera_maxima=900, olvido_segundos=60, max_claves=2)
+    retardo.registrar('ana')
+    retardo.registrar('beto')
+    reloj.ahora += 61
+    retardo.registrar('carla')
+
+    assert set(retardo._fallos) == {'carla'}
+
+def test_limitador_ventana_deslizante(reloj):
+    limitador = LimitadorIntentos(maximo=3, ventana_segundos=60)
+    for segundo in (0, 10, 20):
+        reloj.ahora = 1000.0 + segundo
+        limitador.registrar('10.0.0.1')
+
+    assert limitador.espera('10.0.0.1') == 41
+    assert limitador.espera('10.0.0.2') == 0
+
+    # El primer intento sale de la ventana a los 60 segundos
+    reloj.ahora = 1060.0
+    assert limitador.espera('10.0.0.1') == 0
+    limitador.registrar('10.0.0.1')
+    assert limitador.espera('10.0.0.1') == 11
+
+def test_limitador_limpiar(reloj):
+    limitador = LimitadorIntentos(maximo=1, ventana_segundos=60)
+    limitador.registrar('10.0.0.1')
+    assert limitador.espera('10.0.0.1') > 0
+
+    limitador.limpiar('10.0.0.1')
+    assert limitador.espera('10.0.0.1') == 0
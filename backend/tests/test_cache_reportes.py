@@ -0,0 +1,136 @@
+import threading
+
+import pytest
+
+from app.services import cache_reportes as modulo
+from app.services.cache_reportes import CacheReportes
+
+class Reloj:
+    """Reemplazo de time.monotonic que avanza solo cuando se le pide"""
+
+    def __init__(self):
+        self.ahora = 1000.0
+
+    def __call__(self):
+        return self.ahora
+
+@pytest.fixture
+def reloj(monkeypatch):
+    reloj = Reloj()
+    monkeypatch.setattr(modulo.time, 'monotonic', reloj)
+    return reloj
+
+def test_guarda_hasta_que_vence_el_ttl(reloj):
+    cache = CacheReportes(ttl_segundos=60)
+    llamadas = []
+
+    def calcular():
+        llamadas.append(1)
+        return len(llamadas)
+
+    assert cache.obtener('stock', calcular) == 1
+    reloj.ahora += 59
+    assert cache.obtener('stock', calcular) == 1
+    reloj.ahora += 2
+    assert cache.obtener('stock', calcular) == 2
+    assert cache.estadisticas()['aciertos'] == 1
+
+def test_los_parametros_son_parte_de_la_clave(reloj):
+    cache = CacheReportes()
+
+    assert cache.obtener('ventas', lambda: 'a', dias=7) == 'a'
+    assert cache.obtener('ventas', lambda: 'b', dias=30) == 'b'
+    assert cache.obtener('ventas', lambda: 'c', dias=7) == 'a'
+
+def test_descarta_la_entrada_usada_hace_mas_tiempo(reloj):
+    cache = CacheReportes(max_entradas=2)
+    cache.obtener('a', lambda: 'a1')
+    cache.obtener('b', lambda: 'b1')
+    cache.obtener('a', lambda: 'a2')      # 'a' pasa a ser la más reciente
+    cache.obtener('c', lambda: 'c1')      # desplaza a 'b'
+
+    assert cache.obtener('a', lambda: 'a3') == 'a1'
+    assert cache.obtener('b', lambda: 'b2') == 'b2'
+    assert cache.estadisticas()['entradas'] == 2
+
+def test_no_guarda_resultados_invalidos_ni_errores(reloj):
+    cache = CacheReportes()
+
+    cache.obtener('r', lambda: {'success': False}, es_valido=lambda r: r['success'])
+    assert cache.obtener('r', lambda: {'success': True}) == {'success': True}
+
+    def fallar():
+        raise RuntimeError('sin conexión')
+
+    with pytest.raises(RuntimeError):
+        cache.obtener('x', fallar)
+    assert cache.obtener('x', lambda: 'ok') == 'ok'
+
+def test_invalidar_durante_el_calculo_no_guarda_el_resultado_viejo(reloj):
+    cache = CacheReportes()
+
+    def calcular_e_invalidar():
+        cache.invalidar()
+        return 'viejo'
+
+    assert cache.obtener('r', calcular_e_invalidar) == 'viejo'
+    assert cache.obtener('r', lambda: 'nuevo') == 'nuevo'
+
+def test_pedidos_simultaneos_calculan_una_sola_vez():
+    cache = CacheReportes()
+    calculando = threading.Event()
+    liberar = threading.Event()
+    llamadas = []
+
+    def calcular():
+        llamadas.append(1)
+        calculando.set()
+        liberar.wait(5)
+        return 'reporte'
+
+    resultados = []
+    hilos = [threading.Thread(target=lambda: resultados.append(cache.obtener('r', calcular)))
+             for _ in range(5)]
+    hilos[0].start()
+    calculando.wait(5)
+    for hilo in hilos[1:]:
+        hilo.start()
+    while cache.estadisticas()['coalescidos'] < 4:
+        threading.Event().wait(0.01)
+    liberar.set()
+    for hilo in hilos:
+        hilo.join(5)
+
+    assert llamadas == [1]
+    assert resultados == ['reporte'] * 5
+
+def test_los_que_esperan_reciben_el_error_del_calculo():
+    cache = CacheReportes()
+    calculando = threading.Event()
+    liberar = threading.Event()
+
+    def fallar():
+        calculando.set()
+        liberar.wait(5)
+        raise ValueError('falló')
+
+    errores = []
+
+    def esperar():
+        try:
+            cache.obtener('r', lambda: 'no debería calcular')
+        except ValueError as e:
+            errores.append(str(e))
+
+    lider = threading.Thread(target=lambda: pytest.raises(ValueError, cache.obtener, 'r', fallar))
+    lider.start()
+    calculando.wait(5)
+    seguidor = threading.Thread(target=esperar)
+    seguidor.start()
+    while cache.estadisticas()['coalescidos'] < 1:
+        threading.Event().wait(0.01)
+    liberar.set()
+    lider.join(5)
+    seguidor.join(5)
+
+    assert errores == ['falló']
@@ -0,0 +1,98 @@
+import json
+import sqlite3
+import threading
+import time
+
+import pytest
+from flask import Flask
+
+from app.services.cola_trabajos import ColaTrabajos, ErrorTrabajo
+
+def esperar(condicion, segundos=5):
+    limite = time.monotonic() + segundos
+    while time.monotonic() < limite:
+        valor = condicion()
+        if valor:
+            return valor
+        time.sleep(0.02)
+    raise AssertionError('La condición no se cumplió a tiempo')
+
+@pytest.fixture
+def liberar():
+    evento = threading.Event()
+    yield evento
+    evento.set()
+
+@pytest.fixture
+def cola(tmp_path, liberar):
+    app = Flask(__name__)
+    app.config['REPORTES_TRABAJOS_DB'] = str(tmp_path / 'trabajos.sqlite3')
+    cola = ColaTrabajos(intervalo_sondeo=0.05)
+    cola.init_app(app)
+
+    def lento(producto_id=None):
+        liberar.wait(5)
+        return {'success': True, 'producto_id': producto_id}
+
+    def con_avance(avance):
+        avance(0.5)
+        liberar.wait(5)
+        return {'success': True}
+
+    cola.registrar('lento', lento, ['producto_id'])
+    cola.registrar('con-avance', con_avance, con_avance=True)
+    return cola
+
+def test_tipo_o_parametros_desconocidos(cola):
+    with pytest.raises(ErrorTrabajo):
+        cola.enviar('no-existe')
+    with pytest.raises(ErrorTrabajo):
+        cola.enviar('lento', {'otro': 1})
+
+def test_un_envio_igual_devuelve_el_trabajo_activo(cola, liberar):
+    primero, es_nuevo = cola.enviar('lento', {'producto_id': 1})
+    repetido, repetido_es_nuevo = cola.enviar('lento', {'producto_id': 1})
+    otro, otro_es_nuevo = cola.enviar('lento', {'producto_id': 2})
+
+    assert es_nuevo and not repetido_es_nuevo and otro_es_nuevo
+    assert repetido['id'] == primero['id']
+    assert otro['id'] != primero['id']
+
+    liberar.set()
+    terminado = esperar(lambda: (t := cola.obtener(primero['id'], incluir_resultado=True))
+                        and t['estado'] == 'completado' and t)
+    assert terminado['progreso'] == 100
+    assert json.loads(terminado['resultado'])['producto_id'] == 1
+
+    # Terminado el trabajo, el mismo envío crea uno nuevo
+    nuevo, nuevo_es_nuevo = cola.enviar('lento', {'producto_id': 1})
+    assert nuevo_es_nuevo and nuevo['id'] != primero['id']
+
+def test_un_trabajo_sin_latido_se_da_por_fallido(cola):
+    trabajo, _ = cola.enviar('lento', {'producto_id': 1})
+    esperar(lambda: cola.obtener(trabajo['id'])['estado'] == 'en_curso')
+
+    # Simula un worker que murió hace rato sin terminar el trabajo
+    conexion = sqlite3.connect(cola.ruta_db)
+    conexion.execute(
+        "UPDATE trabajos SET actualizado_en = ? WHERE id = ?",
+        (time.time() - cola.vencimiento_segundos - 1, trabajo['id'])
+    )
+    conexion.commit()
+    conexion.close()
+
+    nuevo, es_nuevo = cola.enviar('lento', {'producto_id': 1})
+
+    huerfano = cola.obtener(trabajo['id'])
+    assert huerfano['estado'] == 'fallido'
+    assert huerfano['error']
+    assert es_nuevo and nuevo['id'] != trabajo['id']
+
+def test_el_progreso_refleja_el_avance_informado(cola, liberar):
+    trabajo, _ = cola.enviar('con-avance')
+    assert trabajo['progreso'] == 0
+
+    esperar(lambda: cola.obtener(trabajo['id'])['progreso'] == 50)
+    liberar.set()
+    terminado = esperar(lambda: (t := cola.obtener(trabajo['id'])) and t['estado'] == 'completado' and t)
+    assert terminado['progreso'] == 100
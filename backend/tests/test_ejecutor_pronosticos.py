@@ -0,0 +1,47 @@
+"""
+El cálculo repartido entre procesos debe dar lo mismo que el de un solo proceso
+"""
+
+from datetime import date, timedelta
+
+import pandas as pd
+import pytest
+
+from app.ia import ejecutor_pronosticos
+from app.ia.algoritmos import predecir_demanda_catalogo
+
+@pytest.fixture
+def ventas_df():
+    inicio = date(2024, 1, 1)
+    filas = [
+        {
+            'producto_id': producto_id,
+            'fecha': (inicio + timedelta(days=dia)).strftime('%Y-%m-%d'),
+            'cantidad': 1 + (producto_id * dia) % 7
+        }
+        for producto_id in range(1, 26)
+        for dia in range(0, 60, 1 + producto_id % 4)
+    ]
+    return pd.DataFrame(filas, columns=['producto_id', 'fecha', 'cantidad'])
+
+@pytest.fixture
+def pool_de_dos_procesos(monkeypatch):
+    monkeypatch.setattr(ejecutor_pronosticos, 'procesos_maximos', 2)
+    yield
+    ejecutor_pronosticos.cerrar_ejecutor()
+
+def test_particiones_en_paralelo_coinciden_con_un_solo_proceso(ventas_df, pool_de_dos_procesos):
+    esperado = predecir_demanda_catalogo(ventas_df)
+
+    resultado = ejecutor_pronosticos.predecir_catalogo_en_paralelo(
+        ventas_df, procesos=2, filas_por_particion=7
+    )
+
+    pd.testing.assert_frame_equal(resultado, esperado, check_dtype=False)
+
+def test_catalogo_chico_se_calcula_en_el_mismo_proceso(ventas_df, monkeypatch):
+    monkeypatch.setattr(ejecutor_pronosticos, '_obtener_ejecutor', lambda: pytest.fail('usó el pool'))
+
+    resultado = ejecutor_pronosticos.predecir_catalogo_en_paralelo(ventas_df, procesos=4)
+
+    pd.testing.assert_frame_equal(resultado, predecir_demanda_catalogo(ventas_df), check_dtype=False)
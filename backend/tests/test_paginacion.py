@@ -0,0 +1,47 @@
+import pytest
+from flask import Flask
+
+from app.routes.paginacion import (
+    LIMITE_MAXIMO,
+    LIMITE_POR_DEFECTO,
+    ajustar_limite,
+    codificar_cursor,
+    decodificar_cursor,
+    parametro_entero
+)
+
+@pytest.mark.parametrize('pedido, esperado', [
+    (None, LIMITE_POR_DEFECTO),
+    (0, LIMITE_POR_DEFECTO),
+    (-5, 1),
+    (50, 50),
+    (LIMITE_MAXIMO + 1, LIMITE_MAXIMO),
+])
+def test_ajustar_limite(pedido, esperado):
+    assert ajustar_limite(pedido) == esperado
+
+@pytest.mark.parametrize('valores', [
+    ['Yerba 1kg', 42],
+    ['2024-05-01 10:00:00', 7],
+    ['Café con ñandú & más', 3],
+])
+def test_cursor_ida_y_vuelta(valores):
+    cursor = codificar_cursor(valores)
+
+    assert decodificar_cursor(cursor) == valores
+    assert set(cursor) <= set('ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_=')
+
+@pytest.mark.parametrize('texto', ['no-es-base64!', codificar_cursor(['x'])[:-3], ''])
+def test_cursor_invalido(texto):
+    with pytest.raises(ValueError, match='inválido'):
+        decodificar_cursor(texto)
+
+def test_parametro_entero():
+    app = Flask(__name__)
+
+    with app.test_request_context('/?limit=25&vacio=&texto=abc'):
+        assert parametro_entero('limit') == 25
+        assert parametro_entero('vacio') is None
+        assert parametro_entero('falta') is None
+        with pytest.raises(ValueError, match="'texto'"):
+            parametro_entero('texto')
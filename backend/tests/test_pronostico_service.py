@@ -0,0 +1,194 @@
+"""
+materializar de punta a punta contra una base en memoria que responde como
+MySQLdb: con cursores de tuplas (los del pool) y también con DictCursor
+"""
+
+import re
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from app.database import MySQL
+from app.services.pronostico_service import PronosticoService
+
+def _columnas(query):
+    """Nombres de las columnas de un SELECT simple (alias o último identificador)"""
+    lista = re.search(r'SELECT\s+(?:DISTINCT\s+)?(.*?)\s+FROM\s', query, re.S | re.I).group(1)
+    return [re.split(r'\s+as\s+|\.', columna.strip(), flags=re.I)[-1] for columna in lista.split(',')]
+
+class BaseFalsa:
+    """Tablas en memoria y las sentencias que usa materializar"""
+
+    def __init__(self, productos, ventas):
+        self.tablas = {
+            'productos': productos,
+            'ventas_diarias_producto': ventas,
+            'categorias': [{'id': 1, 'nombre': 'Bebidas'}],
+            'proveedores': [{'id': 1, 'nombre': 'Proveedor Uno'}],
+            'roles': [],
+            'dimensiones_version': [],
+            'pronosticos_corridas': [],
+            'pronosticos_producto': [],
+            'facturados': []
+        }
+
+    def seleccionar(self, query, parametros):
+        if 'GET_LOCK' in query:
+            return ['obtenido'], [{'obtenido': 1}]
+        if 'RELEASE_LOCK' in query:
+            return ['liberado'], [{'liberado': 1}]
+        columnas = _columnas(query)
+        if 'FROM ventas_diarias_producto' in query:
+            ids = set(parametros[:-1])
+            filas = [venta for venta in self.tablas['ventas_diarias_producto'] if venta['producto_id'] in ids]
+        elif 'FROM productos' in query:
+            filas = [producto for producto in self.tablas['productos'] if producto['activo']]
+        elif 'FROM pronosticos_corridas' in query:
+            filas = sorted(
+                (corrida for corrida in self.tablas['pronosticos_corridas'] if corrida['estado'] == 'completa'),
+                key=lambda corrida: -corrida['id']
+            )
+            filas = filas[parametros[0]:parametros[0] + 1] if 'OFFSET' in query else filas[:1]
+        elif 'FROM facturas' in query:
+            filas = self.tablas['facturados']
+        else:
+            filas = self.tablas[re.search(r'FROM\s+(\w+)', query).group(1)]
+        return columnas, filas
+
+    def modificar(self, query, parametros):
+        """Devuelve lastrowid"""
+        if query.lstrip().startswith('INSERT INTO pronosticos_corridas'):
+            corrida_id = len(self.tablas['pronosticos_corridas']) + 1
+            self.tablas['pronosticos_corridas'].append({
+                'id': corrida_id, 'tipo': parametros[0], 'estado': 'en_curso',
+                'fecha_inicio': datetime.now(), 'productos_calculados': 0
+            })
+            return corrida_id
+        if query.lstrip().startswith('UPDATE pronosticos_corridas'):
+            estado = 'completa' if "'completa'" in query else 'fallida'
+            for corrida in self.tablas['pronosticos_corridas']:
+                if corrida['id'] == parametros[-1]:
+                    corrida['estado'] = estado
+        return 0
+
+class CursorFalso:
+
+    def __init__(self, base, como_dict):
+        self.base = base
+        self.como_dict = como_dict
+        self.description = None
+        self.lastrowid = 0
+        self.rowcount = 0
+        self._filas = []
+
+    def execute(self, query, parametros=()):
+        parametros = tuple(parametros or ())
+        if query.lstrip().upper().startswith('SELECT'):
+            columnas, filas = self.base.seleccionar(query, parametros)
+            self.description = tuple((columna, None, None, None, None, None, None) for columna in columnas)
+            self._filas = [
+                {columna: fila.get(columna) for columna in columnas} if self.como_dict
+                else tuple(fila.get(columna) for columna in columnas)
+                for fila in filas
+            ]
+        else:
+            self.description = None
+            self._filas = []
+            self.lastrowid = self.base.modificar(query, parametros)
+        self.rowcount = len(self._filas)
+
+    def executemany(self, query, filas):
+        filas = list(filas)
+        if 'INSERT INTO pronosticos_producto' in query:
+            columnas = ['corrida_id', 'producto_id', 'promedio_diario', 'demanda_estimada',
+                        'tendencia', 'confianza', 'promedio_diario_30']
+            self.base.tablas['pronosticos_producto'].extend(dict(zip(columnas, fila)) for fila in filas)
+        self.rowcount = len(filas)
+
+    def fetchall(self):
+        filas, self._filas = self._filas, []
+        return tuple(filas)
+
+    def fetchone(self):
+        return self._filas.pop(0) if self._filas else None
+
+    def close(self):
+        pass
+
+class ConexionFalsa:
+
+    def __init__(self, base, como_dict):
+        self.base = base
+        self.como_dict = como_dict
+        self.commits = 0
+
+    def cursor(self):
+        return CursorFalso(self.base, self.como_dict)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+def _producto(producto_id, activo=1):
+    return {
+        'id': producto_id, 'nombre': f'Producto {producto_id}', 'activo': activo,
+        'stock_actual': 50, 'stock_minimo': 5, 'precio_compra': 10.0, 'precio_venta': 15.0,
+        'categoria_id': 1, 'proveedor_id': 1,
+        'categoria_nombre': 'Bebidas', 'proveedor_nombre': 'Proveedor Uno'
+    }
+
+@pytest.fixture(params=[False, True], ids=['tuplas', 'dict'])
+def base(request, monkeypatch):
+    hoy = date.today()
+    ventas = [
+        {'producto_id': producto_id, 'fecha': hoy - timedelta(days=dia), 'cantidad': producto_id + dia % 3}
+        for producto_id in (1, 2)
+        for dia in range(1, 41)
+    ] + [
+        # Pocos días con ventas: pronóstico con datos insuficientes
+        {'producto_id': 3, 'fecha': hoy - timedelta(days=dia), 'cantidad': 2}
+        for dia in (2, 5)
+    ]
+    base = BaseFalsa([_producto(1), _producto(2), _producto(3), _producto(4), _producto(5, activo=0)], ventas)
+    monkeypatch.setattr(MySQL, 'connection', ConexionFalsa(base, como_dict=request.param))
+    return base
+
+def test_materializar_guarda_un_pronostico_por_producto_con_ventas(base):
+    corrida = PronosticoService.materializar(procesos=1)
+
+    assert corrida['tipo'] == 'completa'
+    assert corrida['productos_calculados'] == 3
+    assert base.tablas['pronosticos_corridas'][0]['estado'] == 'completa'
+
+    guardados = {fila['producto_id']: fila for fila in base.tablas['pronosticos_producto']}
+    assert set(guardados) == {1, 2, 3}
+    assert all(fila['corrida_id'] == corrida['corrida_id'] for fila in guardados.values())
+    assert guardados[1]['confianza'] == 'Alta'
+    assert guardados[1]['demanda_estimada'] > 0
+    assert guardados[3]['tendencia'] == 'Datos insuficientes'
+    assert guardados[3]['demanda_estimada'] == 0
+
+def test_materializar_parcial_sin_ventas_nuevas_reutiliza_la_corrida(base):
+    completa = PronosticoService.materializar(procesos=1)
+
+    parcial = PronosticoService.materializar(parcial=True, procesos=1)
+
+    assert parcial['corrida_id'] == completa['corrida_id']
+    assert parcial['tipo'] == 'parcial'
+    assert parcial['productos_calculados'] == 0
+    assert len(base.tablas['pronosticos_corridas']) == 1
+
+def test_materializar_devuelve_none_si_otro_worker_tiene_el_bloqueo(base, monkeypatch):
+    seleccionar = base.seleccionar
+
+    def sin_bloqueo(query, parametros):
+        if 'GET_LOCK' in query:
+            return ['obtenido'], [{'obtenido': 0}]
+        return seleccionar(query, parametros)
+
+    monkeypatch.setattr(base, 'seleccionar', sin_bloqueo)
+
+    assert PronosticoService.materializar(procesos=1) is None
+    assert base.tablas['pronosticos_corridas'] == []
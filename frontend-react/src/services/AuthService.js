@@ -6,10 +6,32 @@ const AuthService = {
   login: async (nombre, password) => {
     try {
       const res = await axios.post(`${API_URL}/login`, { nombre, password });
+      if (res.data.token) {
+        localStorage.setItem('token', res.data.token);
+      }
       return res.data;
     } catch (err) {
+      if (err.response && err.response.data && err.response.data.message) {
+        return err.response.data;
+      }
       return { success: false, message: 'Error de red o servidor' };
     }
+  },
+  // Usuario de la sesión guardada (el backend valida el token sin consultar la BD)
+  sesion: async () => {
+    const token = localStorage.getItem('token');
+    if (!token) {
+      return { success: false };
+    }
+    try {
+      const res = await axios.get(`${API_URL}/sesion`, {
+        headers: { Authorization: `Bearer ${token}` }
+      });
+      return res.data;
+    } catch (err) {
+      localStorage.removeItem('token');
+      return { success: false };
+    }
   }
 };
 
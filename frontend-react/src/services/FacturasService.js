@@ -11,6 +11,15 @@ const FacturasService = {
       return { data: [] };
     }
   },
+  // Varias facturas completas (encabezado y líneas) en una sola solicitud
+  getDetalles: async (ids) => {
+    try {
+      const res = await axios.post(`${API_URL}/facturas/detalles`, { ids });
+      return res.data;
+    } catch (err) {
+      return { data: [] };
+    }
+  },
   create: async (factura) => {
     try {
       const res = await axios.post(`${API_URL}/facturas`, factura);